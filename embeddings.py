@@ -0,0 +1,82 @@
+import math
+import re
+import zlib
+from typing import Dict, List
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Words that carry no intent in HR questions; dropped before embedding
+STOPWORDS = frozenset(
+    """
+    a an the is are am was were be been i me my mine we our you your to of in on
+    for at by with do does did can could would should will shall please tell
+    what when where which who how hi hello hey there it this that and or s get
+    show give know want like receive
+    """.split()
+)
+
+
+def normalize_query(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(_TOKEN_RE.findall(text.lower()))
+
+
+def tokenize(text: str) -> List[str]:
+    """Content words of a query (normalized, stopwords removed)."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class HashingEmbedder:
+    """Dependency-free text embedder using hashed word and character n-grams.
+
+    Vectors are L2-normalized, so the dot product of two embeddings is their
+    cosine similarity. It is not a semantic model, but it is deterministic,
+    runs in microseconds and is good enough to match rephrasings of the same
+    short question ("what is my leave balance" / "my leave balance?").
+    """
+
+    def __init__(self, dim: int = 512, char_ngram: int = 3) -> None:
+        self.dim = dim
+        self.char_ngram = char_ngram
+
+    def _bucket(self, feature: str) -> int:
+        return zlib.crc32(feature.encode("utf-8")) % self.dim
+
+    def embed_sparse(self, text: str) -> Dict[int, float]:
+        """Embed text as a sparse {dimension: weight} vector."""
+        vec: Dict[int, float] = {}
+        tokens = tokenize(text)
+        for token in tokens:
+            # Whole words weigh more than their character n-grams
+            b = self._bucket("w:" + token)
+            vec[b] = vec.get(b, 0.0) + 2.0
+            padded = f"#{token}#"
+            for i in range(max(1, len(padded) - self.char_ngram + 1)):
+                b = self._bucket("c:" + padded[i : i + self.char_ngram])
+                vec[b] = vec.get(b, 0.0) + 1.0
+        for first, second in zip(tokens, tokens[1:]):
+            b = self._bucket(f"b:{first} {second}")
+            vec[b] = vec.get(b, 0.0) + 1.0
+
+        norm = math.sqrt(sum(v * v for v in vec.values()))
+        if norm == 0:
+            return {}
+        return {k: v / norm for k, v in vec.items()}
+
+    def embed(self, text: str) -> List[float]:
+        """Embed text as a dense list of ``dim`` floats."""
+        dense = [0.0] * self.dim
+        for k, v in self.embed_sparse(text).items():
+            dense[k] = v
+        return dense
+
+
+def cosine_sparse(a: Dict[int, float], b: Dict[int, float]) -> float:
+    """Cosine similarity of two L2-normalized sparse vectors."""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+default_embedder = HashingEmbedder()
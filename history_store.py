@@ -0,0 +1,206 @@
+import json
+import os
+import sqlite3
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple, Union
+
+from sqlite_pool import ThreadLocalConnectionPool, enable_incremental_vacuum, incremental_vacuum
+
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_SQL_APPEND = """
+    INSERT INTO interaction_history (session_id, user_id, action, timestamp, entry)
+    VALUES (?, ?, ?, ?, ?)
+"""
+_SQL_DELETE_SESSION = "DELETE FROM interaction_history WHERE session_id = ?"
+_SQL_ENTRIES_AFTER = """
+    SELECT id, entry FROM interaction_history
+    WHERE session_id = ? AND id > ?
+    ORDER BY id
+"""
+_SQL_GET_SUMMARY = """
+    SELECT summary, covered_until_id, covered_entries, covered_chars
+    FROM history_summaries WHERE session_id = ?
+"""
+_SQL_SAVE_SUMMARY = """
+    INSERT OR REPLACE INTO history_summaries (
+        session_id, summary, covered_until_id, covered_entries, covered_chars
+    ) VALUES (?, ?, ?, ?, ?)
+"""
+_SQL_DELETE_SUMMARY = "DELETE FROM history_summaries WHERE session_id = ?"
+_SQL_DELETE_SESSIONS = "DELETE FROM interaction_history WHERE session_id IN (SELECT value FROM json_each(?))"
+_SQL_DELETE_SUMMARIES = "DELETE FROM history_summaries WHERE session_id IN (SELECT value FROM json_each(?))"
+
+
+def _format_timestamp(value: Union[str, datetime, None]) -> Optional[str]:
+    if isinstance(value, datetime):
+        return value.strftime(TIMESTAMP_FORMAT)
+    return value
+
+
+class InteractionHistoryStore:
+    """Append-only SQLite store for per-session interaction history.
+
+    Adding a query or response is a single-row INSERT, and reads go through
+    the (session_id, timestamp) index, so the cost of a turn no longer grows
+    with the length of the conversation.
+    """
+
+    def __init__(self, db_path: str = "interaction_history.db") -> None:
+        self.db_path = db_path
+        self._pool = ThreadLocalConnectionPool(db_path)
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        return self._pool.connect()
+
+    def close(self) -> None:
+        self._pool.close()
+
+    def _init_db(self) -> None:
+        conn = self._connect()
+        enable_incremental_vacuum(conn)
+        with conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS interaction_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    action TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    entry TEXT NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_interaction_history_session_time
+                ON interaction_history (session_id, timestamp)
+                """
+            )
+            # Rolling summary of entries that fell out of the prompt window
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS history_summaries (
+                    session_id TEXT PRIMARY KEY,
+                    summary TEXT NOT NULL,
+                    covered_until_id INTEGER NOT NULL,
+                    covered_entries INTEGER NOT NULL,
+                    covered_chars INTEGER NOT NULL
+                )
+                """
+            )
+
+    def append(self, session_id: str, user_id: str, entry: Dict[str, Any]) -> None:
+        """Append one entry. Adds a timestamp if the entry has none."""
+        if "timestamp" not in entry:
+            entry["timestamp"] = datetime.now().strftime(TIMESTAMP_FORMAT)
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                _SQL_APPEND,
+                (
+                    session_id,
+                    user_id,
+                    entry.get("action", "interaction"),
+                    entry["timestamp"],
+                    json.dumps(entry),
+                ),
+            )
+
+    def get_history(
+        self,
+        session_id: str,
+        since: Union[str, datetime, None] = None,
+        until: Union[str, datetime, None] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Return entries for a session, oldest first.
+
+        Args:
+            session_id: The session ID
+            since: Only entries at or after this time (inclusive)
+            until: Only entries before this time (exclusive)
+            limit: Only the most recent ``limit`` entries
+        """
+        sql = "SELECT entry FROM interaction_history WHERE session_id = ?"
+        params: list = [session_id]
+        if since is not None:
+            sql += " AND timestamp >= ?"
+            params.append(_format_timestamp(since))
+        if until is not None:
+            sql += " AND timestamp < ?"
+            params.append(_format_timestamp(until))
+        if limit is not None:
+            # Newest first for the LIMIT, then flipped back to oldest first
+            sql += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+            params.append(limit)
+            rows = self._connect().execute(sql, params).fetchall()
+            rows.reverse()
+        else:
+            sql += " ORDER BY timestamp, id"
+            rows = self._connect().execute(sql, params).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def count(self, session_id: str) -> int:
+        row = self._connect().execute(
+            "SELECT COUNT(*) FROM interaction_history WHERE session_id = ?",
+            (session_id,),
+        ).fetchone()
+        return row[0]
+
+    def get_entries_after(self, session_id: str, after_id: int = 0) -> List[Tuple[int, Dict[str, Any]]]:
+        """Return (id, entry) pairs newer than ``after_id``, oldest first."""
+        rows = self._connect().execute(_SQL_ENTRIES_AFTER, (session_id, after_id)).fetchall()
+        return [(r[0], json.loads(r[1])) for r in rows]
+
+    def get_summary(self, session_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute(_SQL_GET_SUMMARY, (session_id,)).fetchone()
+        if not row:
+            return None
+        return {
+            "summary": json.loads(row[0]),
+            "covered_until_id": row[1],
+            "covered_entries": row[2],
+            "covered_chars": row[3],
+        }
+
+    def save_summary(
+        self,
+        session_id: str,
+        summary: List[str],
+        covered_until_id: int,
+        covered_entries: int,
+        covered_chars: int,
+    ) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                _SQL_SAVE_SUMMARY,
+                (session_id, json.dumps(summary), covered_until_id, covered_entries, covered_chars),
+            )
+
+    def delete_session(self, session_id: str) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute(_SQL_DELETE_SESSION, (session_id,))
+            conn.execute(_SQL_DELETE_SUMMARY, (session_id,))
+
+    def delete_sessions(self, session_ids: List[str]) -> None:
+        """Delete the history of several sessions in one transaction."""
+        ids = json.dumps(session_ids)
+        conn = self._connect()
+        with conn:
+            conn.execute(_SQL_DELETE_SESSIONS, (ids,))
+            conn.execute(_SQL_DELETE_SUMMARIES, (ids,))
+
+    def vacuum(self, pages: int) -> None:
+        incremental_vacuum(self._connect(), pages)
+
+
+# Shared instance used by the API and the host agent's history callback
+history_store = InteractionHistoryStore(
+    db_path=os.getenv("HISTORY_DB_PATH", "interaction_history.db")
+)
@@ -0,0 +1,162 @@
+import json
+import logging
+import os
+import threading
+from typing import Dict, Any, List
+
+from history_store import history_store, InteractionHistoryStore
+
+logger = logging.getLogger(__name__)
+
+
+# Number of most recent history entries kept verbatim in the prompt
+HISTORY_WINDOW_ENTRIES = int(os.getenv("HISTORY_WINDOW_ENTRIES", "6"))
+# Upper bound on the tokens spent on history in the host_agent prompt
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+# Number of lines kept in a session's rolling summary
+HISTORY_SUMMARY_LINES = int(os.getenv("HISTORY_SUMMARY_LINES", "20"))
+
+_SUMMARY_TEXT_CHARS = 80
+_RESPONSE_TEXT_CHARS = 400
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token)."""
+    return (len(text) + 3) // 4
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = " ".join(str(text).split())
+    if len(text) > limit:
+        return text[: limit - 3] + "..."
+    return text
+
+
+def summarize_entry(entry: Dict[str, Any]) -> str:
+    """One short summary line for an entry leaving the verbatim window."""
+    action = entry.get("action", "interaction")
+    if action == "user_query":
+        return f'User asked: "{_shorten(entry.get("query", ""), _SUMMARY_TEXT_CHARS)}"'
+    if action == "agent_response":
+        return f'{entry.get("agent", "agent")} answered: "{_shorten(entry.get("response", ""), _SUMMARY_TEXT_CHARS)}"'
+    return f"{action} at {entry.get('timestamp', 'unknown time')}"
+
+
+def format_entry(entry: Dict[str, Any], response_chars: int = _RESPONSE_TEXT_CHARS) -> str:
+    """Render one entry verbatim (long responses are clipped)."""
+    action = entry.get("action", "interaction")
+    timestamp = entry.get("timestamp", "unknown time")
+    if action == "user_query":
+        return f'- [{timestamp}] User: "{entry.get("query", "")}"'
+    if action == "agent_response":
+        response = _shorten(entry.get("response", ""), response_chars)
+        return f'- [{timestamp}] {entry.get("agent", "agent")}: "{response}"'
+    details = ", ".join(
+        f"{k}: {v}" for k, v in entry.items() if k not in ["action", "timestamp"]
+    )
+    return f"- [{timestamp}] {action}" + (f" ({details})" if details else "")
+
+
+def _render(summary: List[str], covered_entries: int, recent: List[str]) -> str:
+    sections = []
+    if summary:
+        sections.append(
+            f"Summary of {covered_entries} earlier entries:\n"
+            + "\n".join(f"- {line}" for line in summary)
+        )
+    if recent:
+        sections.append("Recent turns:\n" + "\n".join(recent))
+    return "\n\n".join(sections) if sections else "No previous interactions."
+
+
+class HistoryWindowStats:
+    """Running totals of prompt tokens spent on and saved from history."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.full_tokens = 0
+        self.rendered_tokens = 0
+
+    def record(self, full_tokens: int, rendered_tokens: int) -> None:
+        with self._lock:
+            self.requests += 1
+            self.full_tokens += full_tokens
+            self.rendered_tokens += rendered_tokens
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "full_tokens": self.full_tokens,
+                "rendered_tokens": self.rendered_tokens,
+                "tokens_saved": max(0, self.full_tokens - self.rendered_tokens),
+            }
+
+
+history_window_stats = HistoryWindowStats()
+
+
+def render_history_window(
+    session_id: str,
+    store: InteractionHistoryStore = history_store,
+    window_entries: int = HISTORY_WINDOW_ENTRIES,
+    token_budget: int = HISTORY_TOKEN_BUDGET,
+) -> str:
+    """Render a session's history for the prompt within a token budget.
+
+    The last ``window_entries`` entries are kept verbatim; older entries are
+    folded once into the session's rolling summary (persisted in the history
+    store), so each call only reads the entries added since the last fold.
+    If the result still exceeds ``token_budget``, the summary is trimmed
+    first, then the oldest verbatim entries.
+    """
+    saved = store.get_summary(session_id) or {
+        "summary": [],
+        "covered_until_id": 0,
+        "covered_entries": 0,
+        "covered_chars": 0,
+    }
+    summary = saved["summary"]
+    covered_until_id = saved["covered_until_id"]
+    covered_entries = saved["covered_entries"]
+    covered_chars = saved["covered_chars"]
+
+    tail = store.get_entries_after(session_id, covered_until_id)
+
+    # Roll entries that fell out of the window into the summary
+    overflow = len(tail) - window_entries
+    if overflow > 0:
+        folded, tail = tail[:overflow], tail[overflow:]
+        summary = (summary + [summarize_entry(e) for _, e in folded])[-HISTORY_SUMMARY_LINES:]
+        covered_until_id = folded[-1][0]
+        covered_entries += len(folded)
+        covered_chars += sum(len(json.dumps(e)) for _, e in folded)
+        store.save_summary(session_id, summary, covered_until_id, covered_entries, covered_chars)
+
+    recent_entries = [e for _, e in tail]
+    recent = [format_entry(e) for e in recent_entries]
+    text = _render(summary, covered_entries, recent)
+
+    # Enforce the budget: shrink the summary, then drop the oldest turns
+    while estimate_tokens(text) > token_budget and (summary or len(recent) > 1):
+        if summary:
+            summary = summary[1:]
+        else:
+            recent = recent[1:]
+        text = _render(summary, covered_entries, recent)
+    if estimate_tokens(text) > token_budget:
+        text = text[: token_budget * 4]
+
+    # What the prompt used to carry: the full history list
+    full_chars = covered_chars + sum(len(json.dumps(e)) for e in recent_entries)
+    full_tokens = (full_chars + 3) // 4
+    rendered_tokens = estimate_tokens(text)
+    history_window_stats.record(full_tokens, rendered_tokens)
+    logger.debug(
+        "History window for %s: %d prompt tokens (%d saved)",
+        session_id,
+        rendered_tokens,
+        max(0, full_tokens - rendered_tokens),
+    )
+    return text
@@ -1,15 +1,42 @@
+import asyncio
+import os
+
 from google.adk.agents import LlmAgent
+from google.adk.agents.callback_context import CallbackContext
 from google.adk.tools.agent_tool import AgentTool
 
+from history_window import render_history_window
+
+from .offline import resolve_model
+from .tools import FANOUT_INSTRUCTION, FanOutTool
+
 from .sub_agents.policy_agent.agent import policy_agent
 from .sub_agents.payroll_query_agent.agent import payroll_query_agent
 from .sub_agents.case_management_agent.agent import case_management_agent
 from .sub_agents.leave_management_agent.agent import leave_management_agent
 # from .sub_agents.search_agent.agent import search_agent
 
+# Let host_agent ask independent specialists concurrently in a single tool call
+HOST_FANOUT_MODE = os.getenv("HOST_FANOUT_MODE", "1") == "1"
+
+
+async def load_interaction_history(callback_context: CallbackContext):
+    """Expose the session's interaction history to the instruction template.
+
+    History lives in the append-only history store and is rendered as a
+    bounded window (recent turns verbatim plus a rolling summary). It is
+    loaded under a ``temp:`` key so it is visible for this invocation only and
+    never written back into the persisted session state.
+    """
+    callback_context.state["temp:interaction_history"] = await asyncio.to_thread(
+        render_history_window, callback_context.session.id
+    )
+    return None
+
+
 host_agent = LlmAgent(
     name="host_agent",
-    model="gemini-2.0-flash",
+    model=resolve_model("gemini-2.0-flash", "host_agent", reply_format="json"),
     description="""
     The Host Agent is the central orchestrator of a multi-agent system. It acts as the user's primary contact and routes queries to the most appropriate specialist agent based on intent and scope.
     """,
@@ -25,7 +52,7 @@ host_agent = LlmAgent(
       ---
 
       ## Interaction History:
-      {interaction_history}
+      {temp:interaction_history}
 
       ---
 
@@ -145,14 +172,16 @@ host_agent = LlmAgent(
 
       NOTE: Frame the suggestion questions by yourself (don't ask the same sample questions provided above) on the basis of knowledge you have and the context of the conversation.
 
-      """,
+      """ + (FANOUT_INSTRUCTION if HOST_FANOUT_MODE else ""),
     sub_agents=[
         policy_agent,
         payroll_query_agent,
         case_management_agent,
         leave_management_agent
     ],
-    tools=[AgentTool(policy_agent), AgentTool(payroll_query_agent), AgentTool(case_management_agent), AgentTool(leave_management_agent)],
+    tools=[AgentTool(policy_agent), AgentTool(payroll_query_agent), AgentTool(case_management_agent), AgentTool(leave_management_agent)]
+    + ([FanOutTool([policy_agent, payroll_query_agent, leave_management_agent])] if HOST_FANOUT_MODE else []),
+    before_agent_callback=load_interaction_history,
 )
 
 
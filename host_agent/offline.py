@@ -0,0 +1,255 @@
+"""Offline stand-ins for Gemini, for benchmarking the stack without the cloud.
+
+With ``AESS_OFFLINE=1`` every agent gets a :class:`FakeLlm` instead of its
+Gemini model, and retrieval tools use the ``fake`` backend (see
+``host_agent/tools/fake_retrieval.py``). Sessions, history, caches and the
+FastAPI layer are the real ones, so a load test measures our own overhead.
+
+Settings:
+
+- ``AESS_OFFLINE_LLM_LATENCY``: latency of one model call, e.g.
+  ``lognormal:0.8,0.4`` (see :class:`LatencyModel` for the formats)
+- ``AESS_OFFLINE_SEED``: seed for the latency samples
+- ``AESS_OFFLINE_SCRIPT``: JSON file of per-agent rules, checked in order
+  against the user message; the first match decides the turn::
+
+      {
+        "case_management_agent": [
+          {"match": "ticket|hr", "tool": "create_ticket",
+           "args": {"subject": "Offline ticket", "description": "{query}"}}
+        ],
+        "host_agent": [
+          {"match": "^(hi|hello)", "reply": "Hello! How can I help?",
+           "latency": "fixed:0.05"}
+        ]
+      }
+
+Without a matching rule the fake model behaves like a cooperative Gemini:
+host_agent delegates to the specialist the intent router picks, specialists
+call their first tool with the user message, and once tool results are in,
+the model answers with a short summary of them.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple, Union
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from intent_router import intent_router
+
+
+AESS_OFFLINE = os.getenv("AESS_OFFLINE", "0") == "1"
+AESS_OFFLINE_LLM_LATENCY = os.getenv("AESS_OFFLINE_LLM_LATENCY", "lognormal:0.8,0.4")
+AESS_OFFLINE_SEED = os.getenv("AESS_OFFLINE_SEED")
+AESS_OFFLINE_SCRIPT = os.getenv("AESS_OFFLINE_SCRIPT")
+
+_STREAM_CHUNK_WORDS = 8
+
+
+class LatencyModel:
+    """Samples delays (seconds) from a distribution given as ``kind:params``.
+
+    - ``fixed:S``
+    - ``uniform:LOW,HIGH``
+    - ``normal:MEAN,STDDEV`` (clipped at 0)
+    - ``lognormal:MEDIAN,SIGMA``
+    - ``exponential:MEAN``
+    """
+
+    def __init__(self, spec: str, rng: Optional[random.Random] = None) -> None:
+        self.spec = spec
+        self.rng = rng or random.Random()
+        kind, _, params = spec.partition(":")
+        self.kind = kind.strip().lower()
+        self.params = [float(p) for p in params.split(",") if p.strip()]
+        expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exponential": 1}
+        if self.kind not in expected or len(self.params) != expected[self.kind]:
+            raise ValueError(f"Invalid latency spec '{spec}'")
+
+    def sample(self) -> float:
+        p = self.params
+        if self.kind == "fixed":
+            value = p[0]
+        elif self.kind == "uniform":
+            value = self.rng.uniform(p[0], p[1])
+        elif self.kind == "normal":
+            value = self.rng.gauss(p[0], p[1])
+        elif self.kind == "lognormal":
+            value = p[0] * self.rng.lognormvariate(0.0, p[1])
+        else:
+            value = self.rng.expovariate(1.0 / p[0]) if p[0] > 0 else 0.0
+        return max(0.0, value)
+
+
+def seeded_rng(name: str) -> random.Random:
+    """RNG for one component's latency, reproducible when AESS_OFFLINE_SEED is set."""
+    if AESS_OFFLINE_SEED is None:
+        return random.Random()
+    return random.Random(f"{AESS_OFFLINE_SEED}:{name}")
+
+
+def _load_script(path: Optional[str]) -> Dict[str, List[Dict[str, Any]]]:
+    if not path:
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _fill(value: Any, query: str) -> Any:
+    """Substitute ``{query}`` in scripted tool arguments."""
+    if isinstance(value, str):
+        return value.replace("{query}", query)
+    if isinstance(value, dict):
+        return {k: _fill(v, query) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_fill(v, query) for v in value]
+    return value
+
+
+def _string_params(tool) -> List[str]:
+    """Required string parameters of a tool (all of them if none are marked)."""
+    declaration = tool._get_declaration()
+    if declaration is None:
+        return []
+    if getattr(declaration, "parameters_json_schema", None):
+        schema = declaration.parameters_json_schema
+        properties = schema.get("properties", {})
+        names = schema.get("required") or list(properties)
+        return [n for n in names if properties.get(n, {}).get("type") == "string"]
+    schema = declaration.parameters
+    if schema is None or not schema.properties:
+        return []
+    names = schema.required or list(schema.properties)
+    return [n for n in names if schema.properties[n].type == types.Type.STRING]
+
+
+class FakeLlm(BaseLlm):
+    """Deterministic BaseLlm with sampled latency and scripted tool calls."""
+
+    agent_name: str = ""
+    reply_format: str = "markdown"
+    latency: Any = None
+    rules: List[Dict[str, Any]] = []
+
+    @classmethod
+    def supported_models(cls) -> List[str]:
+        return [r"offline/.*"]
+
+    def _decide(self, llm_request: LlmRequest) -> Tuple[Optional[Tuple[str, Dict[str, Any]]], Optional[str], Optional[str]]:
+        """Return (tool call, reply text, latency override) for this turn."""
+        contents = llm_request.contents or []
+        last = contents[-1] if contents else None
+        parts = (last.parts or []) if last else []
+
+        responses = [p.function_response for p in parts if p.function_response]
+        if responses:
+            return None, self._summarize(responses), None
+
+        query = " ".join(p.text for p in parts if p.text).strip()
+        for rule in self.rules:
+            if re.search(rule.get("match", ".*"), query, re.IGNORECASE):
+                if rule.get("tool"):
+                    return (rule["tool"], _fill(rule.get("args", {}), query)), None, rule.get("latency")
+                return None, _fill(rule.get("reply", ""), query), rule.get("latency")
+
+        # Never hand the turn over; delegation goes through the agent tools
+        tools = {n: t for n, t in (llm_request.tools_dict or {}).items() if n != "transfer_to_agent"}
+        tool_name = None
+        if self.agent_name == "host_agent":
+            predicted, _ = intent_router.classify(query)
+            if predicted in tools:
+                tool_name = predicted
+        elif tools:
+            tool_name = next(iter(tools))
+        if tool_name:
+            args = {name: query for name in _string_params(tools[tool_name])}
+            return (tool_name, args), None, None
+        return None, self._answer(query), None
+
+    def _answer(self, query: str) -> str:
+        digest = hashlib.sha256(query.encode()).hexdigest()[:8]
+        return f"**Offline answer** ({self.agent_name or self.model}, ref {digest}) to: {query}"
+
+    def _summarize(self, responses) -> str:
+        lines = []
+        for response in responses:
+            result = (response.response or {}).get("result", response.response)
+            if not isinstance(result, str):
+                result = json.dumps(result, ensure_ascii=False, default=str)
+            lines.append(f"- **{response.name}**: {result[:400]}")
+        return "Here is what I found:\n" + "\n".join(lines)
+
+    def _text(self, text: str) -> str:
+        if self.reply_format != "json":
+            return text
+        return json.dumps(
+            {
+                "final_response": text,
+                "suggestions": [
+                    "What is my leave balance?",
+                    "When will I get my salary?",
+                    "What is the work from home policy?",
+                ],
+            },
+            ensure_ascii=False,
+        )
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        call, text, latency_spec = self._decide(llm_request)
+        latency = LatencyModel(latency_spec, self.latency.rng) if latency_spec else self.latency
+        delay = latency.sample()
+
+        if call is not None:
+            await asyncio.sleep(delay)
+            name, args = call
+            part = types.Part(function_call=types.FunctionCall(name=name, args=args))
+            yield LlmResponse(content=types.Content(role="model", parts=[part]))
+            return
+
+        text = self._text(text)
+        if stream:
+            # Spread the delay over word chunks, like tokens arriving
+            words = text.split(" ")
+            chunks = [
+                " ".join(words[i : i + _STREAM_CHUNK_WORDS])
+                for i in range(0, len(words), _STREAM_CHUNK_WORDS)
+            ]
+            for i, chunk in enumerate(chunks):
+                await asyncio.sleep(delay / len(chunks))
+                chunk = chunk if i == 0 else " " + chunk
+                yield LlmResponse(
+                    content=types.Content(role="model", parts=[types.Part(text=chunk)]),
+                    partial=True,
+                )
+        else:
+            await asyncio.sleep(delay)
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=text)]))
+
+
+_script = _load_script(AESS_OFFLINE_SCRIPT) if AESS_OFFLINE else {}
+
+
+def resolve_model(model: str, agent_name: str, reply_format: str = "markdown") -> Union[str, BaseLlm]:
+    """Model for an agent: the Gemini name, or a FakeLlm when offline.
+
+    ``reply_format="json"`` makes the fake answer in host_agent's
+    ``{"final_response", "suggestions"}`` format.
+    """
+    if not AESS_OFFLINE:
+        return model
+    return FakeLlm(
+        model=f"offline/{model}",
+        agent_name=agent_name,
+        reply_format=reply_format,
+        latency=LatencyModel(AESS_OFFLINE_LLM_LATENCY, seeded_rng(agent_name)),
+        rules=_script.get(agent_name, []),
+    )
@@ -1,16 +1,16 @@
 from google.adk.agents import LlmAgent
 from google.adk.tools import FunctionTool
+from google.adk.tools.tool_context import ToolContext
 from dotenv import load_dotenv
-import requests
-import os
+import httpx
 from typing import Dict
 
-load_dotenv()
+from ...offline import resolve_model
+from ...tools import TICKET_OUTBOX_ENABLED, CircuitOpenError, freshservice_client, ticket_dispatcher
 
-FRESHSERVICE_API_KEY = os.getenv("FRESHSERVICE_API_KEY")
-FRESHSERVICE_URL = os.getenv("FRESHSERVICE_URL")
+load_dotenv()
 
-def create_ticket(description: str, subject: str, priority: int = 1, status: int = 2) -> str:
+async def create_ticket(description: str, subject: str, tool_context: ToolContext, priority: int = 1, status: int = 2) -> str:
     """
     Creates a Freshservice support ticket with the given description, subject, and requester's email.
 
@@ -34,17 +34,32 @@ def create_ticket(description: str, subject: str, priority: int = 1, status: int
         "priority": priority,
         "status": status
     }
-    headers = {"Content-Type": "application/json"}
-    auth = (FRESHSERVICE_API_KEY, "X")
+
+    if TICKET_OUTBOX_ENABLED:
+        # Queued durably and delivered in the background; the user gets a
+        # reference they can look up at /tickets/{reference}
+        try:
+            reference = await ticket_dispatcher.submit(
+                payload, user_id=tool_context.user_id, session_id=tool_context.session.id
+            )
+            return (
+                f"Ticket request received. Reference: {reference}. "
+                "It is being raised in Freshservice and the Ticket ID will be available shortly."
+            )
+        except Exception as e:
+            return f"Exception occurred while creating ticket: {str(e)}"
 
     try:
-        response = requests.post(FRESHSERVICE_URL, json=payload, headers=headers, auth=auth, verify= False)
-        result = response.json()
-        if response.status_code in [200, 201]:
+        status_code, result = await freshservice_client.create_ticket(payload)
+        if status_code in [200, 201]:
             ticket_id = result.get("ticket", {}).get("id")
             return f"Leave request submitted successfully. Ticket ID: {ticket_id}"
         else:
             return f"Failed to create leave ticket: {result}"
+    except CircuitOpenError as e:
+        return f"Ticketing service is temporarily unavailable: {str(e)}"
+    except httpx.TimeoutException:
+        return "Ticketing service did not respond in time. Please try again shortly."
     except Exception as e:
         return f"Exception occurred while creating ticket: {str(e)}"
 
@@ -149,7 +164,7 @@ create_freshservice_ticket = FunctionTool(func=create_ticket)
 
 case_management_agent = LlmAgent(
     name="case_management_agent",
-    model="gemini-2.5-pro",
+    model=resolve_model("gemini-2.5-pro", "case_management_agent"),
     description="A specialist agent for creating Freshservice support tickets.",
     instruction="""
     You are the **Case Management Agent**, an expert virtual assistant responsible for raising **Freshservice support tickets**.
@@ -188,7 +203,7 @@ case_management_agent = LlmAgent(
     - Expected outcome or urgency
     3. Generate a **clear, professional subject** and a **detailed description**.
     4. Call `create_freshservice_ticket` with the constructed inputs.
-    5. Return a response using the result from the tool.
+    5. Return a response using the result from the tool. If the tool returns a **reference** (e.g. `TKT-1A2B3C4D5E`) instead of a Ticket ID, share the reference and tell the user the ticket is being raised and can be tracked with it.
 
     ---
 
@@ -1,11 +1,13 @@
 from google.adk.agents import LlmAgent
-from google.adk.tools.retrieval.vertex_ai_rag_retrieval import VertexAiRagRetrieval
 from vertexai.preview import rag
 from dotenv import load_dotenv
 
+from ...offline import resolve_model
+from ...tools import build_retrieval_tool
+
 load_dotenv()
 
-retrieve_leave_information = VertexAiRagRetrieval(
+retrieve_leave_information = build_retrieval_tool(
     name="retrieve_leave_information",
     description="Use this tool to fetch details about leave policies, balances, and entitlements from the RAG corpus.",
     rag_resources=[
@@ -18,7 +20,7 @@ retrieve_leave_information = VertexAiRagRetrieval(
 )
 
 leave_management_agent = LlmAgent(
-    model="gemini-2.5-pro",
+    model=resolve_model("gemini-2.5-pro", "leave_management_agent"),
     name="leave_management_agent",
     description="A specialist agent for handling leave-related queries and actions.",
     instruction="""
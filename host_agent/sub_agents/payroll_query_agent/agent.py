@@ -1,11 +1,13 @@
 from google.adk.agents import LlmAgent
-from google.adk.tools.retrieval.vertex_ai_rag_retrieval import VertexAiRagRetrieval
 from vertexai.preview import rag
 from dotenv import load_dotenv
 
+from ...offline import resolve_model
+from ...tools import build_retrieval_tool
+
 load_dotenv()
 
-retrieve_payroll_information = VertexAiRagRetrieval(
+retrieve_payroll_information = build_retrieval_tool(
     name="retrieve_payroll_information",
     description="Use this tool to fetch payroll and salary-related information from the RAG corpus.",
     rag_resources=[
@@ -20,7 +22,7 @@ retrieve_payroll_information = VertexAiRagRetrieval(
 
 payroll_query_agent = LlmAgent(
     name="payroll_query_agent",
-    model="gemini-2.5-pro",
+    model=resolve_model("gemini-2.5-pro", "payroll_query_agent"),
     description="A specialist agent for handling payroll, salary, tax, and deduction-related user queries.",
     instruction="""
     You are the **Payroll Query Agent**, a specialist agent with deep expertise in payroll operations, tax structures, compensation policies, deductions, reimbursements, and employee salary-related matters.
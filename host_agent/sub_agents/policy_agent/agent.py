@@ -1,13 +1,15 @@
 from google.adk.agents import LlmAgent
-from google.adk.tools.retrieval.vertex_ai_rag_retrieval import VertexAiRagRetrieval
 from vertexai.preview import rag
 # from google.adk.tools import FunctionTool
 
 from dotenv import load_dotenv
 
+from ...offline import resolve_model
+from ...tools import build_retrieval_tool
+
 load_dotenv()
 
-retrieve_policy_information = VertexAiRagRetrieval(
+retrieve_policy_information = build_retrieval_tool(
     name='retrieve_policy_information',
     description=(
         'Use this tool to retrieve information about company policies from the RAG corpus'
@@ -24,7 +26,7 @@ retrieve_policy_information = VertexAiRagRetrieval(
 
 policy_agent = LlmAgent(
     name="policy_agent",
-    model="gemini-2.5-pro",
+    model=resolve_model("gemini-2.5-pro", "policy_agent"),
     description="A specialist agent for company policy-related queries.",
     instruction="""
     You are the **Policy Agent**, a domain specialist with deep expertise in interpreting and answering questions about company policies and procedures.
@@ -0,0 +1,22 @@
+from .fanout import FANOUT_INSTRUCTION, FANOUT_TOOL_NAME, FanOutTool
+from .freshservice import CircuitBreaker, CircuitOpenError, FreshserviceClient, freshservice_client
+from .rag_cache import CachedRagRetrieval, RetrievalCache, rag_cache
+from .retrieval import build_retrieval_tool
+from .ticket_delivery import TICKET_OUTBOX_ENABLED, TicketDispatcher, ticket_dispatcher
+
+__all__ = [
+    "CachedRagRetrieval",
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "FANOUT_INSTRUCTION",
+    "FANOUT_TOOL_NAME",
+    "FanOutTool",
+    "FreshserviceClient",
+    "RetrievalCache",
+    "TICKET_OUTBOX_ENABLED",
+    "TicketDispatcher",
+    "build_retrieval_tool",
+    "freshservice_client",
+    "rag_cache",
+    "ticket_dispatcher",
+]
@@ -0,0 +1,44 @@
+import asyncio
+import hashlib
+import os
+from typing import Any, Dict
+
+from google.adk.tools.retrieval.base_retrieval_tool import BaseRetrievalTool
+from google.adk.tools.tool_context import ToolContext
+
+from ..offline import LatencyModel, seeded_rng
+
+
+AESS_OFFLINE_RAG_LATENCY = os.getenv("AESS_OFFLINE_RAG_LATENCY", "lognormal:0.15,0.3")
+
+
+class FakeRetrieval(BaseRetrievalTool):
+    """Offline retrieval tool returning canned passages after a sampled delay.
+
+    Same declaration and result shape as VertexAiRagRetrieval; the passages
+    are derived from the query, so repeated queries get the same answer.
+    """
+
+    def __init__(
+        self,
+        *,
+        name: str,
+        description: str,
+        similarity_top_k: int = 3,
+        latency: str = AESS_OFFLINE_RAG_LATENCY,
+    ):
+        super().__init__(name=name, description=description)
+        self.similarity_top_k = similarity_top_k
+        self.latency = LatencyModel(latency, seeded_rng(name))
+
+    def _passages(self, query: str):
+        digest = hashlib.sha256(f"{self.name}:{query}".encode()).hexdigest()
+        return [
+            f"[{self.name} passage {i + 1}, doc {digest[i * 6 : i * 6 + 6]}] "
+            f"Offline reference text relevant to: {query}"
+            for i in range(self.similarity_top_k)
+        ]
+
+    async def run_async(self, *, args: Dict[str, Any], tool_context: ToolContext) -> Any:
+        await asyncio.sleep(self.latency.sample())
+        return self._passages(args["query"])
@@ -0,0 +1,105 @@
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from google.adk.agents import BaseAgent
+from google.adk.tools import BaseTool
+from google.adk.tools.agent_tool import AgentTool
+from google.adk.tools.tool_context import ToolContext
+from google.genai import types
+
+
+FANOUT_TOOL_NAME = "consult_specialists"
+FANOUT_BRANCH_TIMEOUT_SECONDS = float(os.getenv("FANOUT_BRANCH_TIMEOUT_SECONDS", "60"))
+
+FANOUT_INSTRUCTION = f"""
+      ---
+
+      ## Parallel Delegation:
+      - When a query needs **more than one specialist** and the sub-questions do not depend on each other's answers, call `{FANOUT_TOOL_NAME}` **once** with every sub-question instead of calling the specialist agents one after another.
+      - Each entry names the `agent` and the `request` to send to it. Entries run at the same time.
+      - Merge all returned answers into a single final response. If an entry reports an error or timeout, say which part could not be answered.
+      - Use the individual specialist agents when only one of them is needed, or when one answer is required to ask the next question.
+"""
+
+
+class FanOutTool(BaseTool):
+    """Calls several specialist agents concurrently and merges their answers.
+
+    Each branch runs through the agent's AgentTool, exactly as a single
+    delegation would, under its own timeout; a slow or failing branch is
+    reported in place without holding up the others.
+    """
+
+    def __init__(self, agents: List[BaseAgent], branch_timeout: float = FANOUT_BRANCH_TIMEOUT_SECONDS):
+        super().__init__(
+            name=FANOUT_TOOL_NAME,
+            description=(
+                "Send independent sub-questions to several specialist agents at the same "
+                "time and get all their answers back together."
+            ),
+        )
+        self.branch_timeout = branch_timeout
+        self._agent_tools: Dict[str, AgentTool] = {agent.name: AgentTool(agent) for agent in agents}
+
+    def _get_declaration(self) -> Optional[types.FunctionDeclaration]:
+        agent_names = sorted(self._agent_tools)
+        return types.FunctionDeclaration(
+            name=self.name,
+            description=self.description,
+            parameters=types.Schema(
+                type=types.Type.OBJECT,
+                properties={
+                    "requests": types.Schema(
+                        type=types.Type.ARRAY,
+                        description="One entry per specialist sub-question.",
+                        items=types.Schema(
+                            type=types.Type.OBJECT,
+                            properties={
+                                "agent": types.Schema(
+                                    type=types.Type.STRING,
+                                    enum=agent_names,
+                                    description="Specialist agent to ask.",
+                                ),
+                                "request": types.Schema(
+                                    type=types.Type.STRING,
+                                    description="The sub-question for that agent, with any user context it needs.",
+                                ),
+                            },
+                            required=["agent", "request"],
+                        ),
+                    ),
+                },
+                required=["requests"],
+            ),
+        )
+
+    async def _run_branch(self, branch: Dict[str, Any], tool_context: ToolContext) -> Dict[str, Any]:
+        agent_name = branch.get("agent")
+        request = branch.get("request", "")
+        result = {"agent": agent_name, "request": request}
+        agent_tool = self._agent_tools.get(agent_name)
+        if agent_tool is None:
+            result["error"] = f"Unknown agent '{agent_name}'"
+            return result
+
+        started = time.perf_counter()
+        try:
+            result["response"] = await asyncio.wait_for(
+                agent_tool.run_async(args={"request": request}, tool_context=tool_context),
+                timeout=self.branch_timeout,
+            )
+        except asyncio.TimeoutError:
+            result["error"] = f"{agent_name} did not answer within {self.branch_timeout:g}s"
+        except Exception as e:
+            result["error"] = f"{agent_name} failed: {e}"
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        return result
+
+    async def run_async(self, *, args: Dict[str, Any], tool_context: ToolContext) -> Any:
+        branches = args.get("requests") or []
+        results = await asyncio.gather(
+            *(self._run_branch(branch, tool_context) for branch in branches)
+        )
+        return {"results": list(results)}
@@ -0,0 +1,212 @@
+import asyncio
+import os
+import random
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+
+FRESHSERVICE_TIMEOUT_SECONDS = float(os.getenv("FRESHSERVICE_TIMEOUT_SECONDS", "10"))
+FRESHSERVICE_CONNECT_TIMEOUT_SECONDS = float(os.getenv("FRESHSERVICE_CONNECT_TIMEOUT_SECONDS", "3"))
+FRESHSERVICE_MAX_CONNECTIONS = int(os.getenv("FRESHSERVICE_MAX_CONNECTIONS", "20"))
+FRESHSERVICE_MAX_RETRIES = int(os.getenv("FRESHSERVICE_MAX_RETRIES", "3"))
+FRESHSERVICE_BACKOFF_BASE_SECONDS = float(os.getenv("FRESHSERVICE_BACKOFF_BASE_SECONDS", "0.5"))
+FRESHSERVICE_BACKOFF_MAX_SECONDS = float(os.getenv("FRESHSERVICE_BACKOFF_MAX_SECONDS", "8"))
+FRESHSERVICE_BREAKER_THRESHOLD = int(os.getenv("FRESHSERVICE_BREAKER_THRESHOLD", "5"))
+FRESHSERVICE_BREAKER_RESET_SECONDS = float(os.getenv("FRESHSERVICE_BREAKER_RESET_SECONDS", "30"))
+# The Freshservice endpoint has always been called without certificate checks
+FRESHSERVICE_VERIFY_TLS = os.getenv("FRESHSERVICE_VERIFY_TLS", "0") == "1"
+
+# Ticket creation is not idempotent, so a POST is only re-sent when the
+# ticket can't have been created: the connection was never made, or the API
+# refused the request (429, or 503 with Retry-After). Read timeouts and other
+# 5xx may arrive after the ticket exists, and are returned to the caller.
+RETRYABLE_TRANSPORT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class CircuitOpenError(Exception):
+    """Raised when the circuit breaker is rejecting calls."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    After ``failure_threshold`` failures in a row the circuit opens and calls
+    fail fast for ``reset_timeout`` seconds. The first call after that is let
+    through as a trial: success closes the circuit, failure re-opens it.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self._state = self.CLOSED
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+        return self._state
+
+    def before_call(self) -> None:
+        state = self.state
+        if state == self.OPEN:
+            retry_in = self.reset_timeout - (time.monotonic() - self.opened_at)
+            raise CircuitOpenError(f"Freshservice circuit open, retry in {max(0.0, retry_in):.0f}s")
+        if state == self.HALF_OPEN:
+            # Only one trial call at a time; the rest keep failing fast
+            self._state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._state = self.CLOSED
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self._state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter for the given (0-based) retry."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class FreshserviceClient:
+    """Async Freshservice API client sharing one keep-alive connection pool.
+
+    Requests time out, failures that can't have created a ticket (connect
+    errors, 429, 503 with Retry-After) are retried with jittered backoff, and
+    a circuit breaker stops hammering the API while it is down.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        timeout: float = FRESHSERVICE_TIMEOUT_SECONDS,
+        connect_timeout: float = FRESHSERVICE_CONNECT_TIMEOUT_SECONDS,
+        max_connections: int = FRESHSERVICE_MAX_CONNECTIONS,
+        max_retries: int = FRESHSERVICE_MAX_RETRIES,
+        backoff_base: float = FRESHSERVICE_BACKOFF_BASE_SECONDS,
+        backoff_max: float = FRESHSERVICE_BACKOFF_MAX_SECONDS,
+        breaker: Optional[CircuitBreaker] = None,
+        verify: bool = FRESHSERVICE_VERIFY_TLS,
+    ) -> None:
+        self._url = url
+        self._api_key = api_key
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        )
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker(
+            FRESHSERVICE_BREAKER_THRESHOLD, FRESHSERVICE_BREAKER_RESET_SECONDS
+        )
+        self.verify = verify
+        self._client: Optional[httpx.AsyncClient] = None
+
+    # Read lazily so values loaded by load_dotenv() after import are picked up
+    @property
+    def url(self) -> Optional[str]:
+        return self._url or os.getenv("FRESHSERVICE_URL")
+
+    @property
+    def api_key(self) -> Optional[str]:
+        return self._api_key or os.getenv("FRESHSERVICE_API_KEY")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created on first use so it binds to the running event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                auth=(self.api_key or "", "X"),
+                headers={"Content-Type": "application/json"},
+                timeout=self.timeout,
+                limits=self.limits,
+                verify=self.verify,
+            )
+        return self._client
+
+    def _retry_after(self, response: httpx.Response, attempt: int) -> float:
+        delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+        header = response.headers.get("Retry-After")
+        if header and header.isdigit():
+            delay = max(delay, min(float(header), self.backoff_max))
+        return delay
+
+    @staticmethod
+    def _refused(response: httpx.Response) -> bool:
+        """Whether the API turned the request away without processing it."""
+        if response.status_code == 429:
+            return True
+        return response.status_code == 503 and "Retry-After" in response.headers
+
+    async def create_ticket(self, payload: Dict[str, Any]) -> Tuple[int, Any]:
+        """POST ``payload`` to the tickets endpoint. Returns (status, body).
+
+        Raises CircuitOpenError while the breaker is open, and the httpx
+        error if the request failed at the transport level (after retrying
+        connection failures).
+        """
+        status_code, body, _ = await self.send_ticket(payload)
+        return status_code, body
+
+    async def send_ticket(self, payload: Dict[str, Any]) -> Tuple[int, Any, bool]:
+        """Like :meth:`create_ticket`, returning (status, body, refused).
+
+        ``refused`` is set when the API turned the last attempt away without
+        processing it (429, or 503 with Retry-After), so sending the ticket
+        again later can't duplicate it.
+        """
+        if not self.url:
+            raise ValueError("FRESHSERVICE_URL is not configured")
+        self.breaker.before_call()
+
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                response = await self.client.post(self.url, json=payload)
+            except RETRYABLE_TRANSPORT_ERRORS:
+                if last_attempt:
+                    self.breaker.record_failure()
+                    raise
+                await asyncio.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_max))
+                continue
+            except httpx.TransportError:
+                # The request may have reached Freshservice; re-sending could duplicate it
+                self.breaker.record_failure()
+                raise
+
+            refused = self._refused(response)
+            if refused and not last_attempt:
+                await asyncio.sleep(self._retry_after(response, attempt))
+                continue
+
+            if response.status_code >= 500 or response.status_code == 429:
+                self.breaker.record_failure()
+            else:
+                # 4xx other than 429 means the API is up and rejected the ticket
+                self.breaker.record_success()
+            try:
+                body = response.json()
+            except ValueError:
+                body = response.text
+            return response.status_code, body, refused
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+freshservice_client = FreshserviceClient()
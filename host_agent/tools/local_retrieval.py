@@ -0,0 +1,249 @@
+"""In-process vector retrieval over corpora stored on disk.
+
+A corpus directory holds:
+
+- ``embeddings.npy``: float32 matrix, one L2-normalized row per chunk
+  (memory-mapped, so large corpora are paged in on demand)
+- ``chunks.jsonl``: one ``{"text": ..., "source": ...}`` object per row
+- ``meta.json``: embedder settings used to build the matrix
+- ``ivf.npz``: inverted-file index (built and saved on first load if missing)
+
+Build a corpus from a folder of .txt/.md files with::
+
+    python -m host_agent.tools.local_retrieval <source_dir> <corpus_dir>
+"""
+import argparse
+import asyncio
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from google.adk.tools.retrieval.base_retrieval_tool import BaseRetrievalTool
+from google.adk.tools.tool_context import ToolContext
+
+from embeddings import HashingEmbedder
+
+
+_KMEANS_ITERATIONS = 10
+_BLOCK_ROWS = 65536
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _assign(embeddings: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid (by cosine) for every row, computed in blocks."""
+    assignment = np.empty(len(embeddings), dtype=np.int32)
+    for start in range(0, len(embeddings), _BLOCK_ROWS):
+        block = np.asarray(embeddings[start : start + _BLOCK_ROWS])
+        assignment[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignment
+
+
+class IVFIndex:
+    """Inverted-file ANN index: k-means coarse quantizer plus posting lists.
+
+    A query scores only the rows in the ``nprobe`` lists whose centroids are
+    closest to it, instead of the whole matrix.
+    """
+
+    def __init__(self, centroids: np.ndarray, order: np.ndarray, offsets: np.ndarray) -> None:
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, nlist: Optional[int] = None, seed: int = 0) -> "IVFIndex":
+        n = len(embeddings)
+        nlist = nlist or max(1, int(np.sqrt(n)))
+        nlist = min(nlist, n)
+        rng = np.random.default_rng(seed)
+        centroids = np.array(embeddings[np.sort(rng.choice(n, nlist, replace=False))], dtype=np.float32)
+
+        for _ in range(_KMEANS_ITERATIONS):
+            assignment = _assign(embeddings, centroids)
+            for j in range(nlist):
+                members = np.flatnonzero(assignment == j)
+                if len(members):
+                    centroids[j] = np.asarray(embeddings[members]).mean(axis=0)
+            centroids = _normalize_rows(centroids).astype(np.float32)
+
+        assignment = _assign(embeddings, centroids)
+        order = np.argsort(assignment, kind="stable").astype(np.int64)
+        counts = np.bincount(assignment, minlength=nlist)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return cls(centroids, order, offsets)
+
+    @classmethod
+    def load(cls, path: Path) -> "IVFIndex":
+        data = np.load(path)
+        return cls(data["centroids"], data["order"], data["offsets"])
+
+    def save(self, path: Path) -> None:
+        np.savez(path, centroids=self.centroids, order=self.order, offsets=self.offsets)
+
+    def search(self, embeddings: np.ndarray, query: np.ndarray, top_k: int, nprobe: int):
+        """Return (row_ids, similarities) of the best ``top_k`` rows."""
+        nprobe = min(nprobe, len(self.centroids))
+        lists = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        candidates = np.concatenate(
+            [self.order[self.offsets[j] : self.offsets[j + 1]] for j in lists]
+        )
+        if not len(candidates):
+            return candidates, np.empty(0, dtype=np.float32)
+        candidates.sort()  # sequential reads from the memory-mapped matrix
+        scores = np.asarray(embeddings[candidates]) @ query
+        k = min(top_k, len(candidates))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return candidates[best], scores[best]
+
+
+class LocalVectorCorpus:
+    """A corpus directory loaded for in-process top-k queries."""
+
+    def __init__(self, corpus_dir: str, nprobe: int = 8) -> None:
+        self.corpus_dir = Path(corpus_dir)
+        self.nprobe = nprobe
+        meta = json.loads((self.corpus_dir / "meta.json").read_text())
+        self.embedder = HashingEmbedder(dim=meta["dim"], char_ngram=meta.get("char_ngram", 3))
+        self.embeddings = np.load(self.corpus_dir / "embeddings.npy", mmap_mode="r")
+        with open(self.corpus_dir / "chunks.jsonl", encoding="utf-8") as f:
+            self.chunks = [json.loads(line) for line in f if line.strip()]
+
+        index_path = self.corpus_dir / "ivf.npz"
+        if index_path.exists():
+            self.index = IVFIndex.load(index_path)
+        else:
+            self.index = IVFIndex.build(self.embeddings)
+            self.index.save(index_path)
+
+    def query(self, text: str, top_k: int = 10, max_distance: Optional[float] = None) -> List[Dict[str, Any]]:
+        query = np.asarray(self.embedder.embed(text), dtype=np.float32)
+        if not query.any():
+            return []
+        rows, scores = self.index.search(self.embeddings, query, top_k, self.nprobe)
+        results = []
+        for row, score in zip(rows, scores):
+            # Same convention as Vertex RAG: cosine distance, lower is closer
+            distance = 1.0 - float(score)
+            if max_distance is not None and distance > max_distance:
+                continue
+            results.append({**self.chunks[row], "distance": distance})
+        return results
+
+
+class LocalVectorRetrieval(BaseRetrievalTool):
+    """Drop-in replacement for VertexAiRagRetrieval backed by a local corpus.
+
+    Exposes the same ``query`` function declaration and returns the same
+    shape of result (a list of chunk texts, or a "no result" message).
+    """
+
+    def __init__(
+        self,
+        *,
+        name: str,
+        description: str,
+        corpus_dir: str,
+        similarity_top_k: int = 10,
+        vector_distance_threshold: Optional[float] = None,
+        nprobe: int = 8,
+    ):
+        super().__init__(name=name, description=description)
+        self.corpus_dir = corpus_dir
+        self.similarity_top_k = similarity_top_k
+        self.vector_distance_threshold = vector_distance_threshold
+        self.nprobe = nprobe
+        self._corpus: Optional[LocalVectorCorpus] = None
+
+    @property
+    def corpus(self) -> LocalVectorCorpus:
+        # Loaded on first use so importing the agents stays cheap
+        if self._corpus is None:
+            self._corpus = LocalVectorCorpus(self.corpus_dir, nprobe=self.nprobe)
+        return self._corpus
+
+    def _retrieve(self, query: str) -> Any:
+        results = self.corpus.query(
+            query, top_k=self.similarity_top_k, max_distance=self.vector_distance_threshold
+        )
+        if not results:
+            return f"No matching result found in local corpus {self.corpus_dir}"
+        return [r["text"] for r in results]
+
+    async def run_async(self, *, args: Dict[str, Any], tool_context: ToolContext) -> Any:
+        return await asyncio.to_thread(self._retrieve, args["query"])
+
+
+def _chunk_text(text: str, chunk_chars: int, overlap: int) -> List[str]:
+    paragraphs = [p.strip() for p in text.split("\n\n") if p.strip()]
+    chunks, current = [], ""
+    for paragraph in paragraphs:
+        if current and len(current) + len(paragraph) + 2 > chunk_chars:
+            chunks.append(current)
+            current = current[-overlap:] if overlap else ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+        while len(current) > chunk_chars:
+            chunks.append(current[:chunk_chars])
+            current = current[chunk_chars - overlap :]
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def build_local_corpus(
+    source_dir: str,
+    corpus_dir: str,
+    dim: int = 512,
+    chunk_chars: int = 1200,
+    overlap: int = 200,
+    nlist: Optional[int] = None,
+) -> int:
+    """Chunk and embed every .txt/.md file under ``source_dir``.
+
+    Returns the number of chunks written to ``corpus_dir``.
+    """
+    embedder = HashingEmbedder(dim=dim)
+    out = Path(corpus_dir)
+    out.mkdir(parents=True, exist_ok=True)
+
+    chunks = []
+    for path in sorted(Path(source_dir).rglob("*")):
+        if path.suffix.lower() not in (".txt", ".md") or not path.is_file():
+            continue
+        text = path.read_text(encoding="utf-8", errors="ignore")
+        for chunk in _chunk_text(text, chunk_chars, overlap):
+            chunks.append({"text": chunk, "source": str(path.relative_to(source_dir))})
+    if not chunks:
+        raise ValueError(f"No .txt or .md files found under {source_dir}")
+
+    embeddings = np.asarray([embedder.embed(c["text"]) for c in chunks], dtype=np.float32)
+    np.save(out / "embeddings.npy", embeddings)
+    with open(out / "chunks.jsonl", "w", encoding="utf-8") as f:
+        for chunk in chunks:
+            f.write(json.dumps(chunk) + "\n")
+    (out / "meta.json").write_text(
+        json.dumps({"embedder": "hashing", "dim": dim, "char_ngram": embedder.char_ngram})
+    )
+    IVFIndex.build(embeddings, nlist=nlist).save(out / "ivf.npz")
+    return len(chunks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a local retrieval corpus")
+    parser.add_argument("source_dir", help="Folder of .txt/.md documents")
+    parser.add_argument("corpus_dir", help="Output corpus folder")
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--chunk-chars", type=int, default=1200)
+    parser.add_argument("--nlist", type=int, default=None)
+    args = parser.parse_args()
+    count = build_local_corpus(
+        args.source_dir, args.corpus_dir, dim=args.dim, chunk_chars=args.chunk_chars, nlist=args.nlist
+    )
+    print(f"Wrote {count} chunks to {os.path.abspath(args.corpus_dir)}")
@@ -0,0 +1,109 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from google.adk.tools.retrieval.base_retrieval_tool import BaseRetrievalTool
+from google.adk.tools.retrieval.vertex_ai_rag_retrieval import VertexAiRagRetrieval
+from google.adk.tools.tool_context import ToolContext
+
+from embeddings import normalize_query
+
+
+# Set RAG_CACHE_ENABLED=0 to fall back to Gemini's built-in Vertex RAG retrieval
+RAG_CACHE_ENABLED = os.getenv("RAG_CACHE_ENABLED", "1") == "1"
+RAG_CACHE_SIZE = int(os.getenv("RAG_CACHE_SIZE", "2000"))
+RAG_CACHE_TTL_SECONDS = float(os.getenv("RAG_CACHE_TTL_SECONDS", "900"))
+
+
+class RetrievalCache:
+    """Size-bounded LRU of retrieval results keyed by (corpus, normalized query).
+
+    Each corpus gets its own TTL and hit/miss counters.
+    """
+
+    def __init__(self, max_entries: int = 2000) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Any, float]]" = OrderedDict()
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def _stats(self, corpus: str) -> Dict[str, int]:
+        return self.stats.setdefault(corpus, {"hits": 0, "misses": 0})
+
+    def get(self, corpus: str, query: str) -> Optional[Any]:
+        key = (corpus, normalize_query(query))
+        cached = self._entries.get(key)
+        if cached is not None and cached[1] >= time.monotonic():
+            self._entries.move_to_end(key)
+            self._stats(corpus)["hits"] += 1
+            return cached[0]
+        if cached is not None:
+            del self._entries[key]
+        self._stats(corpus)["misses"] += 1
+        return None
+
+    def put(self, corpus: str, query: str, result: Any, ttl: float) -> None:
+        key = (corpus, normalize_query(query))
+        self._entries[key] = (result, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate_corpus(self, corpus: str) -> int:
+        """Drop all cached results for a corpus. Returns the count."""
+        stale = [k for k in self._entries if k[0] == corpus]
+        for key in stale:
+            del self._entries[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+rag_cache = RetrievalCache(max_entries=RAG_CACHE_SIZE)
+
+
+class CachedRagRetrieval(VertexAiRagRetrieval):
+    """VertexAiRagRetrieval that memoizes results per normalized query.
+
+    Gemini 2 models normally get the corpus attached as a built-in retrieval
+    tool, which bypasses ``run_async`` entirely. To make results cacheable the
+    tool is always exposed as a function call instead; on a cache miss the
+    query is left to ``VertexAiRagRetrieval.run_async``.
+    """
+
+    def __init__(self, *, cache_ttl: float = RAG_CACHE_TTL_SECONDS, **kwargs):
+        super().__init__(**kwargs)
+        self.cache_ttl = cache_ttl
+
+    @property
+    def corpus_key(self) -> str:
+        store = self.vertex_rag_store
+        corpora = [r.rag_corpus for r in store.rag_resources or []] or store.rag_corpora or []
+        return ",".join(corpora)
+
+    async def process_llm_request(self, *, tool_context: ToolContext, llm_request) -> None:
+        if not RAG_CACHE_ENABLED:
+            return await super().process_llm_request(
+                tool_context=tool_context, llm_request=llm_request
+            )
+        # Skip VertexAiRagRetrieval's built-in path: declare a function call
+        await BaseRetrievalTool.process_llm_request(
+            self, tool_context=tool_context, llm_request=llm_request
+        )
+
+    async def run_async(self, *, args: Dict[str, Any], tool_context: ToolContext) -> Any:
+        if not RAG_CACHE_ENABLED:
+            return await super().run_async(args=args, tool_context=tool_context)
+
+        query = args["query"]
+        corpus = self.corpus_key
+        result = rag_cache.get(corpus, query)
+        if result is not None:
+            return result
+        result = await super().run_async(args=args, tool_context=tool_context)
+        rag_cache.put(corpus, query, result, self.cache_ttl)
+        return result
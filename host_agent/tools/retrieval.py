@@ -0,0 +1,51 @@
+import os
+
+from ..offline import AESS_OFFLINE
+from .rag_cache import CachedRagRetrieval
+
+
+def _setting(tool_name: str, suffix: str, default: str) -> str:
+    return os.getenv(f"{tool_name.upper()}_{suffix}", os.getenv(f"RAG_{suffix}", default))
+
+
+def build_retrieval_tool(*, name: str, description: str, **vertex_kwargs):
+    """Create a retrieval tool for an agent using the configured backend.
+
+    The backend is chosen per tool with ``<TOOL_NAME>_BACKEND`` (falling back
+    to ``RAG_BACKEND``):
+
+    - ``vertex`` (default): remote Vertex RAG corpus via CachedRagRetrieval
+    - ``local``: in-process vector index loaded from
+      ``<TOOL_NAME>_CORPUS_DIR`` (default ``corpora/<tool_name>``), see
+      ``host_agent/tools/local_retrieval.py`` for the on-disk format
+    - ``fake``: canned passages after a sampled delay, for offline
+      benchmarks (the default when ``AESS_OFFLINE=1``)
+
+    ``vertex_kwargs`` are the usual VertexAiRagRetrieval arguments
+    (``rag_resources``, ``similarity_top_k``, ``vector_distance_threshold``).
+    """
+    backend = _setting(name, "BACKEND", "fake" if AESS_OFFLINE else "vertex").lower()
+
+    if backend == "fake":
+        from .fake_retrieval import FakeRetrieval
+
+        return FakeRetrieval(name=name, description=description)
+
+    if backend == "local":
+        # numpy is only needed when a local corpus is actually used
+        from .local_retrieval import LocalVectorRetrieval
+
+        threshold = _setting(name, "DISTANCE_THRESHOLD", "")
+        return LocalVectorRetrieval(
+            name=name,
+            description=description,
+            corpus_dir=os.getenv(f"{name.upper()}_CORPUS_DIR", os.path.join("corpora", name)),
+            similarity_top_k=vertex_kwargs.get("similarity_top_k") or 10,
+            # Vertex thresholds don't carry over to the local embedder
+            vector_distance_threshold=float(threshold) if threshold else None,
+            nprobe=int(_setting(name, "NPROBE", "8")),
+        )
+
+    if backend != "vertex":
+        raise ValueError(f"Unknown retrieval backend '{backend}' for {name}")
+    return CachedRagRetrieval(name=name, description=description, **vertex_kwargs)
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from ticket_outbox import TicketOutbox, ticket_outbox
+
+from .freshservice import (
+    RETRYABLE_TRANSPORT_ERRORS,
+    CircuitOpenError,
+    FreshserviceClient,
+    backoff_delay,
+    freshservice_client,
+)
+
+
+logger = logging.getLogger(__name__)
+
+# Set TICKET_OUTBOX_ENABLED=0 to create tickets inline during the agent turn
+TICKET_OUTBOX_ENABLED = os.getenv("TICKET_OUTBOX_ENABLED", "1") == "1"
+TICKET_OUTBOX_WORKERS = int(os.getenv("TICKET_OUTBOX_WORKERS", "4"))
+TICKET_OUTBOX_BATCH_SIZE = int(os.getenv("TICKET_OUTBOX_BATCH_SIZE", "20"))
+TICKET_OUTBOX_POLL_SECONDS = float(os.getenv("TICKET_OUTBOX_POLL_SECONDS", "2"))
+TICKET_OUTBOX_LEASE_SECONDS = float(os.getenv("TICKET_OUTBOX_LEASE_SECONDS", "120"))
+TICKET_OUTBOX_MAX_ATTEMPTS = int(os.getenv("TICKET_OUTBOX_MAX_ATTEMPTS", "8"))
+TICKET_OUTBOX_RETRY_BASE_SECONDS = float(os.getenv("TICKET_OUTBOX_RETRY_BASE_SECONDS", "30"))
+TICKET_OUTBOX_RETRY_MAX_SECONDS = float(os.getenv("TICKET_OUTBOX_RETRY_MAX_SECONDS", "1800"))
+
+
+class TicketDispatcher:
+    """Background delivery of outbox tickets to Freshservice.
+
+    Each cycle leases a batch of due jobs and sends them concurrently through
+    the shared client (at most ``workers`` at a time). A job's lease is
+    restarted when its send actually starts and its outcome is written as
+    soon as the send finishes (outcomes finishing together share one
+    transaction), so ``lease_seconds`` only has to cover one job, client
+    retries included, not the whole batch. A job whose lease was lost while
+    it waited is skipped.
+
+    Ticket creation isn't idempotent, so a job is only sent again when the
+    ticket can't have been created: the breaker was open, the connection
+    was never made, or the API refused the request (429, 503 with
+    Retry-After). Those retries use jittered backoff. Rejected tickets
+    (4xx), jobs out of attempts and outcomes that leave the ticket's fate
+    unknown (read timeouts, other 5xx, 2xx without a ticket id) are
+    dead-lettered; the last kind are marked "delivery unknown" for a person
+    to check in Freshservice.
+    """
+
+    def __init__(
+        self,
+        outbox: TicketOutbox,
+        client: FreshserviceClient,
+        workers: int = TICKET_OUTBOX_WORKERS,
+        batch_size: int = TICKET_OUTBOX_BATCH_SIZE,
+        poll_interval: float = TICKET_OUTBOX_POLL_SECONDS,
+        lease_seconds: float = TICKET_OUTBOX_LEASE_SECONDS,
+        max_attempts: int = TICKET_OUTBOX_MAX_ATTEMPTS,
+        retry_base: float = TICKET_OUTBOX_RETRY_BASE_SECONDS,
+        retry_max: float = TICKET_OUTBOX_RETRY_MAX_SECONDS,
+    ) -> None:
+        self.outbox = outbox
+        self.client = client
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    async def submit(self, payload: Dict[str, Any], user_id: str, session_id: Optional[str] = None) -> str:
+        """Persist a ticket and wake the dispatcher. Returns the reference."""
+        ref = await asyncio.to_thread(self.outbox.enqueue, payload, user_id, session_id)
+        if self._wake is not None:
+            self._wake.set()
+        return ref
+
+    def _retry_at(self, attempts: int) -> float:
+        return time.time() + self.retry_base + backoff_delay(attempts, self.retry_base, self.retry_max)
+
+    async def _deliver(self, job, semaphore: asyncio.Semaphore, outcomes: Dict[str, list]) -> None:
+        ref, payload, attempts, leased_until = job
+        async with semaphore:
+            renewed = await asyncio.to_thread(self.outbox.renew_lease, ref, leased_until, self.lease_seconds)
+            if renewed is None:
+                logger.warning("Ticket %s lease lost before sending; left to its new owner", ref, extra={"ticket_ref": ref})
+                return
+            try:
+                status_code, body, refused = await self.client.send_ticket(payload)
+            except CircuitOpenError as e:
+                # Nothing was sent; wait out the breaker without using an attempt
+                retry_at = time.time() + self.client.breaker.reset_timeout
+                outcomes["retries"].append((ref, retry_at, str(e), False))
+                return
+            except (*RETRYABLE_TRANSPORT_ERRORS, ValueError) as e:
+                # Never reached Freshservice (or it isn't configured yet)
+                status_code, body, refused = None, f"{type(e).__name__}: {e}", True
+            except httpx.HTTPError as e:
+                status_code, body, refused = None, f"{type(e).__name__}: {e}", False
+
+        if status_code in (200, 201):
+            ticket_id = body.get("ticket", {}).get("id") if isinstance(body, dict) else None
+            if ticket_id is not None:
+                outcomes["delivered"].append((ref, ticket_id))
+                logger.info("Ticket %s delivered as Freshservice #%s", ref, ticket_id, extra={"ticket_ref": ref})
+                return
+
+        error = f"HTTP {status_code}: {body}" if status_code else str(body)
+        if refused and attempts + 1 < self.max_attempts:
+            outcomes["retries"].append((ref, self._retry_at(attempts), error, True))
+        elif refused or (status_code is not None and 400 <= status_code < 500):
+            outcomes["dead"].append((ref, error))
+            logger.warning(
+                "Ticket %s dead-lettered after %d attempt(s): %s", ref, attempts + 1, error, extra={"ticket_ref": ref}
+            )
+        else:
+            # The ticket may exist, so re-sending could duplicate it
+            error = f"delivery unknown, check Freshservice before re-sending: {error}"
+            outcomes["dead"].append((ref, error))
+            logger.warning("Ticket %s dead-lettered: %s", ref, error, extra={"ticket_ref": ref})
+
+    async def _record(self, outcomes: Dict[str, list], lock: asyncio.Lock) -> None:
+        # Whoever holds the lock writes everything finished so far, so
+        # outcomes that pile up behind a write go out together in the next one
+        async with lock:
+            pending = {key: values[:] for key, values in outcomes.items()}
+            if not any(pending.values()):
+                return
+            for values in outcomes.values():
+                values.clear()
+            await asyncio.to_thread(self.outbox.record_results, **pending)
+
+    async def _send(self, job, semaphore: asyncio.Semaphore, outcomes: Dict[str, list], lock: asyncio.Lock) -> None:
+        await self._deliver(job, semaphore, outcomes)
+        await self._record(outcomes, lock)
+
+    async def run_once(self) -> int:
+        """Deliver one batch of due tickets. Returns how many were attempted."""
+        jobs = await asyncio.to_thread(self.outbox.claim_due, self.batch_size, self.lease_seconds)
+        if not jobs:
+            return 0
+        outcomes = {"delivered": [], "retries": [], "dead": []}
+        semaphore = asyncio.Semaphore(self.workers)
+        lock = asyncio.Lock()
+        await asyncio.gather(*(self._send(job, semaphore, outcomes, lock) for job in jobs))
+        return len(jobs)
+
+    async def _loop(self) -> None:
+        while not self._stopping:
+            try:
+                attempted = await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ticket dispatcher error")
+                attempted = 0
+            if attempted >= self.batch_size or self._stopping:
+                continue  # more may be waiting
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def start(self) -> None:
+        """Start the delivery loop on the running event loop."""
+        if self._task is None:
+            self._stopping = False
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Finish the batch in flight, then stop.
+
+        If the batch doesn't finish within ``timeout`` the loop is cancelled;
+        its jobs are picked up again once their lease runs out.
+        """
+        if self._task is not None:
+            self._stopping = True
+            self._wake.set()
+            try:
+                await asyncio.wait_for(self._task, timeout=timeout)
+            except asyncio.TimeoutError:
+                pass  # wait_for has cancelled the loop
+            self._task = None
+            self._wake = None
+
+
+ticket_dispatcher = TicketDispatcher(ticket_outbox, freshservice_client)
@@ -0,0 +1,194 @@
+import os
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+from embeddings import HashingEmbedder, cosine_sparse, default_embedder, tokenize
+
+
+# Routing examples, taken from the host_agent instruction's delegation rules
+# and sample scenarios
+ROUTING_EXAMPLES: Dict[str, List[str]] = {
+    "policy_agent": [
+        "Can I carry forward my unused earned leave?",
+        "What is the company's leave policy?",
+        "What are the working hours?",
+        "What is the dress code policy?",
+        "What is the expense reimbursement policy?",
+        "What is the code of conduct?",
+        "What benefits does the company offer?",
+        "What is the work from home policy?",
+        "What is the travel policy?",
+    ],
+    "payroll_query_agent": [
+        "When will I get my Form 16?",
+        "When will I get my salary?",
+        "What is my current salary?",
+        "What are the tax deductions from my salary?",
+        "How can I download my payslip?",
+        "What is my salary for december 2024?",
+        "Why is my salary less compared to the previous month?",
+        "When is the payroll cycle?",
+        "What is my withholding tax?",
+    ],
+    "leave_management_agent": [
+        "What is my available leave balance?",
+        "What is my leave balance?",
+        "How many annual leaves do I have?",
+        "Can I check my sick leave balance?",
+        "How many sick leaves do I have left?",
+        "What types of leaves are available to me?",
+        "How many casual leaves have I taken?",
+    ],
+    "case_management_agent": [
+        "Apply leave from 15th to 18th August",
+        "I need to apply for leave",
+        "None of this is helping, I need to speak to HR",
+        "Create a support ticket for me",
+        "I want to speak to HR about a personal issue",
+        "I have an urgent issue that needs immediate attention",
+        "I need human support",
+    ],
+}
+
+# Words that strongly signal one specialist
+ROUTING_KEYWORDS: Dict[str, frozenset] = {
+    "policy_agent": frozenset(
+        "policy policies dress code conduct hours working reimbursement expense "
+        "expenses benefits travel carry forward rules".split()
+    ),
+    "payroll_query_agent": frozenset(
+        "salary payslip payslips pay payroll tax taxes deduction deductions form "
+        "16 withholding bonus ctc".split()
+    ),
+    "leave_management_agent": frozenset("balance balances left remaining taken".split()),
+    "case_management_agent": frozenset(
+        "ticket apply hr human urgent escalate support speak cancel".split()
+    ),
+}
+
+# Specialists the fast path may call directly. Ticket creation stays with the
+# host so it can confirm details first, as its instruction requires.
+FAST_PATH_AGENTS = frozenset({"policy_agent", "payroll_query_agent", "leave_management_agent"})
+
+FAST_PATH_MIN_SCORE = float(os.getenv("FAST_PATH_MIN_SCORE", "0.55"))
+FAST_PATH_MIN_MARGIN = float(os.getenv("FAST_PATH_MIN_MARGIN", "0.15"))
+
+_KEYWORD_WEIGHT = 0.4
+
+
+def _centroid(vectors: List[Dict[int, float]]) -> Dict[int, float]:
+    total: Dict[int, float] = {}
+    for vec in vectors:
+        for k, v in vec.items():
+            total[k] = total.get(k, 0.0) + v
+    norm = sum(v * v for v in total.values()) ** 0.5 or 1.0
+    return {k: v / norm for k, v in total.items()}
+
+
+class IntentRouter:
+    """Keyword + nearest-centroid classifier over the host routing examples.
+
+    Each agent's score blends the cosine similarity between the query and the
+    centroid of its examples with the share of its keywords in the query.
+    A query is routed only when the best score is high enough and clearly
+    ahead of the runner-up; anything else goes to the LLM router.
+    """
+
+    def __init__(
+        self,
+        examples: Dict[str, List[str]] = ROUTING_EXAMPLES,
+        keywords: Dict[str, frozenset] = ROUTING_KEYWORDS,
+        min_score: float = FAST_PATH_MIN_SCORE,
+        min_margin: float = FAST_PATH_MIN_MARGIN,
+        embedder: HashingEmbedder = default_embedder,
+    ) -> None:
+        self.embedder = embedder
+        self.keywords = keywords
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.centroids = {
+            agent: _centroid([embedder.embed_sparse(e) for e in texts])
+            for agent, texts in examples.items()
+        }
+
+    def scores(self, query: str) -> Dict[str, float]:
+        embedding = self.embedder.embed_sparse(query)
+        tokens = tokenize(query)
+        scores = {}
+        for agent, centroid in self.centroids.items():
+            hits = sum(1 for t in tokens if t in self.keywords.get(agent, ()))
+            keyword_score = min(1.0, hits / 2)
+            scores[agent] = (1 - _KEYWORD_WEIGHT) * cosine_sparse(embedding, centroid) + _KEYWORD_WEIGHT * keyword_score
+        return scores
+
+    def classify(self, query: str) -> Tuple[Optional[str], float]:
+        """Return (best agent, confidence margin) for a query."""
+        ranked = sorted(self.scores(query).items(), key=lambda kv: kv[1], reverse=True)
+        if not ranked or ranked[0][1] <= 0:
+            return None, 0.0
+        best_agent, best = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        return best_agent, best - runner_up
+
+    def route(self, query: str) -> Tuple[Optional[str], Optional[str]]:
+        """Return (agent to call directly or None, predicted agent)."""
+        scores = self.scores(query)
+        predicted, margin = self.classify(query)
+        if (
+            predicted in FAST_PATH_AGENTS
+            and scores[predicted] >= self.min_score
+            and margin >= self.min_margin
+        ):
+            return predicted, predicted
+        return None, predicted
+
+
+class RoutingStats:
+    """Fast-path usage, agreement with the LLM router and latency saved.
+
+    Accuracy is measured on queries that went to the LLM router: the router's
+    prediction is compared with the specialist the host actually called.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.fast_path = 0
+        self.llm_routed = 0
+        self.compared = 0
+        self.agreed = 0
+        self.fast_path_seconds = 0.0
+        self.llm_routed_seconds = 0.0
+
+    def record_fast_path(self, seconds: float) -> None:
+        with self._lock:
+            self.fast_path += 1
+            self.fast_path_seconds += seconds
+
+    def record_llm_routed(self, seconds: float, predicted: Optional[str], agents_called) -> None:
+        with self._lock:
+            self.llm_routed += 1
+            self.llm_routed_seconds += seconds
+            specialists = set(agents_called) & set(ROUTING_EXAMPLES)
+            # Only single-specialist turns have an unambiguous label
+            if predicted and len(specialists) == 1:
+                self.compared += 1
+                self.agreed += int(predicted in specialists)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            avg_fast = self.fast_path_seconds / self.fast_path if self.fast_path else 0.0
+            avg_llm = self.llm_routed_seconds / self.llm_routed if self.llm_routed else 0.0
+            saved = (avg_llm - avg_fast) * self.fast_path if self.fast_path and self.llm_routed else 0.0
+            return {
+                "fast_path_requests": self.fast_path,
+                "llm_routed_requests": self.llm_routed,
+                "routing_accuracy": self.agreed / self.compared if self.compared else None,
+                "routing_samples": self.compared,
+                "avg_fast_path_seconds": avg_fast,
+                "avg_llm_routed_seconds": avg_llm,
+                "estimated_seconds_saved": max(0.0, saved),
+            }
+
+
+intent_router = IntentRouter()
+routing_stats = RoutingStats()
@@ -0,0 +1,158 @@
+"""Queue-backed structured logging.
+
+Log calls only build a LogRecord and put it on a bounded in-memory queue; a
+QueueListener thread formats and writes it. Messages whose arguments are all
+immutable (strings, numbers, ...) are formatted on the listener thread too;
+anything else is formatted by the caller, so the line shows the object as it
+was when it was logged, not after the agent run has changed it. When the
+queue is full, records are dropped (and counted) instead of blocking the
+caller.
+
+Settings:
+
+- ``LOG_LEVEL``: root level (default ``INFO``)
+- ``LOG_FORMAT``: ``console`` (coloured, human readable) or ``json``
+  (one object per line, with any ``extra=`` fields as keys)
+- ``LOG_EVENT_SAMPLE_RATE``: fraction of agent runs whose per-event DEBUG
+  lines are kept (default 1.0)
+- ``LOG_QUEUE_SIZE``: records buffered before dropping (default 10000)
+- ``LOG_LIBRARY_LEVEL``: level for chatty third-party loggers such as ADK
+  and httpx (default ``WARNING``)
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+from typing import Optional
+
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "console")
+LOG_EVENT_SAMPLE_RATE = float(os.getenv("LOG_EVENT_SAMPLE_RATE", "1.0"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_LIBRARY_LEVEL = os.getenv("LOG_LIBRARY_LEVEL", "WARNING").upper()
+
+_LIBRARY_LOGGERS = ("google_adk", "google_genai", "httpx", "httpcore")
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_LEVEL_COLORS = {
+    logging.DEBUG: "\033[2m",
+    logging.INFO: "\033[36m",
+    logging.WARNING: "\033[33m",
+    logging.ERROR: "\033[31m",
+    logging.CRITICAL: "\033[41m\033[37m",
+}
+_RESET = "\033[0m"
+
+# Argument types that can't change between the log call and the listener
+_IMMUTABLE_ARGS = (str, int, float, bool, bytes, type(None))
+
+
+def _extra_fields(record: logging.LogRecord) -> dict:
+    return {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, msg and extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ConsoleFormatter(logging.Formatter):
+    """Coloured ``time level logger: message key=value ...`` lines."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        stamp = time.strftime("%H:%M:%S", time.localtime(record.created))
+        fields = " ".join(f"{k}={v}" for k, v in _extra_fields(record).items())
+        color = _LEVEL_COLORS.get(record.levelno, "")
+        line = f"{stamp} {color}{record.levelname:<7}{_RESET} {record.name}: {record.getMessage()}"
+        if fields:
+            line += f" {color}{fields}{_RESET}"
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def _immutable(args) -> bool:
+    if isinstance(args, tuple):
+        return all(_immutable(arg) for arg in args)
+    return isinstance(args, _IMMUTABLE_ARGS)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks and formats as little as it safely can."""
+
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Immutable arguments cross threads as they are and the listener
+        # formats them; mutable ones (events, tool args) are snapshotted here
+        if record.args and not _immutable(record.args):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional[DroppingQueueHandler] = None
+
+
+def setup_logging() -> None:
+    """Route the root logger through the queue. Safe to call more than once."""
+    global _listener, _handler
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else ConsoleFormatter())
+    _handler = DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    root = logging.getLogger()
+    root.handlers = [_handler]
+    root.setLevel(LOG_LEVEL)
+    for name in _LIBRARY_LOGGERS:
+        logging.getLogger(name).setLevel(LOG_LIBRARY_LEVEL)
+    _listener = logging.handlers.QueueListener(_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Drain the queue and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def dropped_records() -> int:
+    """Records dropped because the queue was full."""
+    return _handler.dropped if _handler else 0
+
+
+def sample_events() -> bool:
+    """Whether to keep per-event DEBUG logging for one agent run."""
+    return LOG_EVENT_SAMPLE_RATE >= 1.0 or random.random() < LOG_EVENT_SAMPLE_RATE
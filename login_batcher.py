@@ -0,0 +1,323 @@
+"""Batched session creation for /login.
+
+Each login needs a row in ADK's session database and one in the auth
+session store. Done one by one, a login storm costs two transactions (two
+fsyncs) per user. :class:`LoginBatcher` queues logins and a single worker
+drains them in groups: up to ``LOGIN_BATCH_MAX_SIZE`` logins, or whatever
+arrived within ``LOGIN_BATCH_WINDOW_MS`` of the first one, become one ADK
+transaction plus one auth-store transaction.
+
+The queue is bounded (``LOGIN_QUEUE_SIZE``). When it is full, ``submit``
+raises :class:`LoginQueueFull` straight away, and /login answers 503 with
+Retry-After instead of letting latency grow without bound; a login that
+isn't processed within ``LOGIN_SUBMIT_TIMEOUT_SECONDS`` gets the same answer. Queue depth,
+batch sizes, queueing delay and rejections are exported on /metrics.
+
+The batched ADK insert mirrors private DatabaseSessionService internals, so
+requirements.txt pins google-adk to the minor version it was written
+against. If those internals are missing or have changed shape,
+``create_sessions`` falls back to calling ``create_session`` per login.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.adk.sessions.session import Session
+
+try:
+    from google.adk.sessions import _session_util
+    from google.adk.sessions.database_session_service import _get_or_create_state, _merge_state
+except ImportError:  # ADK moved its internals; use the per-login fallback
+    _session_util = None
+
+from metrics import registry
+
+
+logger = logging.getLogger(__name__)
+
+LOGIN_BATCHING_ENABLED = os.getenv("LOGIN_BATCHING_ENABLED", "1") == "1"
+LOGIN_BATCH_MAX_SIZE = int(os.getenv("LOGIN_BATCH_MAX_SIZE", "64"))
+LOGIN_BATCH_WINDOW_MS = float(os.getenv("LOGIN_BATCH_WINDOW_MS", "5"))
+LOGIN_QUEUE_SIZE = int(os.getenv("LOGIN_QUEUE_SIZE", "2000"))
+LOGIN_SUBMIT_TIMEOUT_SECONDS = float(os.getenv("LOGIN_SUBMIT_TIMEOUT_SECONDS", "30"))
+
+LOGIN_QUEUE_DEPTH = registry.gauge(
+    "aess_login_queue_depth",
+    "Logins waiting for batched session creation.",
+)
+LOGIN_BATCH_SIZE = registry.histogram(
+    "aess_login_batch_size",
+    "Logins per session-creation batch.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+LOGIN_QUEUE_WAIT = registry.histogram(
+    "aess_login_queue_wait_seconds",
+    "Time a login waited in the queue before its batch started.",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+LOGIN_REJECTED = registry.counter(
+    "aess_login_rejected_total",
+    "Logins turned away because the session-creation queue was full.",
+)
+
+
+class LoginQueueFull(Exception):
+    """The login queue is at capacity; the client should retry later."""
+
+
+class LoginTimeout(LoginQueueFull):
+    """A queued login wasn't processed in time; the client should retry later."""
+
+
+class BatchSessionCreateMixin:
+    """Adds ``create_sessions`` (many sessions, one transaction) to DatabaseSessionService.
+
+    Mirrors DatabaseSessionService.create_session, sharing one database
+    session and one commit across the batch.
+    """
+
+    _batch_insert_supported = _session_util is not None
+
+    async def create_sessions(
+        self, *, app_name: str, sessions: List[Tuple[str, str, Dict[str, Any]]]
+    ) -> List[Session]:
+        """Create ``(user_id, session_id, state)`` sessions in one transaction.
+
+        Without the ADK internals this creates them one by one instead, and
+        deletes the ones already created if a later one fails.
+        """
+        if self._batch_insert_supported:
+            try:
+                return await self._insert_sessions(app_name, sessions)
+            except AttributeError as e:
+                # Raised before anything is committed; the transaction rolled back
+                logger.warning("Batched session insert unavailable (%s); creating sessions one by one", e)
+                type(self)._batch_insert_supported = False
+
+        created = []
+        try:
+            for user_id, session_id, state in sessions:
+                created.append(
+                    await self.create_session(
+                        app_name=app_name, user_id=user_id, state=state, session_id=session_id
+                    )
+                )
+        except Exception:
+            for session in created:
+                await self.delete_session(app_name=app_name, user_id=session.user_id, session_id=session.id)
+            raise
+        return created
+
+    async def _insert_sessions(
+        self, app_name: str, sessions: List[Tuple[str, str, Dict[str, Any]]]
+    ) -> List[Session]:
+        await self.prepare_tables()
+        schema = self._get_schema_classes()
+        now = datetime.now(timezone.utc)
+        if self._uses_naive_datetime():
+            now = now.replace(tzinfo=None)
+
+        async with self._rollback_on_exception_session() as sql_session:
+            app_state = await _get_or_create_state(
+                sql_session=sql_session,
+                state_model=schema.StorageAppState,
+                primary_key=app_name,
+                defaults={"app_name": app_name, "state": {}},
+            )
+            user_states = {}
+            created = []
+            for user_id, session_id, state in sessions:
+                if user_id not in user_states:
+                    user_states[user_id] = await _get_or_create_state(
+                        sql_session=sql_session,
+                        state_model=schema.StorageUserState,
+                        primary_key=(app_name, user_id),
+                        defaults={"app_name": app_name, "user_id": user_id, "state": {}},
+                    )
+                deltas = _session_util.extract_json_safe_state_delta(state or {})
+                if deltas["app"]:
+                    app_state.state.update(deltas["app"])
+                if deltas["user"]:
+                    user_states[user_id].state.update(deltas["user"])
+                storage_session = schema.StorageSession(
+                    app_name=app_name,
+                    user_id=user_id,
+                    id=session_id,
+                    state=deltas["session"],
+                    create_time=now,
+                    update_time=now,
+                )
+                sql_session.add(storage_session)
+                created.append((storage_session, user_id, deltas["session"]))
+
+            await sql_session.flush()
+            result = [
+                storage_session.to_session(
+                    state=_merge_state(app_state.state, user_states[user_id].state, session_state)
+                )
+                for storage_session, user_id, session_state in created
+            ]
+            await sql_session.commit()
+        return result
+
+
+class LoginBatcher:
+    """Coalesces concurrent logins into grouped session-creation transactions.
+
+    ``session_service`` must provide ``create_sessions`` (see
+    :class:`BatchSessionCreateMixin`) and ``auth_store`` ``create_sessions``.
+    If either insert fails for a batch, its logins are retried one by one
+    so a single bad request doesn't fail the rest; when the auth-store insert
+    fails, the ADK sessions already created for the batch are deleted first.
+    """
+
+    def __init__(
+        self,
+        session_service,
+        auth_store,
+        app_name: str,
+        max_batch: int = LOGIN_BATCH_MAX_SIZE,
+        window: float = LOGIN_BATCH_WINDOW_MS / 1000,
+        max_queue: int = LOGIN_QUEUE_SIZE,
+        timeout: float = LOGIN_SUBMIT_TIMEOUT_SECONDS,
+    ) -> None:
+        self.session_service = session_service
+        self.auth_store = auth_store
+        self.app_name = app_name
+        self.max_batch = max_batch
+        self.window = window
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    async def submit(self, user: Dict[str, Any], session_id: str, initial_state: Dict[str, Any]) -> Session:
+        """Queue one login and wait until both of its rows are committed."""
+        if self._queue is None or self._worker is None or self._worker.done():
+            self.start()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((user, session_id, initial_state, time.perf_counter(), future))
+        except asyncio.QueueFull:
+            LOGIN_REJECTED.inc()
+            raise LoginQueueFull()
+        LOGIN_QUEUE_DEPTH.set(self._queue.qsize())
+        try:
+            # wait_for cancels the future on timeout, so the worker skips it
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            raise LoginTimeout()
+
+    async def _next_batch(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                if self._queue.empty():
+                    break
+                batch.append(self._queue.get_nowait())
+                continue
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        LOGIN_QUEUE_DEPTH.set(self._queue.qsize())
+        return batch
+
+    async def _discard(self, sessions: List[Session]) -> None:
+        """Delete ADK sessions whose logins failed after they were created."""
+        for session in sessions:
+            try:
+                await self.session_service.delete_session(
+                    app_name=self.app_name, user_id=session.user_id, session_id=session.id
+                )
+            except Exception as e:
+                logger.warning("Could not delete orphaned session: %s", e, extra={"session_id": session.id})
+
+    async def _run_batch(self, batch: list) -> None:
+        # Logins whose caller already gave up
+        batch = [item for item in batch if not item[-1].done()]
+        if not batch:
+            return
+        try:
+            sessions = await self.session_service.create_sessions(
+                app_name=self.app_name,
+                sessions=[(user["user_email"], session_id, state) for user, session_id, state, _, _ in batch],
+            )
+        except Exception as e:
+            # The ADK transaction rolled back as a whole; isolate the bad login
+            if len(batch) > 1:
+                logger.warning("Login batch of %d failed (%s); retrying individually", len(batch), e)
+                for item in batch:
+                    await self._run_batch([item])
+                return
+            sessions, error = None, e
+        else:
+            try:
+                await self.auth_store.create_sessions(
+                    [
+                        (session_id, user["user_email"], user["user_name"], user["role"])
+                        for user, session_id, _, _, _ in batch
+                    ]
+                )
+                error = None
+            except Exception as e:
+                # Don't leave ADK sessions behind that no auth session points to
+                await self._discard(sessions)
+                if len(batch) > 1:
+                    logger.warning(
+                        "Auth sessions for a login batch of %d failed (%s); retrying individually", len(batch), e
+                    )
+                    for item in batch:
+                        await self._run_batch([item])
+                    return
+                sessions, error = None, e
+
+        for i, (*_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(sessions[i])
+
+    async def _loop(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            started = time.perf_counter()
+            for *_, queued_at, _ in batch:
+                LOGIN_QUEUE_WAIT.observe(started - queued_at)
+            LOGIN_BATCH_SIZE.observe(len(batch))
+            try:
+                await self._run_batch(batch)
+            except Exception as e:
+                # Keep the worker alive for the next batch
+                logger.exception("Login batch failed unexpectedly")
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def start(self) -> None:
+        """Start the batching worker on the running event loop."""
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Stop the worker; logins still queued fail with CancelledError."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        while self._queue is not None and not self._queue.empty():
+            *_, future = self._queue.get_nowait()
+            if not future.done():
+                future.cancel()
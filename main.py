@@ -1,33 +1,88 @@
 import asyncio
 import uuid
-from fastapi.responses import StreamingResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 import json
 import time
 import hashlib
 import os
 from datetime import datetime, timedelta
 
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from typing import Optional
 from dotenv import load_dotenv
+from google.adk.apps import App
+from google.adk.errors.already_exists_error import AlreadyExistsError
 from google.adk.runners import Runner
 from google.adk.sessions import DatabaseSessionService
 from google.genai import types
 
 # Import the main customer service agent
 from host_agent.agent import host_agent
-from utils import add_user_query_to_history, call_agent_async,process_agent_response_streaming
-from session_store import AuthSessionStore
+from host_agent.tools import CachedRagRetrieval, freshservice_client, rag_cache, ticket_dispatcher
+from utils import (
+    add_user_query_to_history,
+    add_agent_response_to_history,
+    call_agent_async,
+    call_specialist_async,
+    format_host_response,
+    start_specialist_session,
+    stream_agent_events,
+)
+from session_store import AuthSessionStore, AsyncAuthSessionStore
+from session_cache import CachedAuthSessionStore
+from history_store import history_store
+from response_cache import response_cache
+from intent_router import intent_router, routing_stats
+from ticket_outbox import ticket_outbox
+from history_window import history_window_stats
+from state_debug import state_snapshot_plugins
+from user_directory import build_user_directory
+from login_batcher import (
+    LOGIN_BATCHING_ENABLED,
+    BatchSessionCreateMixin,
+    LoginBatcher,
+    LoginQueueFull,
+)
+from state_deltas import StateDeltaMixin, state_delta_store
+from session_reaper import SESSION_REAPER_ENABLED, SessionPurgeMixin, SessionReaper
+from logging_setup import dropped_records, setup_logging, shutdown_logging
+from tracing import SessionTracingMixin, TracingMiddleware, setup_tracing, shutdown_tracing
+from metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    QUERIES_IN_FLIGHT,
+    MetricsMiddleware,
+    StreamTimer,
+    registry as metrics_registry,
+)
 
 load_dotenv()
+setup_logging()
+setup_tracing()
 
 # Using SQLite database for persistent storage
-db_url = "sqlite:///./my_agent_data.db"
-session_service = DatabaseSessionService(db_url=db_url)
+db_url = "sqlite+aiosqlite:///./my_agent_data.db"  # ADK 2.x needs an async driver
+
+
+class AppSessionService(
+    SessionTracingMixin,
+    StateDeltaMixin,
+    BatchSessionCreateMixin,
+    SessionPurgeMixin,
+    DatabaseSessionService,
+):
+    """DatabaseSessionService with traced calls, delta-persisted session state,
+    batched session creation and purging of expired sessions."""
+
+    state_store = state_delta_store
+
+
+session_service = AppSessionService(db_url=db_url)
 
 # ===== PART 1: User Management =====
-# Simple in-memory user store (in production, use a proper database)
+# Seed accounts, added to the user directory if missing (legacy SHA-256
+# hashes are wrapped in scrypt when seeded, and upgraded on first login)
 USERS_DB = {
     "demo@company.com": {
         "password_hash": hashlib.sha256("demo123".encode()).hexdigest(),
@@ -49,19 +104,50 @@ USERS_DB = {
     }
 }
 
-# Active sessions store (SQLite)
-auth_store = AuthSessionStore(db_path="auth_sessions.db")
+user_directory = build_user_directory(USERS_DB)
+
+# Active sessions store (pooled SQLite behind an async facade), fronted by an
+# in-memory cache that batches last_activity updates
+auth_store = CachedAuthSessionStore(
+    AsyncAuthSessionStore(AuthSessionStore(db_path="auth_sessions.db")),
+    max_entries=int(os.getenv("SESSION_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("SESSION_CACHE_TTL_SECONDS", "300")),
+    flush_interval=float(os.getenv("SESSION_ACTIVITY_FLUSH_SECONDS", "5")),
+)
 
 # ===== PART 2: App Config =====
 APP_NAME = "AESS"
 
+# SSE streaming: optional delay between flushes and window (ms) for
+# coalescing progress events into one flush. 0 disables both.
+STREAM_PACING_SECONDS = float(os.getenv("STREAM_PACING_SECONDS", "0"))
+STREAM_COALESCE_MS = float(os.getenv("STREAM_COALESCE_MS", "0"))
+
+# Serve repeated questions from the response cache
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") == "1"
+CACHE_HIT_PROGRESS = "⚡ Answer served from cache."
+
+# Send confidently classified queries straight to the specialist agent
+FAST_PATH_ROUTING = os.getenv("FAST_PATH_ROUTING", "1") == "1"
+
+# /login only writes the auth-store row; the ADK session is created on the
+# first query that needs the host agent
+LAZY_BACKEND_SESSIONS = os.getenv("LAZY_BACKEND_SESSIONS", "0") == "1"
+
 # ===== PART 3: Setup Runner =====
 runner = Runner(
-    agent=host_agent,
-    app_name=APP_NAME,
+    app=App(name=APP_NAME, root_agent=host_agent, plugins=state_snapshot_plugins()),
     session_service=session_service,
 )
 
+# Coalesces concurrent logins into grouped inserts into both stores
+login_batcher = LoginBatcher(session_service, auth_store, app_name=APP_NAME)
+
+# Expires idle sessions in every store that keeps them
+session_reaper = SessionReaper(
+    session_service, auth_store, history_store, state_delta_store, app_name=APP_NAME
+)
+
 # ===== FastAPI Setup =====
 app = FastAPI(title="AESS Agent API")
 
@@ -73,6 +159,74 @@ app.add_middleware(
     allow_methods=["*"], 
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
+
+
+def _ratio(hits: int, total: int) -> float:
+    return hits / total if total else 0.0
+
+
+@metrics_registry.register_collector
+def collect_cache_metrics():
+    """Cache and routing counters, read from their owners at scrape time."""
+    session_total = auth_store.hits + auth_store.misses
+    response_total = response_cache.hits + response_cache.misses
+    rag_stats = dict(rag_cache.stats)
+    history = history_window_stats.snapshot()
+    routing = routing_stats.snapshot()
+    return [
+        ("aess_cache_hits_total", "counter", "Cache hits by cache.", [
+            ({"cache": "auth_session"}, auth_store.hits),
+            ({"cache": "response"}, response_cache.hits),
+            ({"cache": "response_semantic"}, response_cache.semantic_hits),
+        ] + [({"cache": f"rag:{corpus}"}, s["hits"]) for corpus, s in rag_stats.items()]),
+        ("aess_cache_misses_total", "counter", "Cache misses by cache.", [
+            ({"cache": "auth_session"}, auth_store.misses),
+            ({"cache": "response"}, response_cache.misses),
+        ] + [({"cache": f"rag:{corpus}"}, s["misses"]) for corpus, s in rag_stats.items()]),
+        ("aess_cache_hit_ratio", "gauge", "Hits / lookups since startup.", [
+            ({"cache": "auth_session"}, _ratio(auth_store.hits, session_total)),
+            ({"cache": "response"}, _ratio(response_cache.hits, response_total)),
+        ] + [
+            ({"cache": f"rag:{corpus}"}, _ratio(s["hits"], s["hits"] + s["misses"]))
+            for corpus, s in rag_stats.items()
+        ]),
+        ("aess_history_tokens_saved_total", "counter", "Prompt tokens saved by the history window.", [
+            ({}, history["tokens_saved"]),
+        ]),
+        ("aess_routed_queries_total", "counter", "Queries by routing path.", [
+            ({"path": "fast_path"}, routing["fast_path_requests"]),
+            ({"path": "llm"}, routing["llm_routed_requests"]),
+        ]),
+        ("aess_log_records_dropped_total", "counter", "Log records dropped on a full log queue.", [
+            ({}, dropped_records()),
+        ]),
+    ]
+
+@app.on_event("startup")
+async def startup():
+    auth_store.start()
+    ticket_dispatcher.start()
+    state_delta_store.start()
+    login_batcher.start()
+    if SESSION_REAPER_ENABLED:
+        session_reaper.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await session_reaper.stop()
+    await login_batcher.stop()
+    await auth_store.stop()
+    auth_store.close()
+    await ticket_dispatcher.stop()
+    await state_delta_store.stop()
+    state_delta_store.close()
+    await freshservice_client.aclose()
+    ticket_outbox.close()
+    user_directory.close()
+    shutdown_tracing()
+    shutdown_logging()
 
 # ===== PART 4: Request Models =====
 class QueryRequest(BaseModel):
@@ -86,31 +240,53 @@ class LoginRequest(BaseModel):
 class LogoutRequest(BaseModel):
     session_id: str
 
+class CacheInvalidateRequest(BaseModel):
+    agent: Optional[str] = None
+
+def specialist_state(session_info: dict) -> dict:
+    """User context a specialist agent needs when called without host_agent."""
+    return {
+        "user_name": session_info["user_name"],
+        "user_email": session_info["user_email"],
+        "user_role": session_info.get("role"),
+    }
+
+def route_query(query: str, has_history: bool = False):
+    """Return (specialist agent to call directly or None, router prediction).
+
+    Turns after the first go through host_agent: the specialist runs in a
+    throwaway session without the conversation, so a follow-up such as
+    "what about for contractors?" would lose its context.
+    """
+    if not FAST_PATH_ROUTING:
+        return None, None
+    agent_name, predicted = intent_router.route(query)
+    if has_history:
+        return None, predicted
+    return (host_agent.find_agent(agent_name) if agent_name else None), predicted
+
 # ===== PART 5: Authentication Functions =====
-def authenticate_user(email: str, password: str):
+async def authenticate_user(email: str, password: str):
     """Authenticate user with email and password"""
-    if email not in USERS_DB:
-        return None
-    
-    user = USERS_DB[email]
-    password_hash = hashlib.sha256(password.encode()).hexdigest()
-    
-    if user["password_hash"] == password_hash:
-        return user
-    return None
+    return await user_directory.authenticate(email, password)
+
+def initial_session_state(user_name: str, user_email: str, role: str, login_time: str) -> dict:
+    """State a backend session starts with."""
+    return {
+        "user_name": user_name,
+        "user_email": user_email,
+        "user_role": role,
+        "login_time": login_time,
+    }
 
 def create_user_session(user: dict):
     """Create a new session for authenticated user"""
     session_id = str(uuid.uuid4())
     
     # Create initial state for the user
-    initial_state = {
-        "user_name": user["user_name"],
-        "user_email": user["user_email"],
-        "user_role": user["role"],
-        "interaction_history": [],
-        "login_time": datetime.now().isoformat(),
-    }
+    initial_state = initial_session_state(
+        user["user_name"], user["user_email"], user["role"], datetime.now().isoformat()
+    )
     
     # Auth session persistence happens after backend session creation
     return session_id, initial_state
@@ -130,36 +306,93 @@ async def create_backend_session(user_id: str, session_id: str, initial_state: d
         print(f"Error creating backend session: {e}")
         return None
 
+def placeholder_state(session_info: dict) -> dict:
+    """Initial state for a session whose backend session doesn't exist yet."""
+    return initial_session_state(
+        session_info["user_name"],
+        session_info["user_email"],
+        session_info.get("role"),
+        session_info["created_at"],
+    )
+
+# One lock per session still waiting for its backend session
+_backend_session_locks = {}
+
+async def ensure_backend_session(session_id: str, session_info: dict) -> None:
+    """Create the backend session for a lazily created login, once."""
+    if session_info.get("backend_ready", True):
+        return
+    lock = _backend_session_locks.setdefault(session_id, asyncio.Lock())
+    async with lock:
+        try:
+            # Another request may have created it while we waited
+            current = await auth_store.get_session(session_id)
+            if current is None or current.get("backend_ready", True):
+                return
+            try:
+                await session_service.create_session(
+                    app_name=APP_NAME,
+                    user_id=current["user_email"],
+                    session_id=session_id,
+                    state=placeholder_state(current),
+                )
+            except AlreadyExistsError:
+                pass
+            await auth_store.mark_backend_ready(session_id)
+            session_info["backend_ready"] = True
+        finally:
+            _backend_session_locks.pop(session_id, None)
+
 # ===== PART 6: API Endpoints =====
 @app.post("/login")
 async def login(request: LoginRequest):
     """Authenticate user and create session"""
     try:
         # Authenticate user
-        user = authenticate_user(request.email, request.password)
+        user = await authenticate_user(request.email, request.password)
         if not user:
             raise HTTPException(status_code=401, detail="Invalid email or password")
         
         # Create session
         session_id, initial_state = create_user_session(user)
         
-        # Create backend session
-        backend_session = await create_backend_session(
-            user_id=user["user_email"],
-            session_id=session_id,
-            initial_state=initial_state
-        )
-        
-        if not backend_session:
-            raise HTTPException(status_code=500, detail="Failed to create session")
-        
-        # Persist active session in SQLite
-        auth_store.create_session(
-            session_id=session_id,
-            user_email=user["user_email"],
-            user_name=user["user_name"],
-            role=user["role"],
-        )
+        if LAZY_BACKEND_SESSIONS:
+            # Placeholder only; see ensure_backend_session
+            await auth_store.create_session(
+                session_id=session_id,
+                user_email=user["user_email"],
+                user_name=user["user_name"],
+                role=user["role"],
+                backend_ready=False,
+            )
+        elif LOGIN_BATCHING_ENABLED:
+            # Backend and auth sessions, created together with other logins
+            try:
+                await login_batcher.submit(user, session_id, initial_state)
+            except LoginQueueFull:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Too many logins in progress, please retry",
+                    headers={"Retry-After": "1"},
+                )
+        else:
+            # Create backend session
+            backend_session = await create_backend_session(
+                user_id=user["user_email"],
+                session_id=session_id,
+                initial_state=initial_state
+            )
+
+            if not backend_session:
+                raise HTTPException(status_code=500, detail="Failed to create session")
+
+            # Persist active session in SQLite
+            await auth_store.create_session(
+                session_id=session_id,
+                user_email=user["user_email"],
+                user_name=user["user_name"],
+                role=user["role"],
+            )
         
         return {
             "success": True,
@@ -181,8 +414,8 @@ async def logout(request: LogoutRequest):
     try:
         session_id = request.session_id
         
-        # Remove from active sessions (SQLite)
-        auth_store.delete(session_id)
+        # Remove from active sessions (invalidates the cached entry too)
+        await auth_store.delete(session_id)
         
         return {"success": True, "message": "Logout successful"}
         
@@ -193,7 +426,7 @@ async def logout(request: LogoutRequest):
 @app.get("/session/{session_id}")
 async def get_session_info(session_id: str):
     """Get session information"""
-    session_info = auth_store.get_session(session_id)
+    session_info = await auth_store.get_session(session_id)
     if not session_info:
         raise HTTPException(status_code=404, detail="Session not found")
     
@@ -214,12 +447,12 @@ async def process_query(req: QueryRequest, session_id: str = None):
     if not session_id:
         raise HTTPException(status_code=401, detail="Session ID required")
     
-    session_info = auth_store.get_session(session_id)
+    session_info = await auth_store.get_session(session_id)
     if not session_info:
         raise HTTPException(status_code=401, detail="Invalid session")
     
     # Update last activity
-    auth_store.touch(session_id)
+    await auth_store.touch(session_id)
     
     query_id = str(uuid.uuid4())
     user_input = req.query.strip()
@@ -229,9 +462,46 @@ async def process_query(req: QueryRequest, session_id: str = None):
 
     user_email = session_info["user_email"]
 
+    # Earlier turns can make this query context-dependent (see ResponseCache.store
+    # and route_query)
+    has_history = (RESPONSE_CACHE_ENABLED or FAST_PATH_ROUTING) and await asyncio.to_thread(history_store.count, session_id) > 0
     await add_user_query_to_history(session_service, APP_NAME, user_email, session_id, user_input)
 
-    result = await call_agent_async(runner, user_email, session_id, user_input)
+    cached = None
+    if RESPONSE_CACHE_ENABLED:
+        cached = response_cache.lookup(user_input, user_email, session_info["user_name"], has_history=has_history)
+
+    if cached:
+        await add_agent_response_to_history(
+            session_service, APP_NAME, user_email, session_id, host_agent.name, cached["response"]
+        )
+        result = {"progress": [CACHE_HIT_PROGRESS], "response": cached["response"]}
+    else:
+        specialist, predicted = route_query(user_input, has_history)
+        started = time.perf_counter()
+        QUERIES_IN_FLIGHT.inc(endpoint="/query")
+        try:
+            if specialist:
+                result = await call_specialist_async(
+                    specialist, user_email, session_id, specialist_state(session_info), user_input
+                )
+                routing_stats.record_fast_path(time.perf_counter() - started)
+            else:
+                await ensure_backend_session(session_id, session_info)
+                result = await call_agent_async(runner, user_email, session_id, user_input)
+                if FAST_PATH_ROUTING:
+                    routing_stats.record_llm_routed(time.perf_counter() - started, predicted, result["agents"])
+        finally:
+            QUERIES_IN_FLIGHT.dec(endpoint="/query")
+        if RESPONSE_CACHE_ENABLED and result["response"]:
+            response_cache.store(
+                user_input,
+                user_email,
+                result["response"],
+                result["agents"],
+                session_info["user_name"],
+                has_history=has_history,
+            )
 
     return {
         "query_id": query_id,
@@ -244,55 +514,115 @@ async def process_query(req: QueryRequest, session_id: str = None):
 @app.get("/query-streaming")
 async def query_streaming(query: str, session_id: str = None):
     """Streams progress updates live using SSE."""
+    received = time.perf_counter()
     if not session_id:
         raise HTTPException(status_code=401, detail="Session ID required")
     
-    session_info = auth_store.get_session(session_id)
+    session_info = await auth_store.get_session(session_id)
     if not session_info:
         raise HTTPException(status_code=401, detail="Invalid session")
     
     # Update last activity
-    auth_store.touch(session_id)
+    await auth_store.touch(session_id)
     
     query_id = str(uuid.uuid4())
 
     async def event_generator():
         user_email = session_info["user_email"]
         
+        # Earlier turns can make this query context-dependent (see ResponseCache.store
+        # and route_query)
+        has_history = (RESPONSE_CACHE_ENABLED or FAST_PATH_ROUTING) and await asyncio.to_thread(history_store.count, session_id) > 0
         # Save query in session
         await add_user_query_to_history(session_service, APP_NAME, user_email, session_id, query)
 
         yield f"data: {json.dumps({'query_id': query_id})}\n\n"
 
+        cached = None
+        if RESPONSE_CACHE_ENABLED:
+            cached = response_cache.lookup(query, user_email, session_info["user_name"], has_history=has_history)
+        if cached:
+            timer = StreamTimer(received, path="cache")
+            batch = [{"progress": CACHE_HIT_PROGRESS}, {"final_response": cached["response"]}]
+            yield "".join(f"data: {json.dumps(payload)}\n\n" for payload in batch)
+            timer.flushed(batch, time.perf_counter())
+            await add_agent_response_to_history(
+                session_service, APP_NAME, user_email, session_id, host_agent.name, cached["response"]
+            )
+            yield "event: end\ndata: {}\n\n"
+            return
+
         content = types.Content(role="user", parts=[types.Part(text=query)])
-        agent_name = None
+        run_info = {}
 
+        QUERIES_IN_FLIGHT.inc(endpoint="/query-streaming")
         try:
-            async for event in runner.run_async(user_id=user_email, session_id=session_id, new_message=content):
-                # Agent start
-                if event.author and agent_name is None:
-                    agent_name = event.author
-
-                # Stream progress in real time
-                async for msg in process_agent_response_streaming(event):
-                    time.sleep(1)
-                    yield f"data: {json.dumps({'progress': msg})}\n\n"
-
-                # Final response
-                if event.is_final_response():
-                    final_response = None
-                    if event.content and event.content.parts:
-                        text_parts = [p.text for p in event.content.parts if hasattr(p, "text") and p.text]
-                        if text_parts:
-                            final_response = "\n".join(text_parts)
-                    if final_response:
-                        time.sleep(2)
-                        yield f"data: {json.dumps({'final_response': final_response})}\n\n"
-
-            yield "event: end\ndata: {}\n\n"
-
-        except Exception as e:
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+            specialist, predicted = route_query(query, has_history)
+            started = time.perf_counter()
+            timer = StreamTimer(received, path="fast_path" if specialist else "host_agent")
+            if specialist:
+                run_runner, run_session_id = await start_specialist_session(
+                    specialist, user_email, specialist_state(session_info)
+                )
+                routed = {"progress": f"⚡ Routed directly to **{specialist.name}**."}
+                yield f"data: {json.dumps(routed)}\n\n"
+                timer.flushed([routed], time.perf_counter())
+            else:
+                await ensure_backend_session(session_id, session_info)
+                run_runner, run_session_id = runner, session_id
+
+            # Progress is flushed as soon as the runner yields it; pacing and
+            # coalescing never block the event loop
+            async for batch in stream_agent_events(
+                run_runner,
+                user_email,
+                run_session_id,
+                content,
+                coalesce_window=STREAM_COALESCE_MS / 1000,
+                pacing=STREAM_PACING_SECONDS,
+                run_info=run_info,
+            ):
+                if specialist:
+                    for payload in batch:
+                        if "final_response" in payload:
+                            payload["final_response"] = format_host_response(payload["final_response"])
+                yield "".join(f"data: {json.dumps(payload)}\n\n" for payload in batch)
+                timer.flushed(batch, time.perf_counter())
+
+            StreamTimer.agent_segments(run_info.get("segments", []))
+
+            if specialist:
+                routing_stats.record_fast_path(time.perf_counter() - started)
+                if run_info.get("response"):
+                    run_info["response"] = format_host_response(run_info["response"])
+                run_info["agents"].add(specialist.name)
+            elif FAST_PATH_ROUTING:
+                routing_stats.record_llm_routed(time.perf_counter() - started, predicted, run_info["agents"])
+        finally:
+            QUERIES_IN_FLIGHT.dec(endpoint="/query-streaming")
+
+        if run_info.get("response"):
+            # Fast-path runs use a throwaway session; the answer belongs to the user's
+            await add_agent_response_to_history(
+                session_service,
+                APP_NAME,
+                user_email,
+                session_id,
+                specialist.name if specialist else host_agent.name,
+                run_info["response"],
+            )
+
+        if RESPONSE_CACHE_ENABLED and run_info.get("response"):
+            response_cache.store(
+                query,
+                user_email,
+                run_info["response"],
+                run_info["agents"],
+                session_info["user_name"],
+                has_history=has_history,
+            )
+
+        yield "event: end\ndata: {}\n\n"
 
     return StreamingResponse(event_generator(), media_type="text/event-stream")
 
@@ -302,21 +632,126 @@ async def get_current_state(session_id: str = None):
     if not session_id:
         raise HTTPException(status_code=401, detail="Session ID required")
     
-    session_info = auth_store.get_session(session_id)
+    session_info = await auth_store.get_session(session_id)
     if not session_info:
         raise HTTPException(status_code=401, detail="Invalid session")
     
     try:
         user_email = session_info["user_email"]
         
-        session = await session_service.get_session(
-            app_name=APP_NAME, user_id=user_email, session_id=session_id
+        if session_info.get("backend_ready", True):
+            session = await session_service.get_session(
+                app_name=APP_NAME, user_id=user_email, session_id=session_id
+            )
+            state = dict(session.state)
+        else:
+            state = placeholder_state(session_info)
+        state["interaction_history"] = await asyncio.to_thread(
+            history_store.get_history, session_id
         )
-        return session.state
+        return state
     except Exception as e:
         print(f"Error getting state: {e}")
         raise HTTPException(status_code=500, detail="Error retrieving session state")
 
+@app.get("/routing/stats")
+async def get_routing_stats():
+    """Fast-path routing usage, accuracy against the LLM router and time saved."""
+    return routing_stats.snapshot()
+
+@app.post("/cache/invalidate")
+async def invalidate_response_cache(req: CacheInvalidateRequest, session_id: str = None):
+    """Drop cached answers and retrievals, e.g. after an agent's RAG corpus was updated (admin only)."""
+    if not session_id:
+        raise HTTPException(status_code=401, detail="Session ID required")
+
+    session_info = await auth_store.get_session(session_id)
+    if not session_info:
+        raise HTTPException(status_code=401, detail="Invalid session")
+    if session_info.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Admin role required")
+
+    if req.agent:
+        agent = host_agent.find_agent(req.agent)
+        if not agent:
+            raise HTTPException(status_code=404, detail="Agent not found")
+        removed = response_cache.invalidate_agent(req.agent)
+        for tool in getattr(agent, "tools", []):
+            if isinstance(tool, CachedRagRetrieval):
+                removed += rag_cache.invalidate_corpus(tool.corpus_key)
+    else:
+        removed = len(response_cache) + len(rag_cache)
+        response_cache.clear()
+        rag_cache.clear()
+    return {"success": True, "removed": removed}
+
+async def admin_session(session_id: Optional[str]) -> dict:
+    """Session info for an admin caller; 401/403 otherwise."""
+    if not session_id:
+        raise HTTPException(status_code=401, detail="Session ID required")
+
+    session_info = await auth_store.get_session(session_id)
+    if not session_info:
+        raise HTTPException(status_code=401, detail="Invalid session")
+    if session_info.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Admin role required")
+    return session_info
+
+@app.get("/admin/sessions")
+async def list_active_sessions(
+    session_id: str = None,
+    user_email: Optional[str] = None,
+    role: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+):
+    """Active sessions, most recently active first (admin only).
+
+    Pass ``next_cursor`` from a response as ``cursor`` to get the next page.
+    """
+    await admin_session(session_id)
+    try:
+        return await auth_store.list_sessions(limit=limit, cursor=cursor, user_email=user_email, role=role)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@app.get("/admin/users/{user_email}/sessions/count")
+async def count_active_sessions(user_email: str, session_id: str = None):
+    """Number of active sessions a user has (admin only)."""
+    await admin_session(session_id)
+    return {"user_email": user_email, "active_sessions": await auth_store.count_user_sessions(user_email)}
+
+@app.get("/tickets/{reference}")
+async def get_ticket_status(reference: str, session_id: str = None):
+    """Delivery status of a ticket raised through the outbox."""
+    if not session_id:
+        raise HTTPException(status_code=401, detail="Session ID required")
+
+    session_info = await auth_store.get_session(session_id)
+    if not session_info:
+        raise HTTPException(status_code=401, detail="Invalid session")
+
+    ticket = await asyncio.to_thread(ticket_outbox.get, reference)
+    # Other users' tickets look the same as missing ones
+    if not ticket or (
+        ticket["user_id"] != session_info["user_email"] and session_info.get("role") != "admin"
+    ):
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    return {
+        "reference": ticket["ref"],
+        "status": ticket["status"],
+        "ticket_id": ticket["ticket_id"],
+        "attempts": ticket["attempts"],
+        "last_error": ticket["last_error"],
+        "created_at": datetime.fromtimestamp(ticket["created_at"]).isoformat(),
+        "updated_at": datetime.fromtimestamp(ticket["updated_at"]).isoformat(),
+    }
+
+@app.get("/metrics")
+async def get_metrics():
+    """Metrics in the Prometheus text exposition format."""
+    return PlainTextResponse(metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
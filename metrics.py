@@ -0,0 +1,388 @@
+import bisect
+import functools
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+# Latency buckets (seconds), from cache hits to slow multi-agent turns
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Single SQLite statements are usually well under a millisecond
+SQLITE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down per label set."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram per label set, with sum and count."""
+
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help: str, labels: Sequence[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (+Inf last), sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, **labels: str) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, (list(v[0]), v[1], v[2])) for k, v in self._values.items()]
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+# A collector returns (name, kind, help, [(labels, value), ...]) tuples
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, Any], float]]]]]
+
+
+class MetricsRegistry:
+    """In-process metrics, rendered in the Prometheus text format.
+
+    Recording is a dict update under a per-metric lock, cheap enough for the
+    request path; all formatting happens when /metrics is scraped.
+    Collectors read counters that components already keep (cache hits,
+    routing stats) at scrape time, so those cost nothing per request.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Collector] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labels))
+
+    def histogram(
+        self, name: str, help: str, labels: Sequence[str] = (), buckets: Optional[Iterable[float]] = None
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets or DEFAULT_BUCKETS))
+
+    def register_collector(self, collector: Collector) -> Collector:
+        with self._lock:
+            self._collectors.append(collector)
+        return collector
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collector in collectors:
+            for name, kind, help, samples in collector():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    rendered = _format_labels(list(labels), [str(v) for v in labels.values()])
+                    lines.append(f"{name}{rendered} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# ===== Streaming (/query-streaming) =====
+# "path" is how the query was answered: cache, fast_path or host_agent
+STREAM_TIME_TO_FIRST_EVENT = registry.histogram(
+    "aess_stream_time_to_first_event_seconds",
+    "Time from request arrival to the first progress or answer event sent to the client.",
+    ["path"],
+)
+STREAM_INTER_EVENT_GAP = registry.histogram(
+    "aess_stream_inter_event_gap_seconds",
+    "Time between consecutive SSE flushes of one stream.",
+    ["path"],
+)
+STREAM_TIME_TO_FINAL_RESPONSE = registry.histogram(
+    "aess_stream_time_to_final_response_seconds",
+    "Time from request arrival to the final_response event.",
+    ["path"],
+)
+STREAM_AGENT_SEGMENT = registry.histogram(
+    "aess_stream_agent_segment_seconds",
+    "Time per tool or sub-agent call, and per stretch of an agent's own work between calls.",
+    ["agent"],
+)
+STREAM_EVENTS = registry.counter(
+    "aess_stream_events_total",
+    "SSE payloads sent, by type.",
+    ["type"],
+)
+
+
+class StreamTimer:
+    """Records the streaming histograms for one /query-streaming response.
+
+    Call :meth:`flushed` every time a batch of payloads is written to the
+    client; the query_id handshake is not counted as an event.
+    """
+
+    def __init__(self, received: float, path: str = "host_agent") -> None:
+        self.received = received
+        self.path = path
+        self._last: Optional[float] = None
+
+    def flushed(self, batch: Sequence[dict], now: float) -> None:
+        if self._last is None:
+            STREAM_TIME_TO_FIRST_EVENT.observe(now - self.received, path=self.path)
+        else:
+            STREAM_INTER_EVENT_GAP.observe(now - self._last, path=self.path)
+        self._last = now
+        for payload in batch:
+            kind = next(iter(payload), "unknown")
+            STREAM_EVENTS.inc(type=kind)
+            if kind == "final_response":
+                STREAM_TIME_TO_FINAL_RESPONSE.observe(now - self.received, path=self.path)
+
+    @staticmethod
+    def agent_segments(segments: Iterable[Tuple[str, float]]) -> None:
+        for agent, seconds in segments:
+            STREAM_AGENT_SEGMENT.observe(seconds, agent=agent)
+
+
+# ===== HTTP =====
+HTTP_REQUESTS = registry.counter(
+    "aess_http_requests_total",
+    "HTTP requests by route template, method and status code.",
+    ["route", "method", "status"],
+)
+HTTP_REQUEST_DURATION = registry.histogram(
+    "aess_http_request_duration_seconds",
+    "Time from request arrival until the last byte of the response was sent.",
+    ["route", "method"],
+)
+QUERIES_IN_FLIGHT = registry.gauge(
+    "aess_queries_in_flight",
+    "Agent queries currently being answered.",
+    ["endpoint"],
+)
+
+# ===== Agent runs =====
+RUNNER_EVENTS = registry.counter(
+    "aess_runner_events_total",
+    "Events yielded by runner.run_async, by author.",
+    ["author"],
+)
+TOOL_CALLS = registry.counter(
+    "aess_tool_calls_total",
+    "function_call parts emitted by agents, by tool name.",
+    ["tool"],
+)
+TOOL_DURATION = registry.histogram(
+    "aess_tool_call_duration_seconds",
+    "Time from a function_call event to its function_response event.",
+    ["tool"],
+)
+
+# ===== SQLite =====
+SQLITE_QUERY_DURATION = registry.histogram(
+    "aess_sqlite_query_duration_seconds",
+    "Duration of store operations, including connection checkout.",
+    ["store", "operation"],
+    buckets=SQLITE_BUCKETS,
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting requests and timing them per route template.
+
+    Routes are labelled by their template (``/tickets/{reference}``), not
+    the raw path, to keep label cardinality bounded. Streaming responses are
+    timed until their final chunk.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope.get("method", "")
+            HTTP_REQUESTS.inc(route=route, method=method, status=str(status["code"]))
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, route=route, method=method)
+
+
+class RunObserver:
+    """Counts events and times tool calls for one agent run.
+
+    Feed it every event from ``runner.run_async``. A tool's duration runs
+    from the event carrying its function_call to the event carrying the
+    matching function_response.
+    """
+
+    def __init__(self) -> None:
+        self._pending: Dict[str, Tuple[str, float]] = {}
+
+    def observe(self, event) -> None:
+        RUNNER_EVENTS.inc(author=event.author or "unknown")
+        if not (event.content and event.content.parts):
+            return
+        now = time.perf_counter()
+        for part in event.content.parts:
+            call = getattr(part, "function_call", None)
+            if call:
+                TOOL_CALLS.inc(tool=call.name)
+                self._pending[call.id or call.name] = (call.name, now)
+            response = getattr(part, "function_response", None)
+            if response:
+                pending = self._pending.pop(response.id or response.name, None)
+                if pending:
+                    TOOL_DURATION.observe(now - pending[1], tool=pending[0])
+
+
+def timed_query(store: str, operation: Optional[str] = None):
+    """Decorator timing a store method into SQLITE_QUERY_DURATION."""
+
+    def decorator(func):
+        op = operation or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                SQLITE_QUERY_DURATION.observe(time.perf_counter() - started, store=store, operation=op)
+
+        return wrapper
+
+    return decorator
@@ -1,4 +1,4 @@
- learning_rag = VertexAiRagRetrieval(
+ learning_rag = build_retrieval_tool(
     name="retrieve_learning_docs",
     description="Use this tool to fetch details about training programs, courses, certifications, and skill development opportunities from the RAG corpus.",
     rag_resources=[
@@ -87,7 +87,7 @@ learning_agent = LlmAgent(
 )
 
 
-benefits_rag = VertexAiRagRetrieval(
+benefits_rag = build_retrieval_tool(
     name="retrieve_benefits_docs",
     description=(
         "Use this tool to fetch official details about employee benefits, "
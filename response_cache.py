@@ -0,0 +1,275 @@
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Iterable, List, Set, Tuple
+
+from embeddings import HashingEmbedder, cosine_sparse, default_embedder, normalize_query, tokenize
+
+
+# Agents whose answers depend on who is asking (cached per user)
+PERSONAL_AGENTS = frozenset({"payroll_query_agent", "leave_management_agent"})
+# Agents with side effects; answers involving them are never cached
+UNCACHEABLE_AGENTS = frozenset({"case_management_agent"})
+
+# Placeholder for the asking user's first name in shared answers
+_FIRST_NAME_PLACEHOLDER = "\x00first_name\x00"
+
+SHARED_SCOPE = "*"
+
+# Numbers, times and dates ("15", "2.5", "10:30", "2024-05-01") and date
+# words. Queries that differ in any of these never match semantically.
+_NUMBER_RE = re.compile(r"\d+(?:[.,:/-]\d+)*")
+_DATE_WORDS = frozenset(
+    """
+    january february march april june july august september october
+    november december jan feb mar apr jun jul aug sep sept oct nov dec
+    monday tuesday wednesday thursday friday saturday sunday
+    today tomorrow yesterday tonight week weekend month quarter year
+    next last previous coming
+    """.split()
+)
+
+
+def _pinned_terms(query: str) -> frozenset:
+    """Numbers and date words a cached answer is specific to."""
+    text = query.lower()
+    words = set(re.findall(r"[a-z]+", text)) & _DATE_WORDS
+    return frozenset(_NUMBER_RE.findall(text)) | words
+
+
+def _stems(query: str) -> frozenset:
+    """Leading characters of each content word ("payslips" -> "pays").
+
+    Semantic candidates are looked up by stem: two queries similar enough to
+    match share content words, or at least their inflected forms.
+    """
+    return frozenset(token[:4] for token in tokenize(query))
+
+
+class CachedResponse:
+    __slots__ = ("query", "embedding", "pinned", "stems", "response", "agents", "expires_at")
+
+    def __init__(self, query, embedding, pinned, stems, response, agents, expires_at):
+        self.query = query
+        self.embedding = embedding
+        self.pinned = pinned
+        self.stems = stems
+        self.response = response
+        self.agents = agents
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    """Cache of final agent responses keyed by normalized query.
+
+    A lookup first tries the exact normalized query, then the most similar
+    cached query (embedding cosine >= ``similarity_threshold``) in the same
+    scope; queries whose numbers or dates differ never match semantically.
+    Only entries in the same scope with the same numbers and dates that share
+    a content-word stem with the query are compared, so a miss doesn't scan
+    the whole cache.
+    Answers that involved a personal agent are scoped to the asking user;
+    other answers are shared once the query has ``min_shared_tokens`` content
+    words, with the user's first name templated out so it can be filled back
+    in for whoever asks next. Turns that had earlier history may depend on
+    that context, so they are neither answered from nor stored in the cache. Entries expire after
+    ``ttl`` seconds and the least recently used ones are evicted beyond
+    ``max_entries``. ``invalidate_agent`` drops every answer an agent
+    contributed to, e.g. after its RAG corpus changed.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl: float = 3600.0,
+        similarity_threshold: float = 0.85,
+        min_semantic_tokens: int = 2,
+        min_shared_tokens: int = 3,
+        embedder: HashingEmbedder = default_embedder,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.min_semantic_tokens = min_semantic_tokens
+        self.min_shared_tokens = min_shared_tokens
+        self.embedder = embedder
+        # (scope, normalized query) -> CachedResponse, in LRU order
+        self._entries: "OrderedDict[Tuple[str, str], CachedResponse]" = OrderedDict()
+        # (scope, pinned terms, stem) -> keys of the entries with that stem
+        self._buckets: Dict[Tuple[str, frozenset, str], Set[Tuple[str, str]]] = {}
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _first_name(user_name: Optional[str]) -> Optional[str]:
+        if not user_name:
+            return None
+        return user_name.split()[0]
+
+    def _scopes(self, user_id: str) -> List[str]:
+        return [user_id, SHARED_SCOPE]
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        entry = self._entries.pop(key)
+        for stem in entry.stems:
+            bucket_key = (key[0], entry.pinned, stem)
+            bucket = self._buckets[bucket_key]
+            bucket.discard(key)
+            if not bucket:
+                del self._buckets[bucket_key]
+
+    def _add(self, key: Tuple[str, str], entry: CachedResponse) -> None:
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        for stem in entry.stems:
+            self._buckets.setdefault((key[0], entry.pinned, stem), set()).add(key)
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        expired = [k for k, v in self._entries.items() if v.expires_at < now]
+        for key in expired:
+            self._remove(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _candidates(self, query: str, pinned: frozenset, scopes: List[str]) -> Set[Tuple[str, str]]:
+        keys = set()
+        for scope in scopes:
+            for stem in _stems(query):
+                keys |= self._buckets.get((scope, pinned, stem), set())
+        return keys
+
+    def _render(self, entry: CachedResponse, user_name: Optional[str]) -> str:
+        first_name = self._first_name(user_name) or ""
+        return entry.response.replace(_FIRST_NAME_PLACEHOLDER, first_name)
+
+    def lookup(
+        self,
+        query: str,
+        user_id: str,
+        user_name: Optional[str] = None,
+        has_history: bool = False,
+    ) -> Optional[Dict[str, Any]]:
+        """Return ``{"response", "agents", "matched_query"}`` or None.
+
+        ``has_history`` is a miss: the query may refer to earlier turns (see
+        :meth:`store`).
+        """
+        if has_history:
+            self.misses += 1
+            return None
+        key = normalize_query(query)
+        now = time.monotonic()
+
+        for scope in self._scopes(user_id):
+            entry = self._entries.get((scope, key))
+            if entry is not None and entry.expires_at >= now:
+                self._entries.move_to_end((scope, key))
+                self.hits += 1
+                return {
+                    "response": self._render(entry, user_name),
+                    "agents": sorted(entry.agents),
+                    "matched_query": entry.query,
+                }
+
+        # Semantic match: only for queries with enough content to compare
+        if len(tokenize(query)) >= self.min_semantic_tokens:
+            embedding = self.embedder.embed_sparse(query)
+            pinned = _pinned_terms(query)
+            best, best_key, best_score = None, None, self.similarity_threshold
+            for entry_key in self._candidates(query, pinned, self._scopes(user_id)):
+                entry = self._entries[entry_key]
+                if entry.expires_at < now:
+                    continue
+                score = cosine_sparse(embedding, entry.embedding)
+                if score >= best_score:
+                    best, best_key, best_score = entry, entry_key, score
+            if best is not None:
+                self._entries.move_to_end(best_key)
+                self.hits += 1
+                self.semantic_hits += 1
+                return {
+                    "response": self._render(best, user_name),
+                    "agents": sorted(best.agents),
+                    "matched_query": best.query,
+                }
+
+        self.misses += 1
+        return None
+
+    def store(
+        self,
+        query: str,
+        user_id: str,
+        response: str,
+        agents: Iterable[str],
+        user_name: Optional[str] = None,
+        has_history: bool = False,
+    ) -> bool:
+        """Cache a response. Returns False if the answer is not cacheable.
+
+        ``has_history`` marks a turn that followed earlier interactions in the
+        session; its answer may rely on them ("yes", "what about next
+        month?"), so it is not cached.
+        """
+        agents = frozenset(agents)
+        if not response or has_history or agents & UNCACHEABLE_AGENTS:
+            return False
+
+        if agents & PERSONAL_AGENTS:
+            scope = user_id
+        elif len(tokenize(query)) < self.min_shared_tokens:
+            # Too little content to be sure it means the same for everyone
+            scope = user_id
+        else:
+            scope = SHARED_SCOPE
+            first_name = self._first_name(user_name)
+            if first_name:
+                response = re.sub(
+                    rf"\b{re.escape(first_name)}\b", _FIRST_NAME_PLACEHOLDER, response
+                )
+
+        key = (scope, normalize_query(query))
+        self._add(key, CachedResponse(
+            query=query,
+            embedding=self.embedder.embed_sparse(query),
+            pinned=_pinned_terms(query),
+            stems=_stems(query),
+            response=response,
+            agents=agents,
+            expires_at=time.monotonic() + self.ttl,
+        ))
+        self._evict()
+        return True
+
+    # ----- invalidation hooks -----
+    def invalidate_agent(self, agent_name: str) -> int:
+        """Drop every answer the agent contributed to. Returns the count."""
+        stale = [k for k, v in self._entries.items() if agent_name in v.agents]
+        for key in stale:
+            self._remove(key)
+        return len(stale)
+
+    def invalidate_user(self, user_id: str) -> int:
+        stale = [k for k in self._entries if k[0] == user_id]
+        for key in stale:
+            self._remove(key)
+        return len(stale)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "1000")),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600")),
+    similarity_threshold=float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.85")),
+    min_shared_tokens=int(os.getenv("RESPONSE_CACHE_SHARED_MIN_TOKENS", "3")),
+)
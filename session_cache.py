@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+
+from session_store import AsyncAuthSessionStore
+
+
+logger = logging.getLogger(__name__)
+
+
+class CachedAuthSessionStore:
+    """LRU/TTL cache in front of AsyncAuthSessionStore with write-behind touches.
+
+    Session lookups are served from memory once loaded, and ``touch`` only
+    records the new ``last_activity`` in memory; a background task flushes the
+    pending timestamps to SQLite in a single bulk update every
+    ``flush_interval`` seconds. ``delete`` invalidates the cached entry
+    immediately; a lookup that was already reading the row when the session
+    was invalidated returns it but doesn't cache it.
+
+    The cache is per process: with several uvicorn workers a logout in one
+    worker is seen by the others once their entry expires (``ttl`` seconds).
+    """
+
+    def __init__(
+        self,
+        store: AsyncAuthSessionStore,
+        max_entries: int = 10000,
+        ttl: float = 300.0,
+        flush_interval: float = 5.0,
+    ) -> None:
+        self.store = store
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._pending_touches: Dict[str, str] = {}
+        # session_id -> [loads in flight, generation], bumped by invalidate
+        self._loading: Dict[str, List[int]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+
+    # ----- cache bookkeeping -----
+    def _get_cached(self, session_id: str) -> Optional[Dict[str, Any]]:
+        cached = self._entries.get(session_id)
+        if cached is None:
+            return None
+        session_info, expires_at = cached
+        if expires_at < time.monotonic():
+            del self._entries[session_id]
+            return None
+        self._entries.move_to_end(session_id)
+        return session_info
+
+    def _put(self, session_id: str, session_info: Dict[str, Any]) -> None:
+        self._entries[session_id] = (session_info, time.monotonic() + self.ttl)
+        self._entries.move_to_end(session_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, session_id: str) -> None:
+        """Drop a session from the cache and forget its pending touch."""
+        self._entries.pop(session_id, None)
+        self._pending_touches.pop(session_id, None)
+        loading = self._loading.get(session_id)
+        if loading is not None:
+            loading[1] += 1
+
+    # ----- store interface -----
+    async def create_session(
+        self, session_id: str, user_email: str, user_name: str, role: str, backend_ready: bool = True
+    ) -> None:
+        await self.store.create_session(session_id, user_email, user_name, role, backend_ready)
+        self.invalidate(session_id)
+
+    async def create_sessions(self, sessions: list, backend_ready: bool = True) -> None:
+        """Bulk create; each item is (session_id, user_email, user_name, role)."""
+        await self.store.create_sessions(sessions, backend_ready)
+        for session in sessions:
+            self.invalidate(session[0])
+
+    async def mark_backend_ready(self, session_id: str) -> None:
+        await self.store.mark_backend_ready(session_id)
+        cached = self._entries.get(session_id)
+        if cached is not None:
+            cached[0]["backend_ready"] = True
+
+    async def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        session_info = self._get_cached(session_id)
+        if session_info is not None:
+            self.hits += 1
+            return dict(session_info)
+
+        self.misses += 1
+        loading = self._loading.setdefault(session_id, [0, 0])
+        loading[0] += 1
+        generation = loading[1]
+        try:
+            session_info = await self.store.get_session(session_id)
+        finally:
+            loading[0] -= 1
+            if not loading[0]:
+                del self._loading[session_id]
+        if session_info is None:
+            return None
+
+        # A touch may still be waiting for the next flush
+        pending = self._pending_touches.get(session_id)
+        if pending and pending > session_info["last_activity"]:
+            session_info["last_activity"] = pending
+        # Invalidated while loading (e.g. logged out): the row may be gone
+        if loading[1] == generation:
+            self._put(session_id, session_info)
+        return dict(session_info)
+
+    async def touch(self, session_id: str) -> None:
+        now = datetime.utcnow().isoformat()
+        self._pending_touches[session_id] = now
+        cached = self._entries.get(session_id)
+        if cached is not None:
+            cached[0]["last_activity"] = now
+
+    async def delete(self, session_id: str) -> None:
+        self.invalidate(session_id)
+        await self.store.delete(session_id)
+        # Lookups that started during the delete may have read the row
+        self.invalidate(session_id)
+
+    async def list_sessions(
+        self,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        user_email: Optional[str] = None,
+        role: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        # Pending touches change the order, so write them first
+        await self.flush()
+        return await self.store.list_sessions(limit, cursor, user_email, role)
+
+    async def count_user_sessions(self, user_email: str) -> int:
+        return await self.store.count_user_sessions(user_email)
+
+    async def reap_expired(self, cutoff: str, limit: int) -> list:
+        """Delete idle sessions; pending touches are written first so they count."""
+        await self.flush()
+        reaped = await self.store.reap_expired(cutoff, limit)
+        for session_id, _ in reaped:
+            self.invalidate(session_id)
+        return reaped
+
+    async def existing_sessions(self, session_ids: list) -> set:
+        return await self.store.existing_sessions(session_ids)
+
+    async def vacuum(self, pages: int) -> None:
+        await self.store.vacuum(pages)
+
+    # ----- write-behind -----
+    async def flush(self) -> None:
+        """Write all pending last_activity updates in one bulk statement."""
+        if not self._pending_touches:
+            return
+        pending, self._pending_touches = self._pending_touches, {}
+        try:
+            await self.store.touch_many(pending)
+        except Exception as e:
+            # Keep the newest timestamps for the next attempt
+            for session_id, ts in pending.items():
+                if self._pending_touches.get(session_id, "") < ts:
+                    self._pending_touches[session_id] = ts
+            logger.warning("Error flushing session activity: %s", e)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self) -> None:
+        """Start the background flush task on the running event loop."""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Stop the flush task and write out anything still pending."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+    def close(self) -> None:
+        self.store.close()
@@ -0,0 +1,230 @@
+"""Background expiry of idle sessions.
+
+Every ``SESSION_REAPER_INTERVAL_SECONDS`` the :class:`SessionReaper`:
+
+- deletes auth sessions idle for longer than ``SESSION_IDLE_TTL_SECONDS``
+  (through the ``last_activity`` index, ``SESSION_REAPER_BATCH_SIZE`` rows
+  per transaction) together with their interaction history and state deltas
+- purges ADK sessions (events cascade) that have not been updated within the
+  TTL and no longer have an auth session, which also covers sessions ended
+  by /logout; candidates are walked in ``update_time`` order, one batch per
+  transaction
+- returns up to ``SESSION_REAPER_VACUUM_PAGES`` free pages per store to the
+  filesystem with an incremental VACUUM, so files shrink a little each pass
+  instead of in one long, locking VACUUM
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, or_, select, text, tuple_
+
+from metrics import registry
+
+
+logger = logging.getLogger(__name__)
+
+SESSION_REAPER_ENABLED = os.getenv("SESSION_REAPER_ENABLED", "1") == "1"
+SESSION_IDLE_TTL_SECONDS = float(os.getenv("SESSION_IDLE_TTL_SECONDS", str(24 * 3600)))
+SESSION_REAPER_INTERVAL_SECONDS = float(os.getenv("SESSION_REAPER_INTERVAL_SECONDS", "300"))
+SESSION_REAPER_BATCH_SIZE = int(os.getenv("SESSION_REAPER_BATCH_SIZE", "500"))
+SESSION_REAPER_VACUUM_PAGES = int(os.getenv("SESSION_REAPER_VACUUM_PAGES", "1000"))
+
+# Dialects that accept CREATE INDEX IF NOT EXISTS
+_INDEX_DIALECTS = ("sqlite", "postgresql")
+
+SESSIONS_REAPED = registry.counter(
+    "aess_sessions_reaped_total",
+    "Expired sessions removed by the reaper, by store.",
+    ["store"],
+)
+REAPER_PASS_DURATION = registry.histogram(
+    "aess_session_reaper_pass_seconds",
+    "Duration of one session reaper pass.",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+
+class SessionPurgeMixin:
+    """Adds batched lookup and deletion of stale sessions to DatabaseSessionService."""
+
+    _purge_index_ready = False
+
+    async def _ensure_purge_index(self) -> None:
+        if self._purge_index_ready:
+            return
+        await self.prepare_tables()
+        if self.db_engine.dialect.name in _INDEX_DIALECTS:
+            async with self.db_engine.begin() as conn:
+                await conn.execute(
+                    text(
+                        "CREATE INDEX IF NOT EXISTS idx_sessions_app_update_time "
+                        "ON sessions (app_name, update_time)"
+                    )
+                )
+        self._purge_index_ready = True
+
+    async def stale_sessions(
+        self,
+        *,
+        app_name: str,
+        before: datetime,
+        limit: int,
+        after: Optional[Tuple[datetime, str]] = None,
+    ) -> List[Tuple[str, str, datetime]]:
+        """``(user_id, session_id, update_time)`` of sessions last updated before ``before``.
+
+        Ordered by (update_time, id); pass the last row's (update_time, id)
+        as ``after`` to fetch the next page.
+        """
+        await self._ensure_purge_index()
+        schema = self._get_schema_classes()
+        model = schema.StorageSession
+        if self._uses_naive_datetime():
+            before = before.replace(tzinfo=None)
+        stmt = select(model.user_id, model.id, model.update_time).where(
+            model.app_name == app_name, model.update_time < before
+        )
+        if after is not None:
+            stmt = stmt.where(
+                or_(
+                    model.update_time > after[0],
+                    and_(model.update_time == after[0], model.id > after[1]),
+                )
+            )
+        stmt = stmt.order_by(model.update_time, model.id).limit(limit)
+        async with self._rollback_on_exception_session(read_only=True) as sql_session:
+            rows = (await sql_session.execute(stmt)).all()
+        return [(row[0], row[1], row[2]) for row in rows]
+
+    async def delete_sessions(self, *, app_name: str, sessions: List[Tuple[str, str]]) -> None:
+        """Delete ``(user_id, session_id)`` sessions and their events in one transaction."""
+        if not sessions:
+            return
+        await self.prepare_tables()
+        model = self._get_schema_classes().StorageSession
+        async with self._rollback_on_exception_session() as sql_session:
+            await sql_session.execute(
+                delete(model).where(
+                    model.app_name == app_name,
+                    tuple_(model.user_id, model.id).in_(sessions),
+                )
+            )
+            await sql_session.commit()
+
+
+class SessionReaper:
+    """Periodically expires idle sessions across every store that keeps them.
+
+    ``auth_store`` is the CachedAuthSessionStore, ``session_service`` must
+    include :class:`SessionPurgeMixin`, and ``history_store``/``state_store``
+    provide batched deletes plus ``vacuum(pages)``.
+    """
+
+    def __init__(
+        self,
+        session_service,
+        auth_store,
+        history_store,
+        state_store,
+        app_name: str,
+        ttl: float = SESSION_IDLE_TTL_SECONDS,
+        batch_size: int = SESSION_REAPER_BATCH_SIZE,
+        vacuum_pages: int = SESSION_REAPER_VACUUM_PAGES,
+        interval: float = SESSION_REAPER_INTERVAL_SECONDS,
+    ) -> None:
+        self.session_service = session_service
+        self.auth_store = auth_store
+        self.history_store = history_store
+        self.state_store = state_store
+        self.app_name = app_name
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self.vacuum_pages = vacuum_pages
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def _purge_local(self, session_ids: List[str]) -> None:
+        await asyncio.to_thread(self.history_store.delete_sessions, session_ids)
+        await asyncio.to_thread(self.state_store.delete_many, session_ids)
+
+    async def _reap_auth_sessions(self, cutoff: datetime) -> int:
+        total = 0
+        while True:
+            reaped = await self.auth_store.reap_expired(cutoff.isoformat(), self.batch_size)
+            if reaped:
+                await self._purge_local([session_id for session_id, _ in reaped])
+                total += len(reaped)
+            if len(reaped) < self.batch_size:
+                return total
+
+    async def _purge_backend_sessions(self, cutoff: datetime) -> int:
+        total, after = 0, None
+        while True:
+            stale = await self.session_service.stale_sessions(
+                app_name=self.app_name,
+                before=cutoff.replace(tzinfo=timezone.utc),
+                limit=self.batch_size,
+                after=after,
+            )
+            if not stale:
+                return total
+            # Sessions only used through the fast path can have an old
+            # update_time while their login is still active
+            live = await self.auth_store.existing_sessions([session_id for _, session_id, _ in stale])
+            dead = [(user_id, session_id) for user_id, session_id, _ in stale if session_id not in live]
+            if dead:
+                await self.session_service.delete_sessions(app_name=self.app_name, sessions=dead)
+                await self._purge_local([session_id for _, session_id in dead])
+                total += len(dead)
+            if len(stale) < self.batch_size:
+                return total
+            after = (stale[-1][2], stale[-1][1])
+
+    async def _vacuum(self) -> None:
+        await self.auth_store.vacuum(self.vacuum_pages)
+        await asyncio.to_thread(self.history_store.vacuum, self.vacuum_pages)
+        await asyncio.to_thread(self.state_store.vacuum, self.vacuum_pages)
+
+    async def reap(self) -> Dict[str, int]:
+        """Run one pass; returns the number of sessions removed per store."""
+        started = time.perf_counter()
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl)
+        try:
+            counts = {
+                "auth_sessions": await self._reap_auth_sessions(cutoff),
+                "adk_sessions": await self._purge_backend_sessions(cutoff),
+            }
+            await self._vacuum()
+        finally:
+            REAPER_PASS_DURATION.observe(time.perf_counter() - started)
+        for store, count in counts.items():
+            if count:
+                SESSIONS_REAPED.inc(count, store=store)
+        return counts
+
+    # ----- background task -----
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.reap()
+            except Exception:
+                logger.exception("Error reaping expired sessions")
+
+    def start(self) -> None:
+        """Start periodic reaping on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
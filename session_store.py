@@ -1,21 +1,108 @@
+import asyncio
+import base64
+import json
 import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional, Dict, Any
+from functools import lru_cache
+from typing import Optional, Dict, Any, List, Set, Tuple
+
+from metrics import timed_query
+from sqlite_pool import ThreadLocalConnectionPool, enable_incremental_vacuum, incremental_vacuum
+
+
+# Statements are kept as module constants so every pooled connection hits its
+# prepared-statement cache (sqlite3 caches by exact SQL text).
+_SELECT_COLUMNS = "session_id, user_email, user_name, role, created_at, last_activity, backend_ready"
+_SQL_INSERT = f"""
+    INSERT OR REPLACE INTO active_sessions ({_SELECT_COLUMNS})
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+_SQL_GET = f"SELECT {_SELECT_COLUMNS} FROM active_sessions WHERE session_id = ?"
+_SQL_TOUCH = "UPDATE active_sessions SET last_activity = ? WHERE session_id = ?"
+_SQL_TOUCH_IF_NEWER = (
+    "UPDATE active_sessions SET last_activity = ? "
+    "WHERE session_id = ? AND last_activity < ?"
+)
+_SQL_MARK_BACKEND_READY = "UPDATE active_sessions SET backend_ready = 1 WHERE session_id = ?"
+_SQL_DELETE = "DELETE FROM active_sessions WHERE session_id = ?"
+_SQL_COUNT_USER = "SELECT COUNT(*) FROM active_sessions WHERE user_email = ?"
+# Id lists are bound as one JSON array so the statement text never changes
+_SQL_EXPIRED = """
+    SELECT session_id, user_email FROM active_sessions
+    WHERE last_activity < ?
+    ORDER BY last_activity
+    LIMIT ?
+"""
+_SQL_DELETE_MANY = "DELETE FROM active_sessions WHERE session_id IN (SELECT value FROM json_each(?))"
+_SQL_EXISTING = "SELECT session_id FROM active_sessions WHERE session_id IN (SELECT value FROM json_each(?))"
+
+
+@lru_cache(maxsize=None)
+def _list_sql(by_user: bool, by_role: bool, paged: bool) -> str:
+    """Listing statement for one filter combination (text is stable per combination)."""
+    where = []
+    if by_user:
+        where.append("user_email = ?")
+    if by_role:
+        # With a user filter, unary + keeps the planner on the user index
+        where.append("+role = ?" if by_user else "role = ?")
+    if paged:
+        where.append("(last_activity, session_id) < (?, ?)")
+    clause = f"WHERE {' AND '.join(where)}" if where else ""
+    return (
+        f"SELECT {_SELECT_COLUMNS} FROM active_sessions {clause} "
+        "ORDER BY last_activity DESC, session_id DESC LIMIT ?"
+    )
+
+
+def _encode_cursor(last_activity: str, session_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([last_activity, session_id]).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        last_activity, session_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    return str(last_activity), str(session_id)
+
+
+def _row_to_dict(row) -> Dict[str, Any]:
+    return {
+        "session_id": row[0],
+        "user_email": row[1],
+        "user_name": row[2],
+        "role": row[3],
+        "created_at": row[4],
+        "last_activity": row[5],
+        "backend_ready": bool(row[6]),
+    }
 
 
 class AuthSessionStore:
-    """Simple SQLite-backed store for active auth sessions."""
+    """SQLite-backed store for active auth sessions.
+
+    Connections are pooled per thread and opened in WAL mode, so readers never
+    block the writer and each thread reuses its prepared statements.
+    """
 
     def __init__(self, db_path: str = "auth_sessions.db") -> None:
         self.db_path = db_path
+        self._pool = ThreadLocalConnectionPool(db_path)
         self._init_db()
 
     def _connect(self) -> sqlite3.Connection:
-        # Use check_same_thread=False to allow usage across FastAPI worker threads
-        return sqlite3.connect(self.db_path, check_same_thread=False)
+        return self._pool.connect()
+
+    def close(self) -> None:
+        """Close every pooled connection."""
+        self._pool.close()
 
     def _init_db(self) -> None:
-        with self._connect() as conn:
+        conn = self._connect()
+        enable_incremental_vacuum(conn)
+        with conn:
             conn.execute(
                 """
                 CREATE TABLE IF NOT EXISTS active_sessions (
@@ -24,74 +111,224 @@ class AuthSessionStore:
                     user_name TEXT NOT NULL,
                     role TEXT,
                     created_at TEXT NOT NULL,
-                    last_activity TEXT NOT NULL
+                    last_activity TEXT NOT NULL,
+                    backend_ready INTEGER NOT NULL DEFAULT 1
                 )
                 """
             )
-            conn.commit()
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(active_sessions)")}
+            if "backend_ready" not in columns:
+                # Databases created before lazy backend sessions
+                conn.execute(
+                    "ALTER TABLE active_sessions ADD COLUMN backend_ready INTEGER NOT NULL DEFAULT 1"
+                )
+            # Listing order is (last_activity, session_id) DESC; the filtered
+            # listings and the per-user count each get an index with that suffix
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_active_sessions_activity "
+                "ON active_sessions (last_activity, session_id)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_active_sessions_user "
+                "ON active_sessions (user_email, last_activity, session_id)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_active_sessions_role "
+                "ON active_sessions (role, last_activity, session_id)"
+            )
+            # Superseded by the composite indexes above
+            conn.execute("DROP INDEX IF EXISTS idx_active_sessions_last_activity")
+            conn.execute("DROP INDEX IF EXISTS idx_active_sessions_user_email")
 
-    def create_session(self, session_id: str, user_email: str, user_name: str, role: str) -> None:
+    @timed_query("auth_sessions")
+    def create_session(
+        self, session_id: str, user_email: str, user_name: str, role: str, backend_ready: bool = True
+    ) -> None:
+        """Insert a session row.
+
+        ``backend_ready=False`` records a placeholder whose ADK session has
+        not been created yet (see LAZY_BACKEND_SESSIONS in main.py).
+        """
         now = datetime.utcnow().isoformat()
-        with self._connect() as conn:
+        conn = self._connect()
+        with conn:
             conn.execute(
-                """
-                INSERT OR REPLACE INTO active_sessions (
-                    session_id, user_email, user_name, role, created_at, last_activity
-                ) VALUES (?, ?, ?, ?, ?, ?)
-                """,
-                (session_id, user_email, user_name, role, now, now),
+                _SQL_INSERT, (session_id, user_email, user_name, role, now, now, int(backend_ready))
             )
-            conn.commit()
 
-    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
-        with self._connect() as conn:
-            cur = conn.execute(
-                "SELECT session_id, user_email, user_name, role, created_at, last_activity FROM active_sessions WHERE session_id = ?",
-                (session_id,),
+    @timed_query("auth_sessions")
+    def create_sessions(self, sessions: List[Tuple[str, str, str, str]], backend_ready: bool = True) -> None:
+        """Insert several (session_id, user_email, user_name, role) rows in one transaction."""
+        now = datetime.utcnow().isoformat()
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                _SQL_INSERT, [(*session, now, now, int(backend_ready)) for session in sessions]
             )
-            row = cur.fetchone()
-            if not row:
-                return None
-            return {
-                "session_id": row[0],
-                "user_email": row[1],
-                "user_name": row[2],
-                "role": row[3],
-                "created_at": row[4],
-                "last_activity": row[5],
-            }
 
+    @timed_query("auth_sessions")
+    def mark_backend_ready(self, session_id: str) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute(_SQL_MARK_BACKEND_READY, (session_id,))
+
+    @timed_query("auth_sessions")
+    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute(_SQL_GET, (session_id,)).fetchone()
+        if not row:
+            return None
+        return _row_to_dict(row)
+
+    @timed_query("auth_sessions")
     def touch(self, session_id: str) -> None:
         now = datetime.utcnow().isoformat()
-        with self._connect() as conn:
-            conn.execute(
-                "UPDATE active_sessions SET last_activity = ? WHERE session_id = ?",
-                (now, session_id),
+        conn = self._connect()
+        with conn:
+            conn.execute(_SQL_TOUCH, (now, session_id))
+
+    @timed_query("auth_sessions")
+    def touch_many(self, activity: Dict[str, str]) -> None:
+        """Bulk-update last_activity for several sessions in one transaction.
+
+        Args:
+            activity: mapping of session_id -> ISO timestamp. Timestamps older
+                than the stored value are ignored.
+        """
+        if not activity:
+            return
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                _SQL_TOUCH_IF_NEWER,
+                [(ts, session_id, ts) for session_id, ts in activity.items()],
             )
-            conn.commit()
 
+    @timed_query("auth_sessions")
     def delete(self, session_id: str) -> None:
-        with self._connect() as conn:
-            conn.execute(
-                "DELETE FROM active_sessions WHERE session_id = ?",
-                (session_id,),
-            )
+        conn = self._connect()
+        with conn:
+            conn.execute(_SQL_DELETE, (session_id,))
+
+    @timed_query("auth_sessions")
+    def list_sessions(
+        self,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        user_email: Optional[str] = None,
+        role: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """One page of sessions, most recently active first.
+
+        Pages are keyset-paginated: pass the returned ``next_cursor`` back as
+        ``cursor`` for the next page (None on the last page). Raises
+        ValueError for a malformed cursor.
+        """
+        params: list = []
+        if user_email is not None:
+            params.append(user_email)
+        if role is not None:
+            params.append(role)
+        if cursor is not None:
+            params.extend(_decode_cursor(cursor))
+        sql = _list_sql(user_email is not None, role is not None, cursor is not None)
+        # One extra row tells us whether there is a next page
+        rows = self._connect().execute(sql, (*params, limit + 1)).fetchall()
+        next_cursor = _encode_cursor(rows[limit - 1][5], rows[limit - 1][0]) if len(rows) > limit else None
+        return {"sessions": [_row_to_dict(r) for r in rows[:limit]], "next_cursor": next_cursor}
+
+    @timed_query("auth_sessions")
+    def count_user_sessions(self, user_email: str) -> int:
+        return self._connect().execute(_SQL_COUNT_USER, (user_email,)).fetchone()[0]
+
+    @timed_query("auth_sessions")
+    def reap_expired(self, cutoff: str, limit: int) -> List[Tuple[str, str]]:
+        """Delete up to ``limit`` sessions idle since before ``cutoff``.
+
+        Returns the (session_id, user_email) pairs that were removed.
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(_SQL_EXPIRED, (cutoff, limit)).fetchall()
+            if rows:
+                conn.execute(_SQL_DELETE_MANY, (json.dumps([r[0] for r in rows]),))
             conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return [(r[0], r[1]) for r in rows]
 
-    def list_sessions(self) -> list:
-        with self._connect() as conn:
-            cur = conn.execute(
-                "SELECT session_id, user_email, user_name, role, created_at, last_activity FROM active_sessions ORDER BY last_activity DESC"
-            )
-            rows = cur.fetchall()
-            return [
-                {
-                    "session_id": r[0],
-                    "user_email": r[1],
-                    "user_name": r[2],
-                    "role": r[3],
-                    "created_at": r[4],
-                    "last_activity": r[5],
-                }
-                for r in rows
-            ] 
\ No newline at end of file
+    @timed_query("auth_sessions")
+    def existing_sessions(self, session_ids: List[str]) -> Set[str]:
+        """The subset of ``session_ids`` that still have a row."""
+        rows = self._connect().execute(_SQL_EXISTING, (json.dumps(session_ids),)).fetchall()
+        return {r[0] for r in rows}
+
+    def vacuum(self, pages: int) -> None:
+        incremental_vacuum(self._connect(), pages)
+
+
+class AsyncAuthSessionStore:
+    """Async facade over AuthSessionStore.
+
+    Every call runs on a small dedicated thread pool so FastAPI handlers never
+    do SQLite I/O on the event loop.
+    """
+
+    def __init__(self, store: AuthSessionStore, max_workers: int = 4) -> None:
+        self.store = store
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="auth-store"
+        )
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def create_session(
+        self, session_id: str, user_email: str, user_name: str, role: str, backend_ready: bool = True
+    ) -> None:
+        await self._run(self.store.create_session, session_id, user_email, user_name, role, backend_ready)
+
+    async def create_sessions(self, sessions: List[Tuple[str, str, str, str]], backend_ready: bool = True) -> None:
+        await self._run(self.store.create_sessions, sessions, backend_ready)
+
+    async def mark_backend_ready(self, session_id: str) -> None:
+        await self._run(self.store.mark_backend_ready, session_id)
+
+    async def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return await self._run(self.store.get_session, session_id)
+
+    async def touch(self, session_id: str) -> None:
+        await self._run(self.store.touch, session_id)
+
+    async def touch_many(self, activity: Dict[str, str]) -> None:
+        await self._run(self.store.touch_many, activity)
+
+    async def delete(self, session_id: str) -> None:
+        await self._run(self.store.delete, session_id)
+
+    async def list_sessions(
+        self,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        user_email: Optional[str] = None,
+        role: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        return await self._run(self.store.list_sessions, limit, cursor, user_email, role)
+
+    async def count_user_sessions(self, user_email: str) -> int:
+        return await self._run(self.store.count_user_sessions, user_email)
+
+    async def reap_expired(self, cutoff: str, limit: int) -> List[Tuple[str, str]]:
+        return await self._run(self.store.reap_expired, cutoff, limit)
+
+    async def existing_sessions(self, session_ids: List[str]) -> Set[str]:
+        return await self._run(self.store.existing_sessions, session_ids)
+
+    async def vacuum(self, pages: int) -> None:
+        await self._run(self.store.vacuum, pages)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self.store.close()
@@ -0,0 +1,70 @@
+import sqlite3
+import threading
+from typing import List
+
+
+# Pragmas applied to every new connection
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA mmap_size=67108864",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+class ThreadLocalConnectionPool:
+    """One WAL-mode SQLite connection per thread, reused across calls.
+
+    Readers never block the writer in WAL mode, and because each thread keeps
+    its connection, statements passed as module constants stay in that
+    connection's prepared-statement cache.
+    """
+
+    def __init__(self, db_path: str, cached_statements: int = 64) -> None:
+        self.db_path = db_path
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Each connection is only ever used by the thread that opened it
+            conn = sqlite3.connect(
+                self.db_path,
+                check_same_thread=False,
+                cached_statements=self.cached_statements,
+            )
+            for pragma in PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self) -> None:
+        """Close every pooled connection."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+def enable_incremental_vacuum(conn: sqlite3.Connection) -> None:
+    """Switch a database to auto_vacuum=INCREMENTAL.
+
+    Databases created before the switch are rebuilt once with VACUUM.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+
+
+def incremental_vacuum(conn: sqlite3.Connection, pages: int) -> None:
+    """Return up to ``pages`` free pages to the filesystem."""
+    # executescript steps the pragma to completion; execute() frees one page
+    conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
@@ -0,0 +1,86 @@
+"""Debug snapshots of session state, reported as per-turn diffs.
+
+Off by default. With ``DEBUG_STATE_SNAPSHOTS=1`` the Runner gets a
+:class:`StateSnapshotPlugin`, which copies ``session.state`` from the
+session the Runner already loaded when a run starts, and logs what changed
+when it ends. No extra session reads are made.
+"""
+import copy
+import logging
+import os
+from typing import Any, Dict, Optional
+
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.plugins.base_plugin import BasePlugin
+
+
+DEBUG_STATE_SNAPSHOTS = os.getenv("DEBUG_STATE_SNAPSHOTS", "0") == "1"
+# Longest value repr shown in a diff
+DEBUG_STATE_VALUE_CHARS = int(os.getenv("DEBUG_STATE_VALUE_CHARS", "200"))
+
+logger = logging.getLogger(__name__)
+
+
+def _short(value: Any) -> str:
+    text = repr(value)
+    if len(text) > DEBUG_STATE_VALUE_CHARS:
+        text = text[: DEBUG_STATE_VALUE_CHARS - 3] + "..."
+    return text
+
+
+def state_diff(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Keys added, removed and changed between two state dicts."""
+    return {
+        "added": {k: after[k] for k in after.keys() - before.keys()},
+        "removed": {k: before[k] for k in before.keys() - after.keys()},
+        "changed": {
+            k: (before[k], after[k])
+            for k in before.keys() & after.keys()
+            if before[k] != after[k]
+        },
+    }
+
+
+def format_diff(diff: Dict[str, Dict[str, Any]]) -> str:
+    lines = []
+    for key, value in sorted(diff["added"].items()):
+        lines.append(f"  + {key}: {_short(value)}")
+    for key, value in sorted(diff["removed"].items()):
+        lines.append(f"  - {key}: {_short(value)}")
+    for key, (old, new) in sorted(diff["changed"].items()):
+        lines.append(f"  ~ {key}: {_short(old)} -> {_short(new)}")
+    return "\n".join(lines) if lines else "  (no changes)"
+
+
+class StateSnapshotPlugin(BasePlugin):
+    """Logs the session state changes made by each Runner invocation."""
+
+    def __init__(self) -> None:
+        super().__init__(name="state_snapshots")
+        self._before: Dict[str, Dict[str, Any]] = {}
+
+    async def before_run_callback(self, *, invocation_context: InvocationContext) -> Optional[Any]:
+        session = invocation_context.session
+        self._before[invocation_context.invocation_id] = copy.deepcopy(dict(session.state))
+        return None
+
+    async def after_run_callback(self, *, invocation_context: InvocationContext) -> None:
+        before = self._before.pop(invocation_context.invocation_id, None)
+        if before is None:
+            return
+        session = invocation_context.session
+        diff = state_diff(before, dict(session.state))
+        logger.info(
+            "State changes for session %s:\n%s",
+            session.id,
+            format_diff(diff),
+            extra={"invocation_id": invocation_context.invocation_id},
+        )
+
+    async def on_run_error_callback(self, *, invocation_context: InvocationContext, error: Exception) -> None:
+        self._before.pop(invocation_context.invocation_id, None)
+
+
+def state_snapshot_plugins() -> list:
+    """Plugins to install on the Runner (empty unless snapshots are enabled)."""
+    return [StateSnapshotPlugin()] if DEBUG_STATE_SNAPSHOTS else []
@@ -0,0 +1,293 @@
+"""Append-only persistence for session-scoped state changes.
+
+ADK's DatabaseSessionService rewrites a session's whole ``state`` JSON column
+whenever an event carries a session-scoped state delta, even if the values
+did not change. With :class:`StateDeltaMixin` in front of it:
+
+- keys whose value matches what was last persisted are dropped from the
+  delta (ADK's ``State`` writes the live ``session.state`` together with the
+  delta, so the comparison is against a per-session copy of the persisted
+  state, refreshed by ``get_session`` and ``create_session``)
+- changed session-scoped keys (no ``app:``/``user:``/``temp:`` prefix) are
+  appended as one row per key to ``session_state_deltas`` instead of
+  rewriting the state column; ``app:``/``user:`` keys are left to ADK
+- ``get_session`` overlays the latest snapshot and deltas onto the state
+  ADK loaded (the state written at ``create_session`` is the base)
+- a background compaction folds a session's deltas into one snapshot row
+  once it has ``STATE_COMPACT_MIN_DELTAS`` of them
+
+Turning ``STATE_DELTAS_ENABLED`` off after deltas were written hides those
+values from ``get_session``; compacted snapshots live in this store too.
+"""
+import asyncio
+import copy
+import json
+import logging
+import os
+import sqlite3
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from google.adk.sessions.state import State
+
+from metrics import registry
+from sqlite_pool import ThreadLocalConnectionPool, enable_incremental_vacuum, incremental_vacuum
+
+
+logger = logging.getLogger(__name__)
+
+STATE_DELTAS_ENABLED = os.getenv("STATE_DELTAS_ENABLED", "1") == "1"
+STATE_DELTAS_DB_PATH = os.getenv("STATE_DELTAS_DB_PATH", "session_state.db")
+STATE_COMPACT_INTERVAL_SECONDS = float(os.getenv("STATE_COMPACT_INTERVAL_SECONDS", "60"))
+STATE_COMPACT_MIN_DELTAS = int(os.getenv("STATE_COMPACT_MIN_DELTAS", "50"))
+STATE_PERSISTED_CACHE_SIZE = int(os.getenv("STATE_PERSISTED_CACHE_SIZE", "10000"))
+
+_SHARED_PREFIXES = (State.APP_PREFIX, State.USER_PREFIX, State.TEMP_PREFIX)
+_MISSING = object()
+
+_SQL_APPEND = "INSERT INTO session_state_deltas (session_id, state_key, value) VALUES (?, ?, ?)"
+_SQL_SNAPSHOT = "SELECT state, last_delta_id FROM session_state_snapshots WHERE session_id = ?"
+_SQL_DELTAS_AFTER = """
+    SELECT id, state_key, value FROM session_state_deltas
+    WHERE session_id = ? AND id > ?
+    ORDER BY id
+"""
+_SQL_COMPACTION_CANDIDATES = """
+    SELECT session_id FROM session_state_deltas
+    GROUP BY session_id HAVING COUNT(*) >= ?
+"""
+_SQL_SAVE_SNAPSHOT = """
+    INSERT OR REPLACE INTO session_state_snapshots (session_id, state, last_delta_id)
+    VALUES (?, ?, ?)
+"""
+_SQL_DELETE_FOLDED = "DELETE FROM session_state_deltas WHERE session_id = ? AND id <= ?"
+_SQL_DELETE_DELTAS = "DELETE FROM session_state_deltas WHERE session_id = ?"
+_SQL_DELETE_SNAPSHOT = "DELETE FROM session_state_snapshots WHERE session_id = ?"
+_SQL_DELETE_MANY_DELTAS = "DELETE FROM session_state_deltas WHERE session_id IN (SELECT value FROM json_each(?))"
+_SQL_DELETE_MANY_SNAPSHOTS = "DELETE FROM session_state_snapshots WHERE session_id IN (SELECT value FROM json_each(?))"
+
+STATE_DELTA_KEYS = registry.counter(
+    "aess_state_delta_keys_total",
+    "Session state keys in event deltas: appended, or dropped as unchanged.",
+    ["result"],
+)
+STATE_COMPACTIONS = registry.counter(
+    "aess_state_compactions_total",
+    "Sessions whose state deltas were folded into a snapshot.",
+)
+
+
+class StateDeltaStore:
+    """SQLite log of per-key session state changes plus folded snapshots."""
+
+    def __init__(self, db_path: str = STATE_DELTAS_DB_PATH) -> None:
+        self.db_path = db_path
+        self._pool = ThreadLocalConnectionPool(db_path)
+        self._compact_task: Optional[asyncio.Task] = None
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        return self._pool.connect()
+
+    def close(self) -> None:
+        self._pool.close()
+
+    def _init_db(self) -> None:
+        conn = self._connect()
+        enable_incremental_vacuum(conn)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS session_state_deltas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                state_key TEXT NOT NULL,
+                value TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_state_deltas_session "
+            "ON session_state_deltas (session_id, id)"
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS session_state_snapshots (
+                session_id TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                last_delta_id INTEGER NOT NULL
+            )
+            """
+        )
+        conn.commit()
+
+    def append(self, session_id: str, changes: Dict[str, Any]) -> None:
+        """Record changed keys, one row each, in a single transaction."""
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                _SQL_APPEND,
+                [(session_id, key, json.dumps(value)) for key, value in changes.items()],
+            )
+
+    def _fold(self, conn: sqlite3.Connection, session_id: str):
+        row = conn.execute(_SQL_SNAPSHOT, (session_id,)).fetchone()
+        state, last_id = (json.loads(row[0]), row[1]) if row else ({}, 0)
+        for delta_id, key, value in conn.execute(_SQL_DELTAS_AFTER, (session_id, last_id)):
+            state[key] = json.loads(value)
+            last_id = delta_id
+        return state, last_id
+
+    def load(self, session_id: str) -> Dict[str, Any]:
+        """Snapshot plus every later delta, latest value per key."""
+        return self._fold(self._connect(), session_id)[0]
+
+    def compact(self, min_deltas: int = STATE_COMPACT_MIN_DELTAS) -> int:
+        """Fold deltas into snapshots for sessions with at least ``min_deltas``."""
+        conn = self._connect()
+        candidates = [row[0] for row in conn.execute(_SQL_COMPACTION_CANDIDATES, (min_deltas,))]
+        for session_id in candidates:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                state, last_id = self._fold(conn, session_id)
+                conn.execute(_SQL_SAVE_SNAPSHOT, (session_id, json.dumps(state), last_id))
+                conn.execute(_SQL_DELETE_FOLDED, (session_id, last_id))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            STATE_COMPACTIONS.inc()
+        return len(candidates)
+
+    def delete(self, session_id: str) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute(_SQL_DELETE_DELTAS, (session_id,))
+            conn.execute(_SQL_DELETE_SNAPSHOT, (session_id,))
+
+    def delete_many(self, session_ids: List[str]) -> None:
+        ids = json.dumps(session_ids)
+        conn = self._connect()
+        with conn:
+            conn.execute(_SQL_DELETE_MANY_DELTAS, (ids,))
+            conn.execute(_SQL_DELETE_MANY_SNAPSHOTS, (ids,))
+
+    def vacuum(self, pages: int) -> None:
+        incremental_vacuum(self._connect(), pages)
+
+    # ----- background compaction -----
+    async def _compact_loop(self) -> None:
+        while True:
+            await asyncio.sleep(STATE_COMPACT_INTERVAL_SECONDS)
+            try:
+                await asyncio.to_thread(self.compact)
+            except Exception:
+                logger.exception("Error compacting session state")
+
+    def start(self) -> None:
+        """Start periodic compaction on the running event loop."""
+        if self._compact_task is None or self._compact_task.done():
+            self._compact_task = asyncio.create_task(self._compact_loop())
+
+    async def stop(self) -> None:
+        if self._compact_task is not None:
+            self._compact_task.cancel()
+            try:
+                await self._compact_task
+            except asyncio.CancelledError:
+                pass
+            self._compact_task = None
+
+
+class StateDeltaMixin:
+    """Routes session-scoped state changes through :class:`StateDeltaStore`.
+
+    Mix in ahead of DatabaseSessionService.
+    """
+
+    state_store: StateDeltaStore
+    persisted_cache_size: int = STATE_PERSISTED_CACHE_SIZE
+    _persisted_states: "OrderedDict[str, Dict[str, Any]]"
+
+    def _persisted(self, session_id: str) -> Dict[str, Any]:
+        """Last persisted state of a session (empty if it isn't cached)."""
+        if not hasattr(self, "_persisted_states"):
+            self._persisted_states = OrderedDict()
+        persisted = self._persisted_states.setdefault(session_id, {})
+        self._persisted_states.move_to_end(session_id)
+        while len(self._persisted_states) > self.persisted_cache_size:
+            self._persisted_states.popitem(last=False)
+        return persisted
+
+    def _remember(self, session) -> None:
+        # A copy, so in-place edits to session.state don't leak into it
+        persisted = self._persisted(session.id)
+        persisted.clear()
+        persisted.update(
+            (key, copy.deepcopy(value))
+            for key, value in session.state.items()
+            if not key.startswith(State.TEMP_PREFIX)
+        )
+
+    async def create_session(self, *args, **kwargs):
+        session = await super().create_session(*args, **kwargs)
+        if STATE_DELTAS_ENABLED:
+            self._remember(session)
+        return session
+
+    async def create_sessions(self, *args, **kwargs):
+        # Batched logins (login_batcher.BatchSessionCreateMixin)
+        sessions = await super().create_sessions(*args, **kwargs)
+        if STATE_DELTAS_ENABLED:
+            for session in sessions:
+                self._remember(session)
+        return sessions
+
+    async def get_session(self, *args, **kwargs):
+        session = await super().get_session(*args, **kwargs)
+        if session is not None and STATE_DELTAS_ENABLED:
+            session.state.update(await asyncio.to_thread(self.state_store.load, session.id))
+            self._remember(session)
+        return session
+
+    async def append_event(self, session, event):
+        delta = event.actions.state_delta if event.actions else None
+        if event.partial or not delta or not STATE_DELTAS_ENABLED:
+            return await super().append_event(session, event)
+
+        persisted = self._persisted(session.id)
+        kept, own = {}, {}
+        for key, value in delta.items():
+            if key.startswith(State.TEMP_PREFIX):
+                kept[key] = value
+            elif persisted.get(key, _MISSING) == value:
+                STATE_DELTA_KEYS.inc(result="unchanged")
+            elif key.startswith(_SHARED_PREFIXES):
+                kept[key] = value
+            else:
+                own[key] = value
+
+        event.actions.state_delta = kept
+        result = await super().append_event(session, event)
+        if own:
+            await asyncio.to_thread(self.state_store.append, session.id, own)
+            STATE_DELTA_KEYS.inc(len(own), result="appended")
+            session.state.update(own)
+            # Callers still see the full delta on the yielded event
+            event.actions.state_delta.update(own)
+        persisted.update(
+            (key, copy.deepcopy(value))
+            for key, value in event.actions.state_delta.items()
+            if not key.startswith(State.TEMP_PREFIX)
+        )
+        return result
+
+    async def delete_session(self, *args, **kwargs):
+        await super().delete_session(*args, **kwargs)
+        session_id = kwargs.get("session_id")
+        if session_id and STATE_DELTAS_ENABLED:
+            await asyncio.to_thread(self.state_store.delete, session_id)
+            getattr(self, "_persisted_states", {}).pop(session_id, None)
+
+
+# Shared instance used by the session service in main.py
+state_delta_store = StateDeltaStore()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Local Freshservice stub for exercising the async ticket client.
+
+Run it as a server and point the app at it:
+
+    python freshservice_stub.py --serve --port 8085
+    FRESHSERVICE_URL=http://127.0.0.1:8085/api/v2/tickets uvicorn main:app
+
+or run the client checks against an in-process stub:
+
+    python freshservice_stub.py
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from host_agent.tools.freshservice import CircuitBreaker, CircuitOpenError, FreshserviceClient
+
+
+class StubBehaviour:
+    """What the stub does with the next requests; changed by the checks."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.fail_next = 0
+        self.fail_status = 503
+        self.fail_headers = {}
+        self.requests = 0
+        self.connections = set()
+        self.ids = itertools.count(1000)
+        self.lock = threading.Lock()
+
+
+def make_handler(behaviour: StubBehaviour):
+    class FreshserviceHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status: int, body: dict, headers: dict = None):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            try:
+                self.wfile.write(data)
+            except BrokenPipeError:
+                pass  # client gave up (timeout checks)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            with behaviour.lock:
+                behaviour.requests += 1
+                behaviour.connections.add(self.client_address)
+                failing = behaviour.fail_next > 0
+                if failing:
+                    behaviour.fail_next -= 1
+            if behaviour.latency:
+                time.sleep(behaviour.latency)
+            if failing:
+                self._reply(behaviour.fail_status, {"error": "stub failure"}, behaviour.fail_headers)
+                return
+            if not payload.get("subject") or not payload.get("description"):
+                self._reply(400, {"description": "Validation failed", "errors": ["subject/description"]})
+                return
+            self._reply(201, {"ticket": {"id": next(behaviour.ids), "subject": payload["subject"]}})
+
+    return FreshserviceHandler
+
+
+class StubServer(ThreadingHTTPServer):
+    # The default backlog of 5 drops connects when many tickets open
+    # connections at once, adding a 1s SYN retry
+    request_queue_size = 128
+
+
+def start_stub(port: int = 0, latency: float = 0.0):
+    behaviour = StubBehaviour(latency=latency)
+    server = StubServer(("127.0.0.1", port), make_handler(behaviour))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/api/v2/tickets"
+    return server, behaviour, url
+
+
+class FreshserviceClientTests:
+    """Client behaviour against the stub: reuse, retries, breaker"""
+
+    def __init__(self):
+        self.server, self.behaviour, self.url = start_stub()
+
+    def _client(self, **kwargs):
+        kwargs.setdefault("backoff_base", 0.01)
+        kwargs.setdefault("backoff_max", 0.05)
+        return FreshserviceClient(url=self.url, api_key="test-key", **kwargs)
+
+    async def test_connection_reuse(self):
+        """Sequential tickets share one keep-alive connection"""
+        print("🧪 Testing connection reuse...")
+        client = self._client()
+        self.behaviour.connections.clear()
+        for i in range(10):
+            status, body = await client.create_ticket({"subject": f"s{i}", "description": "d"})
+            assert status == 201, body
+        await client.aclose()
+        print(f"   10 tickets over {len(self.behaviour.connections)} connection(s)")
+        return len(self.behaviour.connections) == 1
+
+    async def test_retry_on_refusal(self):
+        """503 with Retry-After is retried until the stub recovers"""
+        print("🧪 Testing retry with backoff...")
+        client = self._client(max_retries=3)
+        self.behaviour.fail_next = 2
+        self.behaviour.fail_headers = {"Retry-After": "0"}
+        before = self.behaviour.requests
+        status, _ = await client.create_ticket({"subject": "s", "description": "d"})
+        self.behaviour.fail_headers = {}
+        await client.aclose()
+        attempts = self.behaviour.requests - before
+        print(f"   Status {status} after {attempts} attempts")
+        return status == 201 and attempts == 3
+
+    async def test_no_retry_on_ambiguous_5xx(self):
+        """A 502 may come after the ticket was created, so it isn't re-sent"""
+        print("🧪 Testing 5xx passthrough...")
+        client = self._client(max_retries=3)
+        self.behaviour.fail_next = 1
+        self.behaviour.fail_status = 502
+        before = self.behaviour.requests
+        status, _ = await client.create_ticket({"subject": "s", "description": "d"})
+        self.behaviour.fail_status = 503
+        await client.aclose()
+        attempts = self.behaviour.requests - before
+        print(f"   Status {status} after {attempts} attempt(s)")
+        return status == 502 and attempts == 1
+
+    async def test_no_retry_on_4xx(self):
+        """Validation errors come straight back"""
+        print("🧪 Testing 4xx passthrough...")
+        client = self._client()
+        before = self.behaviour.requests
+        status, body = await client.create_ticket({"subject": ""})
+        await client.aclose()
+        print(f"   Status {status}: {body}")
+        return status == 400 and self.behaviour.requests - before == 1
+
+    async def test_timeout(self):
+        """A slow API surfaces as a timeout instead of hanging, and isn't re-sent"""
+        print("🧪 Testing timeout...")
+        client = self._client(timeout=0.1, max_retries=1)
+        self.behaviour.latency = 0.5
+        before = self.behaviour.requests
+        try:
+            await client.create_ticket({"subject": "s", "description": "d"})
+            return False
+        except Exception as e:
+            print(f"   Raised {type(e).__name__}")
+            return "Timeout" in type(e).__name__ and self.behaviour.requests - before == 1
+        finally:
+            self.behaviour.latency = 0.0
+            await client.aclose()
+
+    async def test_circuit_breaker(self):
+        """Repeated failures open the circuit, which recovers after the reset"""
+        print("🧪 Testing circuit breaker...")
+        client = self._client(max_retries=0, breaker=CircuitBreaker(failure_threshold=3, reset_timeout=0.3))
+        self.behaviour.fail_next = 3
+        for _ in range(3):
+            await client.create_ticket({"subject": "s", "description": "d"})
+        before = self.behaviour.requests
+        try:
+            await client.create_ticket({"subject": "s", "description": "d"})
+            opened = False
+        except CircuitOpenError as e:
+            print(f"   {e}")
+            opened = self.behaviour.requests == before
+        await asyncio.sleep(0.35)
+        status, _ = await client.create_ticket({"subject": "s", "description": "d"})
+        await client.aclose()
+        print(f"   Breaker opened: {opened}, trial call status {status}, state {client.breaker.state}")
+        return opened and status == 201 and client.breaker.state == CircuitBreaker.CLOSED
+
+    async def test_concurrent_tickets(self):
+        """Concurrent tickets don't block each other"""
+        print("🧪 Testing concurrent tickets...")
+        client = self._client()
+        self.behaviour.latency = 0.2
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(client.create_ticket({"subject": f"s{i}", "description": "d"}) for i in range(10))
+        )
+        elapsed = time.perf_counter() - start
+        self.behaviour.latency = 0.0
+        await client.aclose()
+        print(f"   10 tickets in {elapsed:.2f}s")
+        return all(status == 201 for status, _ in results) and elapsed < 1.0
+
+    def run_all_tests(self):
+        tests = [
+            self.test_connection_reuse,
+            self.test_retry_on_refusal,
+            self.test_no_retry_on_ambiguous_5xx,
+            self.test_no_retry_on_4xx,
+            self.test_timeout,
+            self.test_circuit_breaker,
+            self.test_concurrent_tickets,
+        ]
+        results = {}
+        for test in tests:
+            try:
+                results[test.__name__] = asyncio.run(test())
+            except Exception as e:
+                print(f"   ❌ {e}")
+                results[test.__name__] = False
+        self.server.shutdown()
+
+        print("\n📊 Freshservice client results:")
+        for name, passed in results.items():
+            print(f"   {'✅' if passed else '❌'} {name}")
+        return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Freshservice stub server")
+    parser.add_argument("--serve", action="store_true", help="Only run the stub server")
+    parser.add_argument("--port", type=int, default=8085)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before replying")
+    args = parser.parse_args()
+
+    if args.serve:
+        server, _, url = start_stub(args.port, args.latency)
+        print(f"Freshservice stub listening on {url}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+    else:
+        results = FreshserviceClientTests().run_all_tests()
+        sys.exit(0 if all(results.values()) else 1)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Checks for session state deltas (state_deltas.py) against a throwaway SQLite
+database. State is written the way tools and callbacks write it, through a
+real ToolContext, so session.state already holds the new value when the
+event is appended. Does not need the API server.
+
+    python state_delta_check.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from google.adk.agents import Agent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event
+from google.adk.sessions import DatabaseSessionService
+from google.adk.tools.tool_context import ToolContext
+
+from state_deltas import StateDeltaMixin, StateDeltaStore
+
+APP_NAME = "state_delta_check"
+USER_ID = "check@example.com"
+
+
+class StateDeltaTests:
+    """State written through ToolContext survives a reload"""
+
+    def __init__(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        store = StateDeltaStore(os.path.join(self.tmp.name, "state.db"))
+
+        class CheckSessionService(StateDeltaMixin, DatabaseSessionService):
+            state_store = store
+
+        self.store = store
+        self.service = CheckSessionService(
+            db_url=f"sqlite+aiosqlite:///{os.path.join(self.tmp.name, 'sessions.db')}"
+        )
+        self.agent = Agent(name="check_agent", model="gemini-2.0-flash")
+
+    async def _write(self, session, values):
+        """Set ``values`` from a tool and append the tool's event."""
+        context = InvocationContext(
+            session_service=self.service,
+            invocation_id="inv",
+            agent=self.agent,
+            session=session,
+        )
+        tool_context = ToolContext(context)
+        for key, value in values.items():
+            tool_context.state[key] = value
+        event = Event(invocation_id="inv", author=self.agent.name, actions=tool_context.actions)
+        await self.service.append_event(session, event)
+        return event
+
+    async def _reload(self, session):
+        return await self.service.get_session(app_name=APP_NAME, user_id=USER_ID, session_id=session.id)
+
+    async def test_tool_write_persisted(self):
+        """A key set through ToolContext.state is there after a reload"""
+        print("🧪 Testing ToolContext state write...")
+        session = await self.service.create_session(app_name=APP_NAME, user_id=USER_ID, state={"role": "employee"})
+        await self._write(session, {"leave_type": "sick", "user:language": "en"})
+        reloaded = await self._reload(session)
+        print(f"   Reloaded state: {reloaded.state}")
+        return reloaded.state.get("leave_type") == "sick" and reloaded.state.get("user:language") == "en"
+
+    async def test_unchanged_dropped(self):
+        """Writing a value that is already persisted adds no delta row"""
+        print("🧪 Testing unchanged value...")
+        session = await self.service.create_session(app_name=APP_NAME, user_id=USER_ID, state={"role": "employee"})
+        event = await self._write(session, {"role": "employee", "step": 1})
+        session = await self._reload(session)
+        event2 = await self._write(session, {"step": 1})
+        print(f"   Deltas kept: {event.actions.state_delta}, then {event2.actions.state_delta}")
+        return event.actions.state_delta == {"step": 1} and event2.actions.state_delta == {}
+
+    async def test_in_place_edit_persisted(self):
+        """A list edited in place and written back counts as a change"""
+        print("🧪 Testing in-place edit...")
+        session = await self.service.create_session(app_name=APP_NAME, user_id=USER_ID, state={"items": ["a"]})
+        session = await self._reload(session)
+        items = session.state["items"]
+        items.append("b")
+        await self._write(session, {"items": items})
+        reloaded = await self._reload(session)
+        print(f"   Reloaded items: {reloaded.state.get('items')}")
+        return reloaded.state.get("items") == ["a", "b"]
+
+    def run_all_tests(self):
+        tests = [
+            self.test_tool_write_persisted,
+            self.test_unchanged_dropped,
+            self.test_in_place_edit_persisted,
+        ]
+        results = {}
+        for test in tests:
+            try:
+                results[test.__name__] = asyncio.run(test())
+            except Exception as e:
+                print(f"   ❌ {type(e).__name__}: {e}")
+                results[test.__name__] = False
+        self.store.close()
+        self.tmp.cleanup()
+
+        print("\n📊 State delta results:")
+        for name, passed in results.items():
+            print(f"   {'✅' if passed else '❌'} {name}")
+        return results
+
+
+if __name__ == "__main__":
+    results = StateDeltaTests().run_all_tests()
+    sys.exit(0 if all(results.values()) else 1)
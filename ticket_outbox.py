@@ -0,0 +1,213 @@
+import json
+import os
+import sqlite3
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlite_pool import ThreadLocalConnectionPool
+
+
+# Job states. "queued" covers new jobs and jobs waiting for a retry;
+# "sending" jobs hold a lease and go back to the queue if it expires.
+QUEUED = "queued"
+SENDING = "sending"
+DELIVERED = "delivered"
+DEAD = "dead"
+
+_SQL_ENQUEUE = """
+    INSERT INTO ticket_outbox (
+        ref, user_id, session_id, payload, status, attempts,
+        next_attempt_at, created_at, updated_at
+    ) VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?)
+"""
+_SQL_DUE = """
+    SELECT ref, payload, attempts FROM ticket_outbox
+    WHERE status IN (?, ?) AND next_attempt_at <= ?
+    ORDER BY next_attempt_at
+    LIMIT ?
+"""
+_SQL_LEASE = """
+    UPDATE ticket_outbox SET status = ?, next_attempt_at = ?, updated_at = ?
+    WHERE ref = ?
+"""
+# Renews a lease only if it is still the one this dispatcher holds
+_SQL_RENEW_LEASE = """
+    UPDATE ticket_outbox SET next_attempt_at = ?, updated_at = ?
+    WHERE ref = ? AND status = ? AND next_attempt_at = ?
+"""
+_SQL_DELIVERED = """
+    UPDATE ticket_outbox
+    SET status = ?, ticket_id = ?, attempts = attempts + 1, last_error = NULL, updated_at = ?
+    WHERE ref = ?
+"""
+_SQL_RETRY = """
+    UPDATE ticket_outbox
+    SET status = ?, attempts = attempts + ?, next_attempt_at = ?, last_error = ?, updated_at = ?
+    WHERE ref = ?
+"""
+_SQL_DEAD = """
+    UPDATE ticket_outbox
+    SET status = ?, attempts = attempts + 1, last_error = ?, updated_at = ?
+    WHERE ref = ?
+"""
+_SQL_GET = """
+    SELECT ref, user_id, session_id, status, attempts, ticket_id, last_error,
+           created_at, updated_at
+    FROM ticket_outbox WHERE ref = ?
+"""
+_SQL_COUNTS = "SELECT status, COUNT(*) FROM ticket_outbox GROUP BY status"
+
+
+def new_reference() -> str:
+    """Provisional reference handed to the user before Freshservice replies."""
+    return f"TKT-{uuid.uuid4().hex[:10].upper()}"
+
+
+class TicketOutbox:
+    """Durable SQLite job table for outgoing Freshservice tickets.
+
+    Tickets are written here first and delivered by a background dispatcher,
+    so a slow or unavailable ticketing API neither blocks the agent turn nor
+    loses the ticket. Claimed jobs carry a lease: if the process dies while
+    sending, the job becomes due again when the lease runs out.
+    """
+
+    def __init__(self, db_path: str = "ticket_outbox.db") -> None:
+        self.db_path = db_path
+        self._pool = ThreadLocalConnectionPool(db_path)
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        return self._pool.connect()
+
+    def close(self) -> None:
+        self._pool.close()
+
+    def _init_db(self) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ticket_outbox (
+                    ref TEXT PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    session_id TEXT,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    next_attempt_at REAL NOT NULL,
+                    ticket_id TEXT,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_ticket_outbox_due
+                ON ticket_outbox (status, next_attempt_at)
+                """
+            )
+
+    def enqueue(self, payload: Dict[str, Any], user_id: str, session_id: Optional[str] = None) -> str:
+        """Store a ticket for delivery. Returns its provisional reference."""
+        ref = new_reference()
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                _SQL_ENQUEUE,
+                (ref, user_id, session_id, json.dumps(payload), QUEUED, now, now, now),
+            )
+        return ref
+
+    def claim_due(self, limit: int, lease_seconds: float) -> List[Tuple[str, Dict[str, Any], int, float]]:
+        """Lease up to ``limit`` due jobs.
+
+        Returns (ref, payload, attempts, leased_until) tuples; pass
+        ``leased_until`` to :meth:`renew_lease` before sending a job.
+        """
+        now = time.time()
+        leased_until = now + lease_seconds
+        conn = self._connect()
+        # BEGIN IMMEDIATE takes the write lock up front, so two dispatchers
+        # can't claim the same rows
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(_SQL_DUE, (QUEUED, SENDING, now, limit)).fetchall()
+            conn.executemany(
+                _SQL_LEASE, [(SENDING, leased_until, now, r[0]) for r in rows]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return [(r[0], json.loads(r[1]), r[2], leased_until) for r in rows]
+
+    def renew_lease(self, ref: str, leased_until: float, lease_seconds: float) -> Optional[float]:
+        """Restart the lease on a job that is about to be sent.
+
+        Returns the new expiry, or None if the lease was lost (it ran out and
+        another dispatcher claimed the job), in which case the job must not
+        be sent.
+        """
+        now = time.time()
+        renewed_until = now + lease_seconds
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(_SQL_RENEW_LEASE, (renewed_until, now, ref, SENDING, leased_until))
+        return renewed_until if cursor.rowcount else None
+
+    def record_results(
+        self,
+        delivered: Iterable[Tuple[str, Any]] = (),
+        retries: Iterable[Tuple[str, float, str, bool]] = (),
+        dead: Iterable[Tuple[str, str]] = (),
+    ) -> None:
+        """Write a batch of delivery outcomes in one transaction.
+
+        Args:
+            delivered: (ref, ticket_id) pairs
+            retries: (ref, retry_at, error, count_attempt) tuples
+            dead: (ref, error) pairs for jobs that will not be retried
+        """
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                _SQL_DELIVERED,
+                [
+                    (DELIVERED, None if ticket_id is None else str(ticket_id), now, ref)
+                    for ref, ticket_id in delivered
+                ],
+            )
+            conn.executemany(
+                _SQL_RETRY,
+                [
+                    (QUEUED, int(counted), retry_at, error, now, ref)
+                    for ref, retry_at, error, counted in retries
+                ],
+            )
+            conn.executemany(_SQL_DEAD, [(DEAD, error, now, ref) for ref, error in dead])
+
+    def get(self, ref: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute(_SQL_GET, (ref,)).fetchone()
+        if not row:
+            return None
+        keys = (
+            "ref", "user_id", "session_id", "status", "attempts", "ticket_id",
+            "last_error", "created_at", "updated_at",
+        )
+        return dict(zip(keys, row))
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs in each state."""
+        counts = {QUEUED: 0, SENDING: 0, DELIVERED: 0, DEAD: 0}
+        counts.update(dict(self._connect().execute(_SQL_COUNTS).fetchall()))
+        return counts
+
+
+# Shared instance used by the case management tool and the API
+ticket_outbox = TicketOutbox(db_path=os.getenv("TICKET_OUTBOX_DB_PATH", "ticket_outbox.db"))
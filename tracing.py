@@ -0,0 +1,223 @@
+"""OpenTelemetry tracing for requests, agent runs, tools and session storage.
+
+Off unless ``TRACING_ENABLED=1``; without a configured provider every span
+below is a no-op. When enabled, spans are exported in batches to
+``TRACING_EXPORT_PATH`` as JSON lines (one span per line, OTel JSON field
+names), and also to an OTLP collector when ``TRACING_OTLP_ENDPOINT`` is set
+and ``opentelemetry-exporter-otlp`` is installed.
+
+ADK emits its own spans (invoke_agent, call_llm, execute_tool) through the
+global provider, so they nest under the request spans created here.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+from opentelemetry.trace import Status, StatusCode
+
+
+logger = logging.getLogger(__name__)
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "0") == "1"
+TRACING_EXPORT_PATH = os.getenv("TRACING_EXPORT_PATH", "traces.jsonl")
+TRACING_OTLP_ENDPOINT = os.getenv("TRACING_OTLP_ENDPOINT")
+TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "aess-agent-api")
+
+tracer = trace.get_tracer("aess")
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Appends finished spans to a file, one JSON object per line."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = "".join(span.to_json(indent=None) + "\n" for span in spans)
+        with self._lock:
+            if self._file.closed:
+                return SpanExportResult.FAILURE
+            self._file.write(lines)
+            self._file.flush()
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+def setup_tracing() -> Optional[TracerProvider]:
+    """Install the global tracer provider if tracing is enabled."""
+    if not TRACING_ENABLED:
+        return None
+    provider = TracerProvider(resource=Resource.create({"service.name": TRACING_SERVICE_NAME}))
+    provider.add_span_processor(BatchSpanProcessor(JsonLinesSpanExporter(TRACING_EXPORT_PATH)))
+    if TRACING_OTLP_ENDPOINT:
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            logger.warning("TRACING_OTLP_ENDPOINT set but opentelemetry-exporter-otlp is not installed")
+        else:
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=TRACING_OTLP_ENDPOINT)))
+    trace.set_tracer_provider(provider)
+    logger.info("Tracing enabled, exporting spans to %s", TRACING_EXPORT_PATH)
+    return provider
+
+
+def shutdown_tracing() -> None:
+    """Flush and close exporters (no-op when tracing is off)."""
+    provider = trace.get_tracer_provider()
+    if isinstance(provider, TracerProvider):
+        provider.shutdown()
+
+
+class TracingMiddleware:
+    """ASGI middleware opening one server span per HTTP request.
+
+    The span is renamed to the route template once routing has happened,
+    and covers streaming responses until their final chunk.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope.get("method", "")
+        with tracer.start_as_current_span(
+            f"{method} {scope.get('path', '')}", kind=trace.SpanKind.SERVER
+        ) as span:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.response.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.set_status(Status(StatusCode.ERROR))
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = getattr(scope.get("route"), "path", None)
+                if route:
+                    span.update_name(f"{method} {route}")
+                    span.set_attribute("http.route", route)
+                span.set_attribute("http.request.method", method)
+
+
+class RunTracer:
+    """Turns the events of one agent run into spans.
+
+    Opens an ``agent_run`` span, then records (after the fact, with the
+    observed timestamps) one ``agent <author>`` span per stretch of
+    consecutive events from the same author and one ``tool <name>`` span per
+    function_call/function_response pair. Call :meth:`end` when the run stops.
+    """
+
+    def __init__(self, name: str = "agent_run", **attributes) -> None:
+        self.span = tracer.start_span(name, attributes=attributes)
+        self.recording = self.span.is_recording()
+        self._context = trace.set_span_in_context(self.span)
+        self._last_event_ns = time.time_ns()
+        self._segment: Optional[Tuple[str, int, int, int]] = None  # author, start, end, events
+        self._pending: Dict[str, Tuple[str, int, Optional[str]]] = {}
+
+    def activate(self):
+        """Context manager making the run span current, so ADK and session
+        spans started inside the run nest under it."""
+        return trace.use_span(self.span, end_on_exit=False)
+
+    def _emit(self, name: str, start_ns: int, end_ns: int, attributes: dict, error: Optional[str] = None) -> None:
+        span = tracer.start_span(name, context=self._context, start_time=start_ns, attributes=attributes)
+        if error:
+            span.set_status(Status(StatusCode.ERROR, error))
+        span.end(end_time=end_ns)
+
+    def _close_segment(self) -> None:
+        if self._segment:
+            author, start_ns, end_ns, events = self._segment
+            self._emit(f"agent {author}", start_ns, end_ns, {"agent.name": author, "agent.events": events})
+            self._segment = None
+
+    def observe(self, event) -> None:
+        if not self.recording:
+            return
+        now = time.time_ns()
+        author = event.author or "unknown"
+        if self._segment and self._segment[0] == author:
+            self._segment = (author, self._segment[1], now, self._segment[3] + 1)
+        else:
+            self._close_segment()
+            self._segment = (author, self._last_event_ns, now, 1)
+        self._last_event_ns = now
+
+        if not (event.content and event.content.parts):
+            return
+        for part in event.content.parts:
+            call = getattr(part, "function_call", None)
+            if call:
+                self._pending[call.id or call.name] = (call.name, now, author)
+            response = getattr(part, "function_response", None)
+            if response:
+                pending = self._pending.pop(response.id or response.name, None)
+                if pending:
+                    name, start_ns, caller = pending
+                    self._emit(f"tool {name}", start_ns, now, {"tool.name": name, "agent.name": caller})
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        if self.recording:
+            self._close_segment()
+            now = time.time_ns()
+            for name, start_ns, caller in self._pending.values():
+                self._emit(
+                    f"tool {name}", start_ns, now, {"tool.name": name, "agent.name": caller}, "no function_response"
+                )
+            self._pending.clear()
+        if error is not None:
+            self.span.record_exception(error)
+            self.span.set_status(Status(StatusCode.ERROR, str(error)))
+        self.span.end()
+
+
+class SessionTracingMixin:
+    """Wraps session service calls in ``session.<method>`` spans.
+
+    Mix in ahead of an ADK session service class::
+
+        class TracedDatabaseSessionService(SessionTracingMixin, DatabaseSessionService):
+            pass
+    """
+
+    async def create_session(self, *args, **kwargs):
+        with tracer.start_as_current_span("session.create_session"):
+            return await super().create_session(*args, **kwargs)
+
+    async def create_sessions(self, *args, **kwargs):
+        attributes = {"session.count": len(kwargs.get("sessions", ()))}
+        with tracer.start_as_current_span("session.create_sessions", attributes=attributes):
+            return await super().create_sessions(*args, **kwargs)
+
+    async def get_session(self, *args, **kwargs):
+        with tracer.start_as_current_span("session.get_session"):
+            return await super().get_session(*args, **kwargs)
+
+    async def list_sessions(self, *args, **kwargs):
+        with tracer.start_as_current_span("session.list_sessions"):
+            return await super().list_sessions(*args, **kwargs)
+
+    async def delete_session(self, *args, **kwargs):
+        with tracer.start_as_current_span("session.delete_session"):
+            return await super().delete_session(*args, **kwargs)
+
+    async def append_event(self, session, event):
+        with tracer.start_as_current_span("session.append_event", attributes={"event.author": event.author or ""}):
+            return await super().append_event(session, event)
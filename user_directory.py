@@ -0,0 +1,319 @@
+"""User directory backends and password hashing for /login.
+
+Passwords are hashed with scrypt (memory-hard; cost tunable through
+``USER_HASH_SCRYPT_N/R/P``) and verified on a dedicated thread pool, so a
+burst of logins never runs key derivation on the event loop. Stored hashes
+look like ``scrypt$N$r$p$salt$hash`` (base64 salt and hash). Legacy bare
+SHA-256 hex digests are wrapped when accounts are seeded, as scrypt over the
+hex digest (``scrypt-sha256$N$r$p$salt$hash``), so checking them costs the
+same as any other password. Wrapped hashes are upgraded to plain scrypt on
+the next successful login, as are scrypt hashes made with different
+parameters.
+
+Backends, picked with ``USER_DIRECTORY_BACKEND``:
+
+- ``sqlite`` (default): ``users`` table in ``USER_DIRECTORY_DB_PATH``, read
+  one row per lookup through the primary key, with recently used accounts
+  kept in an in-memory hot set (``USER_HOT_SET_SIZE``,
+  ``USER_HOT_SET_TTL_SECONDS``)
+- ``memory``: a plain dict, for tests and demos
+
+Unknown emails are checked against a dummy hash, so a failed login takes as
+long whether or not the account exists.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from metrics import registry
+from sqlite_pool import ThreadLocalConnectionPool
+
+
+USER_DIRECTORY_BACKEND = os.getenv("USER_DIRECTORY_BACKEND", "sqlite")
+USER_DIRECTORY_DB_PATH = os.getenv("USER_DIRECTORY_DB_PATH", "users.db")
+USER_HOT_SET_SIZE = int(os.getenv("USER_HOT_SET_SIZE", "10000"))
+USER_HOT_SET_TTL_SECONDS = float(os.getenv("USER_HOT_SET_TTL_SECONDS", "300"))
+USER_HASH_SCRYPT_N = int(os.getenv("USER_HASH_SCRYPT_N", str(2**14)))
+USER_HASH_SCRYPT_R = int(os.getenv("USER_HASH_SCRYPT_R", "8"))
+USER_HASH_SCRYPT_P = int(os.getenv("USER_HASH_SCRYPT_P", "1"))
+USER_HASH_WORKERS = int(os.getenv("USER_HASH_WORKERS", str(min(8, os.cpu_count() or 1))))
+
+_SALT_BYTES = 16
+_KEY_BYTES = 32
+
+_SQL_GET_USER = "SELECT email, user_name, role, password_hash FROM users WHERE email = ?"
+_SQL_UPSERT_USER = """
+    INSERT INTO users (email, user_name, role, password_hash) VALUES (?, ?, ?, ?)
+    ON CONFLICT(email) DO UPDATE SET
+        user_name = excluded.user_name,
+        role = excluded.role,
+        password_hash = excluded.password_hash
+"""
+_SQL_SEED_USER = "INSERT OR IGNORE INTO users (email, user_name, role, password_hash) VALUES (?, ?, ?, ?)"
+_SQL_SET_HASH = "UPDATE users SET password_hash = ? WHERE email = ?"
+_SQL_LEGACY_HASHES = "SELECT email, password_hash FROM users WHERE password_hash NOT LIKE 'scrypt%'"
+
+PASSWORD_HASH_SECONDS = registry.histogram(
+    "aess_password_verify_seconds",
+    "Time to verify a password, including waiting for a hashing thread.",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+USER_LOOKUPS = registry.counter(
+    "aess_user_directory_lookups_total",
+    "User directory lookups by source.",
+    ["source"],
+)
+
+
+# ===== Password hashing =====
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(
+        password.encode(), salt=salt, n=n, r=r, p=p,
+        maxmem=256 * n * r * p + (1 << 20), dklen=_KEY_BYTES,
+    )
+
+
+def _encode(scheme: str, secret: str, n: int, r: int, p: int) -> str:
+    salt = os.urandom(_SALT_BYTES)
+    key = _scrypt(secret, salt, n, r, p)
+    b64 = lambda b: base64.b64encode(b).decode()
+    return f"{scheme}${n}${r}${p}${b64(salt)}${b64(key)}"
+
+
+def hash_password(
+    password: str,
+    n: int = USER_HASH_SCRYPT_N,
+    r: int = USER_HASH_SCRYPT_R,
+    p: int = USER_HASH_SCRYPT_P,
+) -> str:
+    """Encode a new scrypt hash with a random salt."""
+    return _encode("scrypt", password, n, r, p)
+
+
+def _is_legacy(encoded: str) -> bool:
+    return not encoded.startswith(("scrypt$", "scrypt-sha256$"))
+
+
+def wrap_legacy_hash(
+    encoded: str,
+    n: int = USER_HASH_SCRYPT_N,
+    r: int = USER_HASH_SCRYPT_R,
+    p: int = USER_HASH_SCRYPT_P,
+) -> str:
+    """Wrap a bare SHA-256 hex digest in scrypt; other hashes are returned as is."""
+    return _encode("scrypt-sha256", encoded, n, r, p) if _is_legacy(encoded) else encoded
+
+
+def verify_password(password: str, encoded: str) -> Tuple[bool, bool]:
+    """Check a password against a stored hash.
+
+    Returns ``(ok, needs_rehash)``; ``needs_rehash`` is set for legacy
+    SHA-256 hashes (wrapped or not) and for scrypt hashes made with other
+    parameters.
+    """
+    if _is_legacy(encoded):
+        # Unwrapped unsalted SHA-256 hex digest. Still run one scrypt so the
+        # check takes as long as for any other account
+        _scrypt(password, b"", USER_HASH_SCRYPT_N, USER_HASH_SCRYPT_R, USER_HASH_SCRYPT_P)
+        ok = hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), encoded)
+        return ok, ok
+
+    scheme, n, r, p, salt, key = encoded.split("$")
+    n, r, p = int(n), int(r), int(p)
+    secret = hashlib.sha256(password.encode()).hexdigest() if scheme == "scrypt-sha256" else password
+    candidate = _scrypt(secret, base64.b64decode(salt), n, r, p)
+    ok = hmac.compare_digest(candidate, base64.b64decode(key))
+    current = scheme == "scrypt" and (n, r, p) == (USER_HASH_SCRYPT_N, USER_HASH_SCRYPT_R, USER_HASH_SCRYPT_P)
+    return ok, ok and not current
+
+
+# ===== Directories =====
+class UserDirectory(ABC):
+    """Looks up accounts and authenticates them off the event loop.
+
+    Subclasses implement ``_load_user`` and ``_save_hash`` (both blocking;
+    they run in the default executor).
+    """
+
+    def __init__(self, hash_workers: int = USER_HASH_WORKERS) -> None:
+        self._hash_pool = ThreadPoolExecutor(max_workers=hash_workers, thread_name_prefix="pwhash")
+        self._dummy_hash: Optional[str] = None
+
+    @abstractmethod
+    def _load_user(self, email: str) -> Optional[Dict[str, Any]]:
+        """Return the account row for ``email``, or None if there is none."""
+
+    @abstractmethod
+    def _save_hash(self, email: str, password_hash: str) -> None:
+        """Replace the stored password hash for ``email``."""
+
+    async def get_user(self, email: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._load_user, email)
+
+    async def _verify(self, password: str, encoded: str) -> Tuple[bool, bool]:
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self._hash_pool, verify_password, password, encoded)
+        finally:
+            PASSWORD_HASH_SECONDS.observe(time.perf_counter() - started)
+
+    async def authenticate(self, email: str, password: str) -> Optional[Dict[str, Any]]:
+        """Return the user record if the password matches, else None."""
+        user = await self.get_user(email)
+        if user is None:
+            if self._dummy_hash is None:
+                loop = asyncio.get_running_loop()
+                self._dummy_hash = await loop.run_in_executor(self._hash_pool, hash_password, "")
+            await self._verify(password, self._dummy_hash)
+            return None
+
+        ok, needs_rehash = await self._verify(password, user["password_hash"])
+        if not ok:
+            return None
+        if needs_rehash:
+            loop = asyncio.get_running_loop()
+            new_hash = await loop.run_in_executor(self._hash_pool, hash_password, password)
+            await asyncio.to_thread(self._save_hash, email, new_hash)
+            user["password_hash"] = new_hash
+        return user
+
+    def close(self) -> None:
+        self._hash_pool.shutdown(wait=False)
+
+
+class InMemoryUserDirectory(UserDirectory):
+    """Accounts held in a dict keyed by email (the USERS_DB format)."""
+
+    def __init__(self, users: Dict[str, Dict[str, Any]], **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.users = {email: dict(user) for email, user in users.items()}
+        for user in self.users.values():
+            user["password_hash"] = wrap_legacy_hash(user["password_hash"])
+
+    def _load_user(self, email: str) -> Optional[Dict[str, Any]]:
+        USER_LOOKUPS.inc(source="memory")
+        user = self.users.get(email)
+        return dict(user) if user else None
+
+    def _save_hash(self, email: str, password_hash: str) -> None:
+        self.users[email]["password_hash"] = password_hash
+
+
+class SqliteUserDirectory(UserDirectory):
+    """SQLite-backed accounts with an LRU/TTL hot set in front.
+
+    Nothing is loaded up front; each miss is a primary-key lookup.
+    """
+
+    def __init__(
+        self,
+        db_path: str = USER_DIRECTORY_DB_PATH,
+        hot_set_size: int = USER_HOT_SET_SIZE,
+        hot_set_ttl: float = USER_HOT_SET_TTL_SECONDS,
+        **kwargs,
+    ) -> None:
+        super().__init__(**kwargs)
+        self.db_path = db_path
+        self.hot_set_size = hot_set_size
+        self.hot_set_ttl = hot_set_ttl
+        self._hot: "OrderedDict[str, tuple]" = OrderedDict()
+        self._hot_lock = threading.Lock()
+        self._pool = ThreadLocalConnectionPool(db_path)
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        return self._pool.connect()
+
+    def _init_db(self) -> None:
+        conn = self._connect()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                email TEXT PRIMARY KEY,
+                user_name TEXT NOT NULL,
+                role TEXT NOT NULL,
+                password_hash TEXT NOT NULL
+            )
+            """
+        )
+        conn.commit()
+
+    def seed(self, users: Dict[str, Dict[str, Any]]) -> None:
+        """Add accounts that don't exist yet (existing rows are left alone).
+
+        Legacy SHA-256 digests, seeded now or stored earlier, are wrapped
+        in scrypt.
+        """
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                _SQL_SEED_USER,
+                [(email, u["user_name"], u["role"], u["password_hash"]) for email, u in users.items()],
+            )
+            legacy = conn.execute(_SQL_LEGACY_HASHES).fetchall()
+            conn.executemany(
+                _SQL_SET_HASH, [(wrap_legacy_hash(digest), email) for email, digest in legacy]
+            )
+
+    def upsert_user(self, email: str, user_name: str, role: str, password: str) -> None:
+        """Create or replace an account, hashing the password with current settings."""
+        conn = self._connect()
+        with conn:
+            conn.execute(_SQL_UPSERT_USER, (email, user_name, role, hash_password(password)))
+        with self._hot_lock:
+            self._hot.pop(email, None)
+
+    def _load_user(self, email: str) -> Optional[Dict[str, Any]]:
+        USER_LOOKUPS.inc(source="sqlite")
+        row = self._connect().execute(_SQL_GET_USER, (email,)).fetchone()
+        if row is None:
+            return None
+        user = {"user_email": row[0], "user_name": row[1], "role": row[2], "password_hash": row[3]}
+        with self._hot_lock:
+            self._hot[email] = (user, time.monotonic() + self.hot_set_ttl)
+            self._hot.move_to_end(email)
+            while len(self._hot) > self.hot_set_size:
+                self._hot.popitem(last=False)
+        return dict(user)
+
+    async def get_user(self, email: str) -> Optional[Dict[str, Any]]:
+        # Hot-set hits don't need a thread hop
+        cached = self._hot.get(email)
+        if cached is not None and cached[1] > time.monotonic():
+            USER_LOOKUPS.inc(source="hot_set")
+            return dict(cached[0])
+        return await super().get_user(email)
+
+    def _save_hash(self, email: str, password_hash: str) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute(_SQL_SET_HASH, (password_hash, email))
+        with self._hot_lock:
+            self._hot.pop(email, None)
+
+    def close(self) -> None:
+        super().close()
+        self._pool.close()
+
+
+def build_user_directory(seed_users: Optional[Dict[str, Dict[str, Any]]] = None) -> UserDirectory:
+    """Create the configured directory, seeding it with ``seed_users``."""
+    backend = USER_DIRECTORY_BACKEND.lower()
+    if backend == "memory":
+        return InMemoryUserDirectory(seed_users or {})
+    if backend != "sqlite":
+        raise ValueError(f"Unknown user directory backend '{backend}'")
+    directory = SqliteUserDirectory()
+    if seed_users:
+        directory.seed(seed_users)
+    return directory
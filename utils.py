@@ -1,37 +1,27 @@
-import time
+import asyncio
+import contextvars
+import json
+import logging
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
 from google.genai import types
-from datetime import datetime
-
-
-# ANSI color codes for terminal output
-class Colors:
-    RESET = "\033[0m"
-    BOLD = "\033[1m"
-    UNDERLINE = "\033[4m"
-
-    # Foreground colors
-    BLACK = "\033[30m"
-    RED = "\033[31m"
-    GREEN = "\033[32m"
-    YELLOW = "\033[33m"
-    BLUE = "\033[34m"
-    MAGENTA = "\033[35m"
-    CYAN = "\033[36m"
-    WHITE = "\033[37m"
-
-    # Background colors
-    BG_BLACK = "\033[40m"
-    BG_RED = "\033[41m"
-    BG_GREEN = "\033[42m"
-    BG_YELLOW = "\033[43m"
-    BG_BLUE = "\033[44m"
-    BG_MAGENTA = "\033[45m"
-    BG_CYAN = "\033[46m"
-    BG_WHITE = "\033[47m"
+
+from history_store import history_store
+from logging_setup import sample_events
+from metrics import RunObserver
+from tracing import RunTracer, SessionTracingMixin
+
+logger = logging.getLogger(__name__)
+
+# Per-run sampling decision for per-event DEBUG logging
+_event_logging = contextvars.ContextVar("event_logging", default=True)
 
 
 async def update_interaction_history(session_service, app_name, user_id, session_id, entry):
-    """Add an entry to the interaction history in state.
+    """Append an entry to the session's interaction history.
+
+    Entries go to the append-only history store (one INSERT per entry) rather
+    than being written back into the session state.
 
     Args:
         session_service: The session service instance
@@ -43,34 +33,9 @@ async def update_interaction_history(session_service, app_name, user_id, session
             - other keys are flexible depending on the action type
     """
     try:
-        # Get current session
-        session = await session_service.get_session(
-            app_name=app_name, user_id=user_id, session_id=session_id
-        )
-
-        # Get current interaction history
-        interaction_history = session.state.get("interaction_history", [])
-
-        # Add timestamp if not already present
-        if "timestamp" not in entry:
-            entry["timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        # Add the entry to interaction history
-        interaction_history.append(entry)
-
-        # Create updated state
-        updated_state = session.state.copy()
-        updated_state["interaction_history"] = interaction_history
-
-        # Create a new session with updated state
-        await session_service.create_session(
-            app_name=app_name,
-            user_id=user_id,
-            session_id=session_id,
-            state=updated_state,
-        )
-    except Exception as e:
-        print(f"Error updating interaction history: {e}")
+        await asyncio.to_thread(history_store.append, session_id, user_id, entry)
+    except Exception:
+        logger.exception("Error updating interaction history", extra={"session_id": session_id})
 
 
 async def add_user_query_to_history(session_service, app_name, user_id, session_id, query):
@@ -104,89 +69,42 @@ async def add_agent_response_to_history(
     )
 
 
-async def display_state(
-    session_service, app_name, user_id, session_id, label="Current State"
-):
-    """Display the current session state in a formatted way."""
-    try:
-        session = await session_service.get_session(
-            app_name=app_name, user_id=user_id, session_id=session_id
-        )
-
-        # Format the output with clear sections
-        print(f"\n{'-' * 10} {label} {'-' * 10}")
-
-        # Handle the user name
-        user_name = session.state.get("user_name", "Unknown")
-        print(f"👤 User: {user_name}")
-
-        # Handle purchased courses
-        purchased_courses = session.state.get("purchased_courses", [])
-        if purchased_courses and any(purchased_courses):
-            print("📚 Courses:")
-            for course in purchased_courses:
-                if isinstance(course, dict):
-                    course_id = course.get("id", "Unknown")
-                    purchase_date = course.get("purchase_date", "Unknown date")
-                    print(f"  - {course_id} (purchased on {purchase_date})")
-                elif course:  # Handle string format for backward compatibility
-                    print(f"  - {course}")
-        else:
-            print("📚 Courses: None")
-
-        # Handle interaction history in a more readable way
-        interaction_history = session.state.get("interaction_history", [])
-        if interaction_history:
-            print("📝 Interaction History:")
-            for idx, interaction in enumerate(interaction_history, 1):
-                # Pretty format dict entries, or just show strings
-                if isinstance(interaction, dict):
-                    action = interaction.get("action", "interaction")
-                    timestamp = interaction.get("timestamp", "unknown time")
-
-                    if action == "user_query":
-                        query = interaction.get("query", "")
-                        print(f'  {idx}. User query at {timestamp}: "{query}"')
-                    elif action == "agent_response":
-                        agent = interaction.get("agent", "unknown")
-                        response = interaction.get("response", "")
-                        # Truncate very long responses for display
-                        if len(response) > 100:
-                            response = response[:97] + "..."
-                        print(f'  {idx}. {agent} response at {timestamp}: "{response}"')
-                    else:
-                        details = ", ".join(
-                            f"{k}: {v}"
-                            for k, v in interaction.items()
-                            if k not in ["action", "timestamp"]
-                        )
-                        print(
-                            f"  {idx}. {action} at {timestamp}"
-                            + (f" ({details})" if details else "")
-                        )
-                else:
-                    print(f"  {idx}. {interaction}")
-        else:
-            print("📝 Interaction History: None")
-
-        # Show any additional state keys that might exist
-        other_keys = [
-            k
-            for k in session.state.keys()
-            if k not in ["user_name", "purchased_courses", "interaction_history"]
-        ]
-        if other_keys:
-            print("🔑 Additional State:")
-            for key in other_keys:
-                print(f"  {key}: {session.state[key]}")
-
-        print("-" * (22 + len(label)))
-    except Exception as e:
-        print(f"Error displaying state: {e}")
+def _log_events() -> bool:
+    """Whether per-event DEBUG lines are wanted for the current agent run."""
+    return logger.isEnabledFor(logging.DEBUG) and _event_logging.get()
+
+
+def _log_event(event) -> None:
+    """DEBUG lines for one event: author, text, tool calls and responses."""
+    logger.debug("Event", extra={"event_id": event.id, "author": event.author})
+    if event.content and event.content.parts:
+        for part in event.content.parts:
+            if part.text and not part.text.isspace():
+                logger.debug("Text: %s", part.text.strip(), extra={"author": event.author})
+            if part.function_call:
+                logger.debug(
+                    "Tool invoked: %s with args %s",
+                    part.function_call.name,
+                    part.function_call.args,
+                    extra={"author": event.author},
+                )
+            if part.function_response:
+                logger.debug(
+                    "Tool response: %s", part.function_response, extra={"author": event.author}
+                )
+
+
+def _log_final_response(event, final_response) -> None:
+    if final_response:
+        logger.info("Agent response: %s", final_response, extra={"author": event.author})
+    else:
+        logger.debug("Final agent response has no text content", extra={"author": event.author})
+
 
 async def process_agent_response(event):
     """Process agent events, log details, and create ordered progress updates."""
-    print(f"Event ID: {event.id}, Author: {event.author}")
+    if _log_events():
+        _log_event(event)
 
     progress_updates = []  # Collect progress messages for frontend
 
@@ -198,23 +116,16 @@ async def process_agent_response(event):
     # === Inspect Event Content ===
     if event.content and event.content.parts:
         for part in event.content.parts:
-            # Handle text parts (logs + existing behavior)
-            if hasattr(part, "text") and part.text and not part.text.isspace():
-                print(f"  Text: '{part.text.strip()}'")
-
             # Handle function_call parts safely
             if hasattr(part, "function_call") and part.function_call:
                 tool_name = getattr(part.function_call, "name", "UnknownTool")
-                tool_args = getattr(part.function_call, "args", {})
                 msg = f"🔧 Tool **{tool_name}** is being used."
                 progress_updates.append(msg)
-                print(f"[DEBUG] Tool Invoked: {tool_name} with args {tool_args}")
 
             # Handle function_response
             if hasattr(part, "function_response") and part.function_response:
                 msg = f"✅ Tool execution completed."
                 progress_updates.append(msg)
-                print(f"[DEBUG] Tool Response: {part.function_response}")
 
     # === Final Response Handling ===
     final_response = None
@@ -226,109 +137,295 @@ async def process_agent_response(event):
             and event.content.parts[0].text
         ):
             final_response = event.content.parts[0].text.strip()
-            # Existing pretty logging
-            print(
-                f"\n{Colors.BG_BLUE}{Colors.WHITE}{Colors.BOLD}╔══ AGENT RESPONSE ═════════════════════════════════════════{Colors.RESET}"
-            )
-            print(f"{Colors.CYAN}{Colors.BOLD}{final_response}{Colors.RESET}")
-            print(
-                f"{Colors.BG_BLUE}{Colors.WHITE}{Colors.BOLD}╚═════════════════════════════════════════════════════════════{Colors.RESET}\n"
-            )
-        else:
-            print(
-                f"\n{Colors.BG_RED}{Colors.WHITE}{Colors.BOLD}==> Final Agent Response: [No text content]{Colors.RESET}\n"
-            )
+        _log_final_response(event, final_response)
 
     return progress_updates, final_response
 
 async def process_agent_response_streaming(event):
     """Yield detailed progress messages immediately for streaming."""
-    print(f"Event ID: {event.id}, Author: {event.author}")
+    if _log_events():
+        _log_event(event)
 
     # === Agent Delegation Progress ===
     if event.author:
         msg = f"🤖 Agent **{event.author}** is now handling your request."
-        print(f"{Colors.CYAN}{Colors.BOLD}{msg}{Colors.RESET}")
         yield msg
-        time.sleep(1)
 
     # === Inspect Event Content ===
     if event.content and event.content.parts:
         for part in event.content.parts:
-
-            # Handle text parts
-            # if hasattr(part, "text") and part.text and not part.text.isspace():
-            #     clean_text = part.text.strip()
-            #     print(f"{Colors.YELLOW}Text:{Colors.RESET} '{clean_text}'")
-            #     yield clean_text
-
             # Handle tool calls
             if hasattr(part, "function_call") and part.function_call:
                 tool_name = getattr(part.function_call, "name", "UnknownTool")
-                tool_args = getattr(part.function_call, "args", {})
                 tool_msg = f"🔧 Tool **{tool_name}** is being used."
-                print(f"{Colors.MAGENTA}{tool_msg}{Colors.RESET}")
-                print(f"[DEBUG] Tool Invoked: {tool_name} with args {tool_args}")
                 yield tool_msg
-                time.sleep(1)
 
             # Handle tool completion
             if hasattr(part, "function_response") and part.function_response:
                 done_msg = "✅ Tool execution completed."
-                print(f"{Colors.GREEN}{done_msg}{Colors.RESET}")
-                print(f"[DEBUG] Tool Response: {part.function_response}")
                 yield done_msg
-                time.sleep(1)
 
     # === Final Response Handling (just logs, yield handled in /query-streaming) ===
     if event.is_final_response():
-        print("event",event)
-        if (
-            event.content
-            and event.content.parts
-            and hasattr(event.content.parts[0], "text")
-            and event.content.parts[0].text
-        ):
-            time.sleep(1)
-            final_response = event.content.parts[0].text.strip()
-            print(
-                f"\n{Colors.BG_BLUE}{Colors.WHITE}{Colors.BOLD}╔══ AGENT RESPONSE ═════════════════════════════════════════{Colors.RESET}"
-            )
-            print(f"{Colors.CYAN}{Colors.BOLD}{final_response}{Colors.RESET}")
-            print(
-                f"{Colors.BG_BLUE}{Colors.WHITE}{Colors.BOLD}╚═════════════════════════════════════════════════════════════{Colors.RESET}\n"
-            )
-        else:
-            print(
-                f"\n{Colors.BG_RED}{Colors.WHITE}{Colors.BOLD}==> Final Agent Response: [No text content]{Colors.RESET}\n"
-            )
+        _log_final_response(event, extract_final_response(event))
 
-async def call_agent_async(runner, user_id, session_id, query):
-    """Call the agent asynchronously, collect ordered progress updates + final response."""
-    content = types.Content(role="user", parts=[types.Part(text=query)])
+def agents_involved(event):
+    """Names of agents an event shows at work: its author and AgentTool calls."""
+    names = set()
+    if event.author and event.author != "user":
+        names.add(event.author)
+    if event.content and event.content.parts:
+        for part in event.content.parts:
+            if hasattr(part, "function_call") and part.function_call:
+                names.add(getattr(part.function_call, "name", "UnknownTool"))
+                # Fan-out calls name their specialists in the arguments
+                args = getattr(part.function_call, "args", None) or {}
+                for branch in args.get("requests", []) if isinstance(args, dict) else []:
+                    if isinstance(branch, dict) and branch.get("agent"):
+                        names.add(branch["agent"])
+    return names
+
+
+def extract_final_response(event):
+    """Return the joined text of a final response event, or None."""
+    if not event.is_final_response() or not (event.content and event.content.parts):
+        return None
+    text_parts = [p.text for p in event.content.parts if hasattr(p, "text") and p.text]
+    if not text_parts:
+        return None
+    return "\n".join(text_parts)
+
+
+_STREAM_DONE = object()
+
+
+class _SegmentTimer:
+    """Splits the wall time of one agent run into ``[name, seconds]`` segments.
+
+    Time spent inside a tool call, from the event carrying its function_call
+    to the one carrying the matching function_response, is one segment named
+    after the tool; for an AgentTool that is the sub-agent's name. Overlapping
+    calls each get their full duration. The rest of the time goes to the
+    author of the next event, merged across consecutive events.
+    """
+
+    def __init__(self, segments: list, now: float) -> None:
+        self.segments = segments
+        self._last = now
+        self._author_segment = None
+        self._pending = {}
+
+    def observe(self, event, now: float) -> None:
+        if not self._pending:
+            author = event.author or "unknown"
+            if self._author_segment is None or self._author_segment[0] != author:
+                self._author_segment = [author, 0.0]
+                self.segments.append(self._author_segment)
+            self._author_segment[1] += now - self._last
+        self._last = now
+
+        if not (event.content and event.content.parts):
+            return
+        for part in event.content.parts:
+            call = getattr(part, "function_call", None)
+            if call:
+                self._pending[call.id or call.name] = (call.name, now)
+            response = getattr(part, "function_response", None)
+            if response:
+                pending = self._pending.pop(response.id or response.name, None)
+                if pending:
+                    self.segments.append([pending[0], now - pending[1]])
+                    self._author_segment = None
+
+
+async def stream_agent_events(
+    runner, user_id, session_id, content, coalesce_window=0.0, pacing=0.0, run_info=None
+):
+    """Run the agent in the background and yield batches of SSE payloads.
+
+    The runner is drained by a producer task so progress is queued the moment
+    ``runner.run_async`` yields an event, independently of how fast the client
+    reads. Payloads arriving within ``coalesce_window`` seconds of the first
+    one in a batch are flushed together; ``pacing`` adds a non-blocking delay
+    between flushes. Both default to 0 (flush every payload immediately).
+
+    If ``run_info`` is a dict, it is filled with the final ``response``, the
+    set of ``agents`` involved and ``segments``: ``[name, seconds]`` pairs
+    with one entry per tool call (named after the tool, or the sub-agent for
+    AgentTool calls) and one per stretch of the author's own time between
+    them.
+
+    Yields:
+        list of dicts, each one of ``{"progress": ...}``,
+        ``{"final_response": ...}`` or ``{"error": ...}``.
+    """
+    queue = asyncio.Queue()
+    if run_info is None:
+        run_info = {}
+    run_info.update({"response": None, "agents": set(), "segments": []})
+    loop = asyncio.get_running_loop()
+
+    async def produce():
+        segment_timer = _SegmentTimer(run_info["segments"], loop.time())
+        observer = RunObserver()
+        run_trace = RunTracer(**{"agent.root": runner.agent.name, "session.id": session_id})
+        error = None
+        _event_logging.set(sample_events())
+        try:
+            with run_trace.activate():
+                async for event in runner.run_async(
+                    user_id=user_id, session_id=session_id, new_message=content
+                ):
+                    observer.observe(event)
+                    run_trace.observe(event)
+                    segment_timer.observe(event, loop.time())
+                    run_info["agents"] |= agents_involved(event)
+                    async for msg in process_agent_response_streaming(event):
+                        await queue.put({"progress": msg})
+                    final_response = extract_final_response(event)
+                    if final_response:
+                        run_info["response"] = final_response
+                        await queue.put({"final_response": final_response})
+        except Exception as e:
+            error = e
+            await queue.put({"error": str(e)})
+        finally:
+            run_trace.end(error)
+            await queue.put(_STREAM_DONE)
+
+    producer = asyncio.create_task(produce())
+    try:
+        done = False
+        while not done:
+            item = await queue.get()
+            if item is _STREAM_DONE:
+                break
+            batch = [item]
+
+            # Collect whatever else arrives inside the coalescing window
+            deadline = loop.time() + coalesce_window
+            while coalesce_window > 0:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STREAM_DONE:
+                    done = True
+                    break
+                batch.append(item)
+
+            yield batch
+
+            if pacing > 0 and not done:
+                await asyncio.sleep(pacing)
+    finally:
+        # Client went away or stream finished: stop the agent run
+        if not producer.done():
+            producer.cancel()
+        try:
+            await producer
+        except asyncio.CancelledError:
+            pass
+
+
+async def _run_and_collect(runner, user_id, session_id, content):
+    """Drain one agent run into (progress, final response, last author, agents)."""
     final_response_text = None
     agent_name = None
+    agents = set()
     all_progress = []  # Keeps ordered progress
-
-    await display_state(runner.session_service, runner.app_name, user_id, session_id, "State BEFORE processing")
+    observer = RunObserver()
+    run_trace = RunTracer(**{"agent.root": runner.agent.name, "session.id": session_id})
+    error = None
+    _event_logging.set(sample_events())
 
     try:
-        async for event in runner.run_async(user_id=user_id, session_id=session_id, new_message=content):
-            if event.author:
-                agent_name = event.author
-
-            progress_updates, response = await process_agent_response(event)
-            if progress_updates:
-                all_progress.extend(progress_updates)  # Append in event order
-            if response:
-                final_response_text = response
+        with run_trace.activate():
+            async for event in runner.run_async(user_id=user_id, session_id=session_id, new_message=content):
+                observer.observe(event)
+                run_trace.observe(event)
+                if event.author:
+                    agent_name = event.author
+                agents |= agents_involved(event)
+
+                progress_updates, response = await process_agent_response(event)
+                if progress_updates:
+                    all_progress.extend(progress_updates)  # Append in event order
+                if response:
+                    final_response_text = response
     except Exception as e:
+        error = e
         all_progress.append("⚠ Error occurred while processing request.")
-        print(f"{Colors.BG_RED}{Colors.WHITE}ERROR: {e}{Colors.RESET}")
+        logger.exception("Agent run failed", extra={"session_id": session_id})
+    finally:
+        run_trace.end(error)
+
+    return all_progress, final_response_text, agent_name, agents
+
+
+async def call_agent_async(runner, user_id, session_id, query):
+    """Call the agent asynchronously, collect ordered progress updates + final response."""
+    content = types.Content(role="user", parts=[types.Part(text=query)])
+
+    all_progress, final_response_text, agent_name, agents = await _run_and_collect(
+        runner, user_id, session_id, content
+    )
 
     if final_response_text and agent_name:
         await add_agent_response_to_history(runner.session_service, runner.app_name, user_id, session_id, agent_name, final_response_text)
 
-    await display_state(runner.session_service, runner.app_name, user_id, session_id, "State AFTER processing")
+    return {"progress": all_progress, "response": final_response_text, "agents": agents}
+
+
+class TracedInMemorySessionService(SessionTracingMixin, InMemorySessionService):
+    """In-memory session service whose calls show up as trace spans."""
+
+
+def format_host_response(text):
+    """Wrap a specialist answer in the JSON shape host_agent replies with.
+
+    Suggestions come from the host LLM, which the fast path skips, so the
+    list is always empty here.
+    """
+    return json.dumps({"final_response": text, "suggestions": []}, ensure_ascii=False)
+
+
+async def start_specialist_session(agent, user_id, state):
+    """Create a throwaway runner + session for calling one specialist directly.
+
+    This mirrors what AgentTool does when host_agent delegates: the specialist
+    runs in its own in-memory session seeded with the user's state, so its
+    events never land in (or take over) the host conversation.
+
+    Returns:
+        (runner, session_id)
+    """
+    runner = Runner(agent=agent, app_name=agent.name, session_service=TracedInMemorySessionService())
+    session = await runner.session_service.create_session(
+        app_name=agent.name, user_id=user_id, state=state
+    )
+    return runner, session.id
+
+
+async def call_specialist_async(agent, user_id, session_id, state, query):
+    """Answer a query with one specialist agent, skipping the host LLM hop.
+
+    The answer is recorded in the history of the user's real session
+    (``session_id``) and returned in host_agent's JSON response format.
+    """
+    content = types.Content(role="user", parts=[types.Part(text=query)])
+    runner, specialist_session_id = await start_specialist_session(agent, user_id, state)
+
+    all_progress, final_response_text, _, agents = await _run_and_collect(
+        runner, user_id, specialist_session_id, content
+    )
+    all_progress.insert(0, f"⚡ Routed directly to **{agent.name}**.")
+
+    if final_response_text:
+        final_response_text = format_host_response(final_response_text)
+        await add_agent_response_to_history(None, None, user_id, session_id, agent.name, final_response_text)
 
-    return {"progress": all_progress, "response": final_response_text}
+    return {"progress": all_progress, "response": final_response_text, "agents": agents | {agent.name}}